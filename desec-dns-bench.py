@@ -0,0 +1,662 @@
+#!/usr/bin/python
+"""
+Author: Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import sys
+import os
+import json
+import time
+import argparse
+import asyncio
+import platform
+import subprocess
+import tempfile
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from desec_dns_api import deSEC_DNS_API
+from desec_dns_api_async import deSEC_DNS_API_Async
+from desec_dns_mock import MockDeSEC, MockDNS
+from desec_dns_ratelimit import DEFAULT_RATE_LIMITS
+from desec_dns_acme import acme_publish, acme_cleanup, acme_wait
+from desec_dns_backup import BackupStore, backup_zones, restore_zones
+from desec_dns_index import ZoneIndex
+from desec_dns_records import validate_changes
+from desec_dns_zone import zone_diff
+
+
+#"""
+#Argument parsing and help
+#"""
+
+# create argparser
+parser = argparse.ArgumentParser(description="Benchmarks for the deSEC DNS api class, run against a local mock of the deSEC API.")
+
+# add subparsers
+subparsers = parser.add_subparsers()
+
+parser_pool = subparsers.add_parser('pool',                             help="compare requests/second with and without connection reuse")
+parser_pool.set_defaults(benchmark='pool')
+parser_pool.add_argument('--requests',        type=int, default=1000,   help="number of requests per run (default 1000)")
+parser_pool.add_argument('--latency',         type=float, default=0.0,  help="seconds the mock server delays each response (default 0.0)")
+parser_pool.add_argument('--zones',           type=int, default=10,     help="number of domains in the mock account (default 10)")
+
+parser_ratelimit = subparsers.add_parser('ratelimit',                   help="compare rrset writes against a throttling api with and without client side rate limiting")
+parser_ratelimit.set_defaults(benchmark='ratelimit')
+parser_ratelimit.add_argument('--requests',   type=int, default=100,    help="number of rrset writes per run (default 100)")
+parser_ratelimit.add_argument('--server-rate', type=int, default=20,    help="rrset writes per second allowed by the mock server (default 20)")
+parser_ratelimit.add_argument('--client-rate', type=float, default=30,  help="rrset writes per second configured in the client (default 30)")
+
+parser_async = subparsers.add_parser('async',                           help="compare concurrent rrset writes of the asyncio client with the synchronous client")
+parser_async.set_defaults(benchmark='async')
+parser_async.add_argument('--requests',       type=int, default=500,    help="number of rrset writes per run (default 500)")
+parser_async.add_argument('--concurrency',    type=int, default=50,     help="number of writes running at the same time (default 50)")
+parser_async.add_argument('--latency',        type=float, default=0.01, help="seconds the mock server delays each response (default 0.01)")
+
+parser_acme = subparsers.add_parser('acme',                             help="publish, wait for and remove ACME challenges of many names against a stub nameserver")
+parser_acme.set_defaults(benchmark='acme')
+parser_acme.add_argument('--names',           type=int, default=200,    help="number of certificate names (default 200)")
+parser_acme.add_argument('--zones',           type=int, default=5,      help="number of domains the names are spread over (default 5)")
+parser_acme.add_argument('--delay',           type=float, default=1.0,  help="seconds until the stub nameservers answer a change (default 1.0)")
+
+parser_coalesce = subparsers.add_parser('coalesce',                     help="compare identical concurrent reads with and without sharing requests in progress")
+parser_coalesce.set_defaults(benchmark='coalesce')
+parser_coalesce.add_argument('--requests',    type=int, default=1000,   help="number of rrset list calls per run (default 1000)")
+parser_coalesce.add_argument('--threads',     type=int, default=50,     help="number of threads calling at the same time (default 50)")
+parser_coalesce.add_argument('--zones',       type=int, default=5,      help="number of domains the calls are spread over (default 5)")
+parser_coalesce.add_argument('--latency',     type=float, default=0.02, help="seconds the mock server delays each response (default 0.02)")
+
+parser_search = subparsers.add_parser('search',                         help="build the local zone index of many rrsets and measure refreshes and searches")
+parser_search.set_defaults(benchmark='search')
+parser_search.add_argument('--zones',         type=int, default=1000,   help="number of domains in the mock account (default 1000)")
+parser_search.add_argument('--rrsets',        type=int, default=100,    help="number of rrsets per domain (default 100)")
+parser_search.add_argument('--searches',      type=int, default=1000,   help="number of searches per kind (default 1000)")
+parser_search.add_argument('--concurrency',   type=int, default=10,     help="number of domains requested at the same time (default 10)")
+
+parser_backup = subparsers.add_parser('backup',                         help="take full and incremental snapshots of many domains and restore changed domains")
+parser_backup.set_defaults(benchmark='backup')
+parser_backup.add_argument('--zones',         type=int, default=2000,   help="number of domains in the mock account (default 2000)")
+parser_backup.add_argument('--rrsets',        type=int, default=20,     help="number of rrsets per domain (default 20)")
+parser_backup.add_argument('--changed',       type=float, default=1.0,  help="percent of the domains changed between the snapshots (default 1)")
+parser_backup.add_argument('--concurrency',   type=int, default=10,     help="number of domains requested at the same time (default 10)")
+
+parser_records = subparsers.add_parser('records',                       help="validate and normalise many rrsets and compare them with differently formatted live rrsets")
+parser_records.set_defaults(benchmark='records')
+parser_records.add_argument('--rrsets',       type=int, default=100000, help="number of rrsets (default 100000)")
+parser_records.add_argument('--repeat',       type=int, default=3,      help="number of runs, the median is reported (default 3)")
+
+parser_suite = subparsers.add_parser('suite',                           help="run the reproducible benchmark suite and save the results as json")
+parser_suite.set_defaults(benchmark='suite')
+parser_suite.add_argument('--sizes',          type=str, default="10,1000,50000", help="comma separated numbers of rrsets of the listed domains (default 10,1000,50000)")
+parser_suite.add_argument('--writes',         type=int, default=500,    help="number of rrset writes (default 500)")
+parser_suite.add_argument('--repeat',         type=int, default=3,      help="number of runs per case, the median is reported (default 3)")
+parser_suite.add_argument('--latency',        type=float, default=0.0,  help="seconds the mock server delays each response (default 0.0)")
+parser_suite.add_argument('--output',         type=str, required=False, help="specify the json file for the results (default bench-<time>.json)")
+
+parser_startup = subparsers.add_parser('startup',                       help="measure the start and the imports (python -X importtime) of the cli script against a time budget")
+parser_startup.set_defaults(benchmark='startup')
+parser_startup.add_argument('--repeat',       type=int, default=5,      help="number of runs per command line, the median is reported (default 5)")
+parser_startup.add_argument('--budget',       type=float, default=250.0, help="milliseconds a command may take on top of the interpreter start (default 250)")
+parser_startup.add_argument('--top',          type=int, default=5,      help="number of the slowest imports shown per command line (default 5)")
+
+parser_compare = subparsers.add_parser('compare',                       help="compare two result files of the suite")
+parser_compare.set_defaults(benchmark='compare')
+parser_compare.add_argument('baseline',       type=str,                 help="the result file to compare against")
+parser_compare.add_argument('current',        type=str,                 help="the result file of the change")
+parser_compare.add_argument('--threshold',    type=float, default=10.0, help="percent a metric may get worse before it is reported as regression (default 10)")
+
+# start parsing args
+args = parser.parse_args()
+
+
+
+# ##############################################################################
+
+
+def run_requests(api_url, count, keep_alive):
+    """
+    Function to send a number of domain list requests
+    Return: requests per second
+
+    Keyword arguments:
+    api_url -- The API url of the mock server
+    count -- The number of requests to send
+    keep_alive -- Reuse connections between requests
+    """
+    with deSEC_DNS_API(api_url=api_url, api_token="bench", keep_alive=keep_alive, rate_limits=False) as api:
+        start = time.time()
+        for _ in range(count):
+            ret = api.domain_list()
+            if not ret:
+                raise RuntimeError("Request failed with " + str(ret.http_code) + " " + str(ret.http_errmsg))
+        duration = time.time() - start
+    return count / duration
+
+
+#
+# POOL
+#
+if args.benchmark == "pool":
+
+    with MockDeSEC(latency=args.latency) as mock:
+        for i in range(args.zones):
+            mock.add_domain("zone%d.example" % i)
+
+        results = list()
+        for keep_alive in (False, True):
+            rate = run_requests(mock.url, args.requests, keep_alive)
+            results.append(rate)
+            print("keep_alive=%-5s : %10.1f requests/second" % (keep_alive, rate))
+
+    print("speedup         : %10.2fx" % (results[1] / results[0]))
+
+
+#
+# RATELIMIT
+#
+if args.benchmark == "ratelimit":
+
+    with MockDeSEC(rate_limits={'rrset_write': args.server_rate}) as mock:
+        mock.add_domain("example.com")
+        mock.add_rrset("example.com", "www", "A", 3600, ["192.0.2.1"])
+
+        for name, rate_limits in (("without limiter", False), ("with limiter", {'rrset_write': {'rate': args.client_rate}})):
+            throttled_before = mock.throttled_count
+            with deSEC_DNS_API(api_url=mock.url, api_token="bench", rate_limits=rate_limits) as api:
+                ok = 0
+                start = time.time()
+                for i in range(args.requests):
+                    ret = api.rrset_modify(zone="example.com", type="A", subname="www", records="192.0.2.%d" % (i % 250 + 1))
+                    if ret:
+                        ok += 1
+                duration = time.time() - start
+            print("%-16s: %5d/%d succeeded, %5d throttled by the server, %8.1f successful writes/second"
+                  % (name, ok, args.requests, mock.throttled_count - throttled_before, ok / duration))
+
+
+#
+# ASYNC
+#
+if args.benchmark == "async":
+
+    def write_sync(api, zone, i):
+        ret = api.rrset_create(zone=zone, type="A", subname="host%d" % i, records="192.0.2.%d" % (i % 250 + 1), ttl=3600)
+        if not ret:
+            raise RuntimeError("Request failed with " + str(ret.http_code) + " " + str(ret.http_errmsg))
+
+    async def write_async(api_url, zone):
+        async with deSEC_DNS_API_Async(api_url=api_url, api_token="bench", pool_size=args.concurrency, rate_limits=False) as api:
+            await asyncio.gather(*[api.rrset_create(zone=zone, type="A", subname="host%d" % i, records="192.0.2.%d" % (i % 250 + 1), ttl=3600)
+                                   for i in range(args.requests)])
+
+    with MockDeSEC(latency=args.latency) as mock:
+        results = list()
+        for name in ("sync sequential", "sync threads", "async"):
+            zone = name.replace(" ", "-") + ".example"
+            mock.add_domain(zone)
+            start = time.time()
+            if name == "async":
+                asyncio.run(write_async(mock.url, zone))
+            else:
+                workers = args.concurrency if name == "sync threads" else 1
+                with deSEC_DNS_API(api_url=mock.url, api_token="bench", pool_size=workers, rate_limits=False) as api:
+                    with ThreadPoolExecutor(max_workers=workers) as executor:
+                        list(executor.map(lambda i: write_sync(api, zone, i), range(args.requests)))
+            rate = args.requests / (time.time() - start)
+            results.append(rate)
+            print("%-16s: %10.1f writes/second" % (name, rate))
+
+    print("speedup async   : %10.2fx (sequential), %.2fx (threads)" % (results[2] / results[0], results[2] / results[1]))
+
+
+#
+# ACME
+#
+if args.benchmark == "acme":
+
+    with MockDeSEC() as mock, MockDNS(mock, delay=args.delay) as ns1, MockDNS(mock, delay=args.delay) as ns2:
+        zones = ["zone%d.example" % i for i in range(args.zones)]
+        for zone in zones:
+            mock.add_domain(zone)
+            # an unrelated TXT value that has to be kept
+            mock.add_rrset(zone, "_acme-challenge", "TXT", 60, ['"other-order"'])
+        challenges = [("host%d.%s" % (i, zones[i % len(zones)]), "token%d" % i) for i in range(args.names)]
+        challenges.append(("*." + zones[0], "wildcard"))
+
+        # default client side rate limits, like against the real api
+        with deSEC_DNS_API(api_url=mock.url, api_token="bench") as api:
+            start = time.time()
+            results = acme_publish(api, challenges)
+            published = time.time()
+            pending = acme_wait(api, challenges, nameservers=[ns1.nameserver, ns2.nameserver], timeout=60)
+            propagated = time.time()
+            acme_cleanup(api, challenges)
+            finished = time.time()
+
+        failed = len([result for result in results if result['status'] != 'ok'])
+        writes = len(zones)
+        print("challenges      : %10d (%d failed, %d not propagated)" % (len(challenges), failed, len(pending)))
+        print("publish         : %10.2f seconds (%d bulk writes)" % (published - start, writes))
+        print("propagation     : %10.2f seconds (%d DNS queries, delay %.1fs)" % (propagated - published, ns1.query_count + ns2.query_count, args.delay))
+        print("cleanup         : %10.2f seconds" % (finished - propagated))
+        print("kept TXT values : %10s" % all('"other-order"' in mock.rrsets[zone][("_acme-challenge", "TXT")]['records'] for zone in zones))
+        print("one write each  : %10.2f seconds at least (%d writes at %d/s)"
+              % (len(challenges) / float(DEFAULT_RATE_LIMITS['rrset_write']['rate']), len(challenges), DEFAULT_RATE_LIMITS['rrset_write']['rate']))
+
+
+#
+# COALESCE
+#
+if args.benchmark == "coalesce":
+
+    with MockDeSEC(latency=args.latency) as mock:
+        zones = ["zone%d.example" % i for i in range(args.zones)]
+        for zone in zones:
+            mock.add_domain(zone)
+            for i in range(20):
+                mock.add_rrset(zone, "host%d" % i, "A", 3600, ["192.0.2.%d" % (i + 1)])
+
+        for single_flight in (False, True):
+            with deSEC_DNS_API(api_url=mock.url, api_token="bench", pool_size=args.threads, rate_limits=False,
+                               single_flight=single_flight) as api:
+                sent = mock.request_count
+                start = time.time()
+                with ThreadPoolExecutor(max_workers=args.threads) as executor:
+                    list(executor.map(lambda i: api.rrset_list(zones[i % len(zones)]).get_response_rrsets(), range(args.requests)))
+                duration = time.time() - start
+                sent = mock.request_count - sent
+            print("single_flight=%-5s: %6d requests sent for %d calls, %8.1f calls/second"
+                  % (single_flight, sent, args.requests, args.requests / duration))
+
+
+#
+# SUITE
+#
+CLI_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "desec-dns-cli.py")
+
+# Runs a script and reports the peak memory of the process on the last line of standard error.
+# ru_maxrss of a child would include the memory of the benchmark process it was forked from.
+CLI_WRAPPER = """
+import os, runpy, sys
+def report():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                sys.stderr.write('\\nVmHWM ' + line.split()[1] + '\\n')
+sys.argv = sys.argv[1:]
+sys.path.insert(0, os.path.dirname(sys.argv[0]))
+try:
+    runpy.run_path(sys.argv[0], run_name='__main__')
+finally:
+    if os.path.exists('/proc/self/status'):
+        report()
+"""
+
+
+def median(values):
+    """
+    Function to get the median of a list of values
+    Return: float
+    """
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def run_cli(directory, argv):
+    """
+    Function to run the cli script in a new process
+    Return: tuple of seconds and the peak memory of the process (MB)
+
+    Keyword arguments:
+    directory -- The directory holding the config file of the mock
+    argv -- The command line arguments of the cli script
+    """
+    with open(os.devnull, "w") as devnull:
+        start = time.time()
+        process = subprocess.Popen([sys.executable, "-c", CLI_WRAPPER, CLI_SCRIPT] + argv, cwd=directory,
+                                   stdout=devnull, stderr=subprocess.PIPE)
+        errors = process.communicate()[1].decode('utf-8', 'replace')
+        duration = time.time() - start
+    if process.returncode:
+        raise RuntimeError("cli failed with status " + str(process.returncode) + ": " + " ".join(argv) + "\n" + errors)
+    peak = 0.0
+    if errors.rstrip().split("\n")[-1].startswith("VmHWM "):
+        # VmHWM is in kB
+        peak = int(errors.rstrip().split("\n")[-1].split()[1]) / 1024.0
+    return duration, peak
+
+
+def git_commit():
+    """
+    Function to get the commit of the working tree (None outside of git)
+    Return: string
+    """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(CLI_SCRIPT),
+                                       stderr=subprocess.DEVNULL).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if args.benchmark == "suite":
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = dict()
+
+    def record(case, **metrics):
+        results[case] = metrics
+        print("%-24s: %s" % (case, ", ".join("%s=%.4g" % (key, value) for key, value in sorted(metrics.items()))))
+        sys.stdout.flush()
+
+    with MockDeSEC(latency=args.latency) as mock:
+        # deterministic content, so every run lists and writes the same data
+        for size in sizes:
+            zone = "list%d.example" % size
+            mock.add_domain(zone)
+            for i in range(size):
+                mock.add_rrset(zone, "host%06d" % i, "A", 3600, ["192.0.2.%d" % (i % 250 + 1), "198.51.100.%d" % (i % 250 + 1)])
+        mock.add_domain("write.example")
+
+        directory = tempfile.mkdtemp(prefix="desec-dns-bench-")
+        with open(os.path.join(directory, "desec-dns-cli.yml"), "w") as stream:
+            stream.write("api_url: " + mock.url + "\napi_token: bench\nrate_limits: false\n")
+
+        with deSEC_DNS_API(api_url=mock.url, api_token="bench", rate_limits=False) as api:
+
+            # list throughput of the api class and peak memory of the python objects
+            for size in sizes:
+                zone = "list%d.example" % size
+                durations = list()
+                for _ in range(args.repeat):
+                    start = time.time()
+                    count = sum(1 for _ in api.iter_rrsets(zone=zone))
+                    durations.append(time.time() - start)
+                if count != size:
+                    raise RuntimeError("listed %d of %d rrsets" % (count, size))
+                duration = median(durations)
+
+                # tracing the allocations slows the listing down, so memory is measured in an extra run
+                tracemalloc.start()
+                sum(1 for _ in api.iter_rrsets(zone=zone))
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                record("list_api_%d" % size, seconds=duration, rrsets_per_second=size / duration, peak_mb=peak / 1048576.0)
+
+            # list rendering of the cli script (table and jsonl), including start and memory of the process
+            for size in sizes:
+                zone = "list%d.example" % size
+                for output in ("table", "jsonl", "sorted_table", "sorted_jsonl"):
+                    argv = ["rrset", "list", "--zone", zone]
+                    if output.startswith("sorted_"):
+                        # sorting needs all rrsets of the domain in memory at once
+                        argv += ["--sort", "subname"]
+                    if not output.endswith("table"):
+                        argv += ["--output", "jsonl"]
+                    runs = [run_cli(directory, argv) for _ in range(args.repeat)]
+                    duration = median([run[0] for run in runs])
+                    record("list_cli_%s_%d" % (output, size), seconds=duration, rrsets_per_second=size / duration,
+                           peak_rss_mb=max(run[1] for run in runs))
+
+            # single rrset writes
+            durations = list()
+            for run in range(args.repeat):
+                start = time.time()
+                for i in range(args.writes):
+                    ret = api.rrset_create(zone="write.example", type="A", subname="run%d-%d" % (run, i), records="192.0.2.1", ttl=3600)
+                    if not ret:
+                        raise RuntimeError("write failed with " + str(ret.http_code))
+                durations.append(time.time() - start)
+            record("write_single", seconds=median(durations), ops_per_second=args.writes / median(durations))
+
+            # bulk writes of the same number of rrsets
+            durations = list()
+            for run in range(args.repeat):
+                changes = [{'action': 'create', 'subname': "bulk%d-%d" % (run, i), 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.1']}
+                           for i in range(args.writes)]
+                start = time.time()
+                api.rrset_bulk(zone="write.example", changes=changes)
+                durations.append(time.time() - start)
+            record("write_bulk", seconds=median(durations), ops_per_second=args.writes / median(durations))
+
+        # cold start of the cli script, compared to the interpreter alone
+        interpreter = list()
+        for _ in range(args.repeat):
+            start = time.time()
+            subprocess.check_call([sys.executable, "-c", "pass"])
+            interpreter.append(time.time() - start)
+        runs = [run_cli(directory, ["domain", "list"]) for _ in range(args.repeat)]
+        record("cold_start", seconds=median([run[0] for run in runs]), interpreter_seconds=median(interpreter),
+               peak_rss_mb=max(run[1] for run in runs))
+
+    output = args.output or time.strftime("bench-%Y%m%d-%H%M%S.json")
+    with open(output, "w") as stream:
+        json.dump({'meta': {'time': time.strftime("%Y-%m-%dT%H:%M:%S"), 'commit': git_commit(), 'python': platform.python_version(),
+                            'platform': platform.platform(), 'sizes': sizes, 'writes': args.writes, 'repeat': args.repeat,
+                            'latency': args.latency},
+                   'results': results}, stream, indent=2, sort_keys=True)
+    print("results written to '" + output + "'")
+
+
+#
+# SEARCH
+#
+if args.benchmark == "search":
+
+    with MockDeSEC() as mock:
+        zones = ["zone%d.example" % i for i in range(args.zones)]
+        for number, zone in enumerate(zones):
+            mock.add_domain(zone)
+            for i in range(args.rrsets - 1):
+                mock.add_rrset(zone, "host%d" % i, "A", 3600, ["10.%d.%d.%d" % (number // 256 % 256, number % 256, i % 256)])
+            mock.add_rrset(zone, "lb", "CNAME", 3600, ["lb%d.example.net." % (number % 10)])
+
+        directory = tempfile.mkdtemp(prefix="desec-dns-bench-")
+        with deSEC_DNS_API(api_url=mock.url, api_token="bench", pool_size=args.concurrency, rate_limits=False) as api:
+            with ZoneIndex(path=os.path.join(directory, "index.sqlite"), account="bench") as index:
+                sent = mock.request_count
+                start = time.time()
+                counts = index.refresh(api, concurrency=args.concurrency)
+                print("build           : %10.2f seconds (%d rrsets, %d requests)" % (time.time() - start, counts['rrsets'], mock.request_count - sent))
+
+                mock.add_rrset(zones[0], "new", "A", 3600, ["192.0.2.1"])
+                sent = mock.request_count
+                start = time.time()
+                counts = index.refresh(api, concurrency=args.concurrency)
+                print("refresh         : %10.2f seconds (%d of %d domains, %d requests)" % (time.time() - start, counts['refreshed'], counts['zones'], mock.request_count - sent))
+
+                searches = (("address", lambda i: index.search(value="10.%d.%d.1" % (i // 256 % 256, i % 256))),
+                            ("cname target", lambda i: index.search(value="LB%d.example.net." % (i % 10), type="CNAME")),
+                            ("subname", lambda i: index.search(subname="host%d" % (i % args.rrsets), zone=zones[i % len(zones)])),
+                            ("glob", lambda i: index.search(value="10.%d.%d.1*" % (i // 256 % 256, i % 256))))
+                for name, search in searches:
+                    durations = list()
+                    found = 0
+                    for i in range(args.searches):
+                        start = time.time()
+                        found += len(search(i % len(zones)))
+                        durations.append(time.time() - start)
+                    print("search %-8s : %10.3f ms median, %.3f ms max (%.1f records per search)"
+                          % (name[:8], median(durations) * 1000, max(durations) * 1000, found / float(args.searches)))
+
+
+#
+# BACKUP
+#
+if args.benchmark == "backup":
+
+    def directory_size(path):
+        return sum(os.path.getsize(os.path.join(root, name)) for root, dirs, names in os.walk(path) for name in names)
+
+    with MockDeSEC() as mock:
+        zones = ["zone%d.example" % i for i in range(args.zones)]
+        for number, zone in enumerate(zones):
+            mock.add_domain(zone)
+            for i in range(args.rrsets):
+                mock.add_rrset(zone, "host%d" % i, "A", 3600, ["10.%d.%d.%d" % (number // 256 % 256, number % 256, i % 256)])
+
+        store = BackupStore(tempfile.mkdtemp(prefix="desec-dns-bench-"))
+        with deSEC_DNS_API(api_url=mock.url, api_token="bench", pool_size=args.concurrency, rate_limits=False) as api:
+            for name in ("full", "unchanged", "incremental"):
+                if name == "incremental":
+                    changed = zones[:max(1, int(len(zones) * args.changed / 100))]
+                    for zone in changed:
+                        mock.add_rrset(zone, "new", "TXT", 3600, ['"changed"'])
+                sent = mock.request_count
+                stats = backup_zones(api, store, concurrency=args.concurrency)['stats']
+                print("backup %-11s: %8.2f seconds (%d requests, %d domains requested, %d objects written, %d deduplicated, store %.1f kB)"
+                      % (name, stats['seconds'], mock.request_count - sent, stats['fetched'], stats['written'],
+                         stats['deduplicated'], directory_size(store.path) / 1024.0))
+
+            # undo the changes of the incremental snapshot with the first one, only the changed domains are requested
+            first = store.load_snapshot(store.snapshots(api.cache_account)[0])
+            sent = mock.request_count
+            start = time.time()
+            results = restore_zones(api, store, first, concurrency=args.concurrency)
+            print("restore all        : %8.2f seconds (%d requests, %d domains changed, %d rrsets deleted)"
+                  % (time.time() - start, mock.request_count - sent, len([result for result in results if result['delete']]),
+                     sum(result['delete'] for result in results)))
+
+
+#
+# RECORDS
+#
+if args.benchmark == "records":
+
+    # the rrsets of an import file, in the formatting of a person writing them
+    RECORD_FORMATS = (("A", lambda i: "10.%d.%d.%d" % (i >> 16 & 255, i >> 8 & 255, i & 255)),
+                      ("AAAA", lambda i: "2001:DB8:0:0::%X" % (i & 0xffff)),
+                      ("MX", lambda i: "10  Mx%d.Example.NET." % i),
+                      ("TXT", lambda i: '"v=spf1 include:_spf%d.example.net -all"' % i),
+                      ("CNAME", lambda i: "Target%d.example.net." % i),
+                      ("CAA", lambda i: "0 issue letsencrypt.org"),
+                      ("TLSA", lambda i: "3 1 1 " + ("%064X" % i)))
+    desired = [{'subname': "host%d" % i, 'type': RECORD_FORMATS[i % len(RECORD_FORMATS)][0], 'ttl': 3600,
+                'records': [RECORD_FORMATS[i % len(RECORD_FORMATS)][1](i)]} for i in range(args.rrsets)]
+
+    durations = list()
+    for _ in range(args.repeat):
+        start = time.time()
+        valid, invalid = validate_changes(desired)
+        durations.append(time.time() - start)
+    print("validate        : %10.3f seconds (%d rrsets, %d invalid, %.0f rrsets/second)"
+          % (median(durations), len(desired), len(invalid), len(desired) / median(durations)))
+
+    # the live rrsets hold the same records in canonical form, nothing has to be sent
+    plan = zone_diff(desired, valid)
+    print("formatting only : %10d changes, %d unchanged" % (len(plan['create']) + len(plan['modify']) + len(plan['delete']), plan['unchanged']))
+
+
+#
+# STARTUP
+#
+if args.benchmark == "startup":
+
+    # short command lines where the start of the script is most of the time
+    COMMAND_LINES = (["--help"],
+                     ["rrset", "delete", "--zone", "startup.example", "--subname", "www", "--type", "A"],
+                     ["domain", "list", "--output", "jsonl"],
+                     ["domain", "list"])
+
+    def import_times(lines):
+        """
+        Function to read the output of python -X importtime
+        Return: dict of the top level modules and their cumulative import time (ms)
+
+        Keyword arguments:
+        lines -- The lines of standard error of the process
+        """
+        times = dict()
+        for line in lines:
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            fields = line[len("import time:"):].split("|")
+            # top level imports are not indented
+            if fields[2].startswith(" ") and not fields[2].startswith("  ") and fields[1].strip().isdigit():
+                times[fields[2].strip()] = int(fields[1]) / 1000.0
+        return times
+
+    with MockDeSEC() as mock:
+        mock.add_domain("startup.example")
+        directory = tempfile.mkdtemp(prefix="desec-dns-bench-")
+        with open(os.path.join(directory, "desec-dns-cli.yml"), "w") as stream:
+            stream.write("api_url: " + mock.url + "\napi_token: bench\nrate_limits: false\n")
+
+        interpreter = list()
+        for _ in range(args.repeat):
+            start = time.time()
+            subprocess.check_call([sys.executable, "-c", "pass"])
+            interpreter.append(time.time() - start)
+        baseline = median(interpreter) * 1000
+        print("%-40s: %8.1f ms" % ("interpreter", baseline))
+
+        over = 0
+        for argv in COMMAND_LINES:
+            durations = list()
+            for _ in range(args.repeat):
+                start = time.time()
+                subprocess.call([sys.executable, CLI_SCRIPT] + argv, cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                durations.append(time.time() - start)
+            startup = median(durations) * 1000 - baseline
+
+            # the imports are measured in an extra run, importtime slows the start down
+            process = subprocess.Popen([sys.executable, "-X", "importtime", CLI_SCRIPT] + argv, cwd=directory,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            times = import_times(process.communicate()[1].decode('utf-8', 'replace').split("\n"))
+            # site is imported by the interpreter alone
+            times.pop('site', None)
+            slowest = sorted(times.items(), key=lambda item: -item[1])[:args.top]
+
+            flag = ""
+            if startup > args.budget:
+                flag = "  OVER BUDGET"
+                over += 1
+            print("%-40s: %8.1f ms (imports %.1f ms)%s" % (" ".join(argv)[:40], startup, sum(times.values()), flag))
+            for module, duration in slowest:
+                print("%-40s  %8.1f ms %s" % ("", duration, module))
+
+    print(str(over) + " command lines above the budget of " + str(args.budget) + " ms")
+    if over:
+        sys.exit(1)
+
+
+#
+# COMPARE
+#
+if args.benchmark == "compare":
+
+    # metrics where a higher value is better, all others are better when lower
+    HIGHER_IS_BETTER = ('rrsets_per_second', 'ops_per_second')
+
+    with open(args.baseline) as stream:
+        baseline = json.load(stream)
+    with open(args.current) as stream:
+        current = json.load(stream)
+
+    for setting in ('sizes', 'writes', 'repeat', 'latency', 'python'):
+        if baseline['meta'].get(setting) != current['meta'].get(setting):
+            print("WARNING: the runs differ in " + setting + " (" + str(baseline['meta'].get(setting)) + " / " + str(current['meta'].get(setting)) + ")")
+
+    regressions = 0
+    print("%-24s %-20s %12s %12s %9s" % ("case", "metric", "baseline", "current", "change"))
+    for case in sorted(set(baseline['results']) & set(current['results'])):
+        for metric in sorted(set(baseline['results'][case]) & set(current['results'][case])):
+            before = baseline['results'][case][metric]
+            after = current['results'][case][metric]
+            if metric == 'interpreter_seconds' or not before:
+                continue
+            change = (after - before) / before * 100.0
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            flag = ""
+            if worse > args.threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print("%-24s %-20s %12.4g %12.4g %+8.1f%%%s" % (case, metric, before, after, change, flag))
+
+    print(str(regressions) + " regressions above " + str(args.threshold) + "%")
+    if regressions:
+        sys.exit(1)
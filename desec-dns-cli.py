@@ -7,237 +7,1127 @@ Version: 0.2.0
 from __future__ import print_function
 import sys
 import os.path
+import io
 import argparse
-import yaml
-# tabulate - structured console output
-#   https://bitbucket.org/astanin/python-tabulate
-from tabulate import tabulate
-from desec_dns_api import deSEC_DNS_API
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import redirect_stdout, redirect_stderr
+from operator import attrgetter
+from desec_dns_output import write_rows, OUTPUT_FORMATS
+# The api (requests), yaml, tabulate and the modules of single commands are
+# imported where they are used, so a command only loads what it needs.
+
+
+# Unix socket used by the serve command and desec-dns-client.py
+DEFAULT_SOCKET = os.path.join(os.path.expanduser("~"), ".cache", "desec-dns-cli", "serve.sock")
+
+# Directory keeping the parsed settings files, they are parsed again when the file changes
+SETTINGS_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "desec-dns-cli", "settings")
+
+# Commands of the command line and their help, in the order of the help output
+COMMANDS = OrderedDict((
+    ('domain', "allows to manage domains"),
+    ('rrset', "allows to manage resource-record-sets (RRset)"),
+    ('zone', "allows to manage the content of a domain as a whole"),
+    ('acme', "allows to publish and remove ACME DNS-01 challenges"),
+    ('watch', "poll the domains and print the changed rrsets as json lines"),
+    ('search', "find records of all domains in a local index (like every CNAME to a host)"),
+    ('backup', "save the rrsets of all domains as compressed snapshot"),
+    ('restore', "bring domains back to the state of a snapshot"),
+    ('serve', "keep a warm api object and execute commands sent as json lines"),
+))
+
+# Options of the main parser taking a value, skipped when looking for the command
+GLOBAL_VALUE_OPTIONS = ('--stats-format', '--stats-file', '--account')
+
 
 
 #"""
 #Argument parsing and help
 #"""
 
-# create argparser
-parser = argparse.ArgumentParser(description="A python script utilysing the deSEC DNS api to manipulate DNS resource records from the command line.")
-
-# add subparsers
-subparsers = parser.add_subparsers()
-
-# add subparser for "domain"
-parser_domain = subparsers.add_parser('domain',                         help="allows to manage domains")
-parser_domain.set_defaults(command='domain')
-subparser_domain = parser_domain.add_subparsers(                        help="available sub-commands")
-
-parser_domain_list = subparser_domain.add_parser('list',                help="list domains of the account")
-parser_domain_list.set_defaults(command='domain', subcommand='list')
-parser_domain_list.add_argument('--zone',     type=str, required=False, help="show a specific domain instead of all")
-parser_domain_list.add_argument("--sort",     type=str, required=False, help="select the field to sort the output")
-parser_domain_list.add_argument("--debug",    action='store_true',      help="show debug information")
-parser_domain_list.add_argument('--format',   type=str, required=False, help="show list in specific format (short, compact, short+compact)")
-
-parser_domain_create = subparser_domain.add_parser('create',            help="create new domains in the account")
-parser_domain_create.set_defaults(command='domain', subcommand='create')
-parser_domain_create.add_argument('--zone',   type=str, required=True,  help="specifies the domain name to be created")
-parser_domain_create.add_argument("--debug",  action='store_true',      help="show debug information")
-
-parser_domain_delete = subparser_domain.add_parser('delete',            help="delete domains from the account")
-parser_domain_delete.set_defaults(command='domain', subcommand='delete')
-parser_domain_delete.add_argument('--zone',   type=str, required=True,  help="specifies the domain name to be deleted")
-parser_domain_delete.add_argument("--debug",  action='store_true',      help="show debug information")
-
-
-# add subparser for "rrset"
-parser_rrset = subparsers.add_parser('rrset',                           help="allows to manage resource-record-sets (RRset)")
-parser_rrset.set_defaults(command='rrset')
-subparser_rrset = parser_rrset.add_subparsers(                          help="available sub-commands")
-
-parser_rrset_list = subparser_rrset.add_parser('list',                  help="list rrsets for a domain")
-parser_rrset_list.set_defaults(command='rrset', subcommand='list')
-parser_rrset_list.add_argument('--zone',      type=str, required=True,  help="specify the domain / zone to list the rrsets for")
-parser_rrset_list.add_argument('--type',      type=str, required=False, help="filter the rrsets by type (A, MX, TXT, ...)")
-parser_rrset_list.add_argument('--subname',   type=str, required=False, help="filter the rrsets by sub-domain / host-part (www, ...)")
-parser_rrset_list.add_argument("--sort",      type=str, required=False, help="select the field to sort the output")
-parser_rrset_list.add_argument("--debug",     action='store_true',      help="show debug information")
-parser_rrset_list.add_argument('--format',    type=str, required=False, help="show list in specific format (short, compact, short+compact, bind)")
-
-parser_rrset_create = subparser_rrset.add_parser('create',              help="create a new rrsets for a domain")
-parser_rrset_create.set_defaults(command='rrset', subcommand='create')
-parser_rrset_create.add_argument('--zone',    type=str, required=True,  help="specify the domain / zone to add the rrsets to")
-parser_rrset_create.add_argument('--type',    type=str, required=True,  help="specify the type of the rrset (A, MX, TXT, ...)")
-parser_rrset_create.add_argument('--ttl',     type=int, required=True,  help="specify the ttl in seconds for the rrset")
-parser_rrset_create.add_argument('--subname', type=str, required=True,  help="specify the sub-domain / host-part for the rrset")
-parser_rrset_create.add_argument('--records', type=str, required=True,  help="specify the records as comma separated list. Text records must contain quotes which requires to state the argument douple-quoted like this '\"Text Record 1\",\"Text Record 2\"' while MX records contain a priority and a text component, the priority should be outside the second quotes like this '10 smtp1.domain.tld,20 smtp2.domain.tld.'")
-parser_rrset_create.add_argument("--debug",   action='store_true',      help="show debug information")
-
-parser_rrset_modify = subparser_rrset.add_parser('modify',              help="modify a rrsets from a domain")
-parser_rrset_modify.set_defaults(command='rrset', subcommand='modify')
-parser_rrset_modify.add_argument('--zone',    type=str, required=True,  help="specify the domain / zone to modify the rrsets")
-parser_rrset_modify.add_argument('--type',    type=str, required=True,  help="specify the type of the rrset (A, MX, TXT, ...)")
-parser_rrset_modify.add_argument('--ttl',     type=int, required=False, help="specify the ttl in seconds for the rrset")
-parser_rrset_modify.add_argument('--subname', type=str, required=True,  help="specify the sub-domain / host-part for the rrset")
-parser_rrset_modify.add_argument('--records', type=str, required=False, help="specify the records as comma separated list. Text records must contain quotes which requires to state the argument douple-quoted like this '\"Text Record 1\",\"Text Record 2\"' while MX records contain a priority and a text component, the priority should be outside the second quotes like this '10 smtp1.domain.tld,20 smtp2.domain.tld.'")
-parser_rrset_modify.add_argument("--debug",   action='store_true',      help="show debug information")
-
-parser_rrset_delete = subparser_rrset.add_parser('delete',              help="delete a rrsets for a domain")
-parser_rrset_delete.set_defaults(command='rrset', subcommand='delete')
-parser_rrset_delete.add_argument('--zone',    type=str, required=True,  help="specify the domain / zone to modify the rrsets")
-parser_rrset_delete.add_argument('--type',    type=str, required=True,  help="specify the type of the rrset (A, MX, TXT, ...)")
-parser_rrset_delete.add_argument('--subname', type=str, required=True,  help="specify the sub-domain / host-part for the rrset")
-parser_rrset_delete.add_argument("--debug",   action='store_true',      help="show debug information")
-
-# start parsing args
-args = parser.parse_args()
-
-if args.debug:
-    print(args)
+def add_domain_parser(subparsers):
+    """
+    Function to add the parser of the "domain" command and its actions
+
+    Keyword arguments:
+    subparsers -- The subparsers object of the main parser
+    """
+    parser_domain = subparsers.add_parser('domain',                         help=COMMANDS['domain'])
+    parser_domain.set_defaults(command='domain')
+    subparser_domain = parser_domain.add_subparsers(                        help="available sub-commands")
+
+    parser_domain_list = subparser_domain.add_parser('list',                help="list domains of the account")
+    parser_domain_list.set_defaults(command='domain', subcommand='list')
+    parser_domain_list.add_argument('--zone',     type=str, required=False, help="show a specific domain instead of all")
+    parser_domain_list.add_argument("--sort",     type=str, required=False, help="select the field to sort the output")
+    parser_domain_list.add_argument("--debug",    action='store_true',      help="show debug information")
+    parser_domain_list.add_argument('--format',   type=str, required=False, help="show list in specific format (short, compact, short+compact)")
+    parser_domain_list.add_argument("--no-cache", action='store_true',      help="do not use the local cache for this request")
+    parser_domain_list.add_argument('--output',   type=str, required=False, choices=OUTPUT_FORMATS, help="write the list in a machine readable format (jsonl, csv, json) instead of a table")
+
+    parser_domain_create = subparser_domain.add_parser('create',            help="create new domains in the account")
+    parser_domain_create.set_defaults(command='domain', subcommand='create')
+    parser_domain_create_zones = parser_domain_create.add_mutually_exclusive_group(required=True)
+    parser_domain_create_zones.add_argument('--zone', type=str,             help="specifies the domain name to be created")
+    parser_domain_create_zones.add_argument('--from', type=str, dest='from_file', metavar='FILE', help="create the domains in the file (one per line, - for standard input) and print the results as json lines")
+    parser_domain_create.add_argument('--rrsets', type=str, required=False, help="specify the json or yaml file containing the rrsets (subname, type, ttl, records) set in every new domain of --from")
+    parser_domain_create.add_argument('--concurrency', type=int, required=False, help="specify the number of domains created at the same time (default 10)")
+    parser_domain_create.add_argument('--retries', type=int, required=False, default=2, help="specify how often a request failing temporarily is sent again (default 2)")
+    parser_domain_create.add_argument("--debug",  action='store_true',      help="show debug information")
+
+    parser_domain_delete = subparser_domain.add_parser('delete',            help="delete domains from the account")
+    parser_domain_delete.set_defaults(command='domain', subcommand='delete')
+    parser_domain_delete_zones = parser_domain_delete.add_mutually_exclusive_group(required=True)
+    parser_domain_delete_zones.add_argument('--zone', type=str,             help="specifies the domain name to be deleted")
+    parser_domain_delete_zones.add_argument('--from', type=str, dest='from_file', metavar='FILE', help="delete the domains in the file (one per line, - for standard input) and print the results as json lines")
+    parser_domain_delete.add_argument('--concurrency', type=int, required=False, help="specify the number of domains deleted at the same time (default 10)")
+    parser_domain_delete.add_argument('--retries', type=int, required=False, default=2, help="specify how often a request failing temporarily is sent again (default 2)")
+    parser_domain_delete.add_argument("--debug",  action='store_true',      help="show debug information")
+
+
+def add_rrset_parser(subparsers):
+    """
+    Function to add the parser of the "rrset" command and its actions
+
+    Keyword arguments:
+    subparsers -- The subparsers object of the main parser
+    """
+    parser_rrset = subparsers.add_parser('rrset',                           help=COMMANDS['rrset'])
+    parser_rrset.set_defaults(command='rrset')
+    subparser_rrset = parser_rrset.add_subparsers(                          help="available sub-commands")
+
+    parser_rrset_list = subparser_rrset.add_parser('list',                  help="list rrsets for a domain")
+    # zones is set when the domains of --zones-from are split by account
+    parser_rrset_list.set_defaults(command='rrset', subcommand='list', zones=None)
+    parser_rrset_list_zones = parser_rrset_list.add_mutually_exclusive_group(required=True)
+    parser_rrset_list_zones.add_argument('--zone',      type=str,           help="specify the domain / zone to list the rrsets for")
+    parser_rrset_list_zones.add_argument('--all-zones', action='store_true', help="list the rrsets of all domains of the account")
+    parser_rrset_list_zones.add_argument('--zones-from', type=str,          help="list the rrsets of all domains in the file (one per line)")
+    parser_rrset_list.add_argument('--concurrency', type=int, required=False, help="specify the number of domains requested at the same time (default 10)")
+    parser_rrset_list.add_argument('--type',      type=str, required=False, action='append', help="filter the rrsets by type (A, MX, TXT, ...), repeat or separate by comma for several types")
+    parser_rrset_list.add_argument('--subname',   type=str, required=False, action='append', help="filter the rrsets by sub-domain / host-part (www, ..., @ for the domain itself), repeat or separate by comma for several")
+    parser_rrset_list.add_argument('--subname-match', type=str, required=False, action='append', help="filter the rrsets by a glob pattern of the sub-domain (like 'www*' or '_acme-challenge.*'), repeatable")
+    parser_rrset_list.add_argument("--sort",      type=str, required=False, help="select the field to sort the output")
+    parser_rrset_list.add_argument("--debug",     action='store_true',      help="show debug information")
+    parser_rrset_list.add_argument('--format',    type=str, required=False, help="show list in specific format (short, compact, short+compact, bind)")
+    parser_rrset_list.add_argument("--no-cache",  action='store_true',      help="do not use the local cache for this request")
+    parser_rrset_list.add_argument('--output',    type=str, required=False, choices=OUTPUT_FORMATS, help="write the list in a machine readable format (jsonl, csv, json) instead of a table")
+
+    parser_rrset_create = subparser_rrset.add_parser('create',              help="create a new rrsets for a domain")
+    parser_rrset_create.set_defaults(command='rrset', subcommand='create')
+    parser_rrset_create.add_argument('--zone',    type=str, required=True,  help="specify the domain / zone to add the rrsets to")
+    parser_rrset_create.add_argument('--type',    type=str, required=True,  help="specify the type of the rrset (A, MX, TXT, ...)")
+    parser_rrset_create.add_argument('--ttl',     type=int, required=True,  help="specify the ttl in seconds for the rrset")
+    parser_rrset_create.add_argument('--subname', type=str, required=True,  help="specify the sub-domain / host-part for the rrset")
+    parser_rrset_create.add_argument('--records', type=str, required=True,  help="specify the records as comma separated list. Text records must contain quotes which requires to state the argument douple-quoted like this '\"Text Record 1\",\"Text Record 2\"' while MX records contain a priority and a text component, the priority should be outside the second quotes like this '10 smtp1.domain.tld,20 smtp2.domain.tld.'")
+    parser_rrset_create.add_argument("--debug",   action='store_true',      help="show debug information")
+
+    parser_rrset_modify = subparser_rrset.add_parser('modify',              help="modify a rrsets from a domain")
+    parser_rrset_modify.set_defaults(command='rrset', subcommand='modify')
+    parser_rrset_modify.add_argument('--zone',    type=str, required=True,  help="specify the domain / zone to modify the rrsets")
+    parser_rrset_modify.add_argument('--type',    type=str, required=True,  help="specify the type of the rrset (A, MX, TXT, ...)")
+    parser_rrset_modify.add_argument('--ttl',     type=int, required=False, help="specify the ttl in seconds for the rrset")
+    parser_rrset_modify.add_argument('--subname', type=str, required=True,  help="specify the sub-domain / host-part for the rrset")
+    parser_rrset_modify.add_argument('--records', type=str, required=False, help="specify the records as comma separated list. Text records must contain quotes which requires to state the argument douple-quoted like this '\"Text Record 1\",\"Text Record 2\"' while MX records contain a priority and a text component, the priority should be outside the second quotes like this '10 smtp1.domain.tld,20 smtp2.domain.tld.'")
+    parser_rrset_modify.add_argument("--debug",   action='store_true',      help="show debug information")
+
+    parser_rrset_delete = subparser_rrset.add_parser('delete',              help="delete a rrsets for a domain")
+    parser_rrset_delete.set_defaults(command='rrset', subcommand='delete')
+    parser_rrset_delete.add_argument('--zone',    type=str, required=True,  help="specify the domain / zone to modify the rrsets")
+    parser_rrset_delete.add_argument('--type',    type=str, required=True,  help="specify the type of the rrset (A, MX, TXT, ...)")
+    parser_rrset_delete.add_argument('--subname', type=str, required=True,  help="specify the sub-domain / host-part for the rrset")
+    parser_rrset_delete.add_argument("--debug",   action='store_true',      help="show debug information")
+
+    parser_rrset_apply = subparser_rrset.add_parser('apply',               help="apply many rrset changes of a domain with bulk requests")
+    parser_rrset_apply.set_defaults(command='rrset', subcommand='apply')
+    parser_rrset_apply.add_argument('--zone',     type=str, required=True,  help="specify the domain / zone to apply the changes to")
+    parser_rrset_apply.add_argument('--file',     type=str, required=True,  help="specify the json or yaml file containing the list of changes (action, subname, type, ttl, records)")
+    parser_rrset_apply.add_argument('--chunk-size', type=int, required=False, default=500, help="specify the maximum number of rrsets sent in one request (default 500)")
+    parser_rrset_apply_journal = parser_rrset_apply.add_mutually_exclusive_group()
+    parser_rrset_apply_journal.add_argument('--journal', type=str, required=False, help="write the planned and completed changes to a journal file")
+    parser_rrset_apply_journal.add_argument('--resume', type=str, required=False, metavar='JOURNAL', help="continue an interrupted run, the changes completed in the journal are skipped")
+    parser_rrset_apply.add_argument("--debug",    action='store_true',      help="show debug information")
+
+
+def add_zone_parser(subparsers):
+    """
+    Function to add the parser of the "zone" command and its actions
+
+    Keyword arguments:
+    subparsers -- The subparsers object of the main parser
+    """
+    parser_zone = subparsers.add_parser('zone',                             help=COMMANDS['zone'])
+    parser_zone.set_defaults(command='zone')
+    subparser_zone = parser_zone.add_subparsers(                            help="available sub-commands")
+
+    parser_zone_sync = subparser_zone.add_parser('sync',                    help="change the rrsets of a domain to match a file")
+    parser_zone_sync.set_defaults(command='zone', subcommand='sync')
+    parser_zone_sync.add_argument('--zone',       type=str, required=True,  help="specify the domain / zone to synchronise")
+    parser_zone_sync.add_argument('--file',       type=str, required=True,  help="specify the json or yaml file containing the list of rrsets (subname, type, ttl, records)")
+    parser_zone_sync.add_argument('--dry-run',    action='store_true',      help="only show the changes, do not apply them")
+    parser_zone_sync.add_argument('--no-delete',  action='store_true',      help="do not delete rrsets missing in the file")
+    parser_zone_sync.add_argument('--chunk-size', type=int, required=False, default=500, help="specify the maximum number of rrsets sent in one request (default 500)")
+    parser_zone_sync_journal = parser_zone_sync.add_mutually_exclusive_group()
+    parser_zone_sync_journal.add_argument('--journal', type=str, required=False, help="write the planned and completed changes to a journal file")
+    parser_zone_sync_journal.add_argument('--resume', type=str, required=False, metavar='JOURNAL', help="continue an interrupted run, the changes completed in the journal are skipped")
+    parser_zone_sync.add_argument("--debug",      action='store_true',      help="show debug information")
+
+    parser_zone_export = subparser_zone.add_parser('export',                help="write the rrsets of a domain as zone file (RFC 1035)")
+    parser_zone_export.set_defaults(command='zone', subcommand='export')
+    parser_zone_export.add_argument('--zone',     type=str, required=True,  help="specify the domain / zone to export")
+    parser_zone_export.add_argument('--file',     type=str, required=False, help="specify the zone file to write (default standard output)")
+    parser_zone_export.add_argument("--debug",    action='store_true',      help="show debug information")
+
+    parser_zone_import = subparser_zone.add_parser('import',                help="create the rrsets of a zone file (RFC 1035) in a domain")
+    parser_zone_import.set_defaults(command='zone', subcommand='import')
+    parser_zone_import.add_argument('--zone',     type=str, required=True,  help="specify the domain / zone to import the rrsets to")
+    parser_zone_import.add_argument('--file',     type=str, required=True,  help="specify the zone file to read")
+    parser_zone_import.add_argument('--ttl',      type=int, required=False, default=3600, help="specify the ttl used until the zone file sets one with $TTL (default 3600)")
+    parser_zone_import.add_argument('--chunk-size', type=int, required=False, default=500, help="specify the maximum number of rrsets sent in one request (default 500)")
+    parser_zone_import_journal = parser_zone_import.add_mutually_exclusive_group()
+    parser_zone_import_journal.add_argument('--journal', type=str, required=False, help="write the planned and completed changes to a journal file")
+    parser_zone_import_journal.add_argument('--resume', type=str, required=False, metavar='JOURNAL', help="continue an interrupted run, the changes completed in the journal are skipped")
+    parser_zone_import.add_argument("--debug",    action='store_true',      help="show debug information")
+
+
+def add_acme_parser(subparsers):
+    """
+    Function to add the parser of the "acme" command and its actions
+
+    Keyword arguments:
+    subparsers -- The subparsers object of the main parser
+    """
+    parser_acme = subparsers.add_parser('acme',                             help=COMMANDS['acme'])
+    parser_acme.set_defaults(command='acme')
+    subparser_acme = parser_acme.add_subparsers(                            help="available sub-commands")
+
+    parser_acme_publish = subparser_acme.add_parser('publish',              help="publish the TXT records of challenges and wait for the nameservers")
+    parser_acme_publish.set_defaults(command='acme', subcommand='publish')
+    parser_acme_publish.add_argument('--challenge', nargs=2, action='append', metavar=('NAME', 'TOKEN'), help="specify the certificate name and the token of a challenge (repeatable)")
+    parser_acme_publish.add_argument('--file',    type=str, required=False, help="specify the json or yaml file containing the list of challenges (name, token)")
+    parser_acme_publish.add_argument('--ttl',     type=int, required=False, default=60, help="specify the ttl of new TXT rrsets (default 60)")
+    parser_acme_publish.add_argument('--nameserver', type=str, action='append', help="specify the nameserver (host[:port]) to wait for instead of those of the domain (repeatable)")
+    parser_acme_publish.add_argument('--timeout', type=int, required=False, default=120, help="specify the seconds to wait for the nameservers (default 120)")
+    parser_acme_publish.add_argument('--no-wait', action='store_true',      help="do not wait for the nameservers")
+    parser_acme_publish.add_argument("--debug",   action='store_true',      help="show debug information")
+
+    parser_acme_cleanup = subparser_acme.add_parser('cleanup',              help="remove the TXT records of challenges")
+    parser_acme_cleanup.set_defaults(command='acme', subcommand='cleanup')
+    parser_acme_cleanup.add_argument('--challenge', nargs=2, action='append', metavar=('NAME', 'TOKEN'), help="specify the certificate name and the token of a challenge (repeatable)")
+    parser_acme_cleanup.add_argument('--file',    type=str, required=False, help="specify the json or yaml file containing the list of challenges (name, token)")
+    parser_acme_cleanup.add_argument("--debug",   action='store_true',      help="show debug information")
+
+
+def add_watch_parser(subparsers):
+    """
+    Function to add the parser of the "watch" command and its actions
+
+    Keyword arguments:
+    subparsers -- The subparsers object of the main parser
+    """
+    parser_watch = subparsers.add_parser('watch',                           help=COMMANDS['watch'])
+    parser_watch.set_defaults(command='watch', subcommand=None, no_cache=True)
+    parser_watch_zones = parser_watch.add_mutually_exclusive_group()
+    parser_watch_zones.add_argument('--zone',       type=str, action='append', help="specify the domain / zone to watch (repeatable, default all domains)")
+    parser_watch_zones.add_argument('--zones-from', type=str, required=False, help="watch the domains in the file (one per line)")
+    parser_watch.add_argument('--interval',   type=int, required=False, default=60, help="specify the seconds between two polls (default 60)")
+    parser_watch.add_argument('--state',      type=str, required=False, help="specify the file keeping the snapshot between runs")
+    parser_watch.add_argument('--initial',    action='store_true',      help="print the rrsets found by the first poll as added")
+    parser_watch.add_argument('--once',       action='store_true',      help="poll once and exit")
+    parser_watch.add_argument('--concurrency', type=int, required=False, help="specify the number of changed domains requested at the same time (default 10)")
+    parser_watch.add_argument("--debug",      action='store_true',      help="show debug information")
+
+
+def add_search_parser(subparsers):
+    """
+    Function to add the parser of the "search" command and its actions
+
+    Keyword arguments:
+    subparsers -- The subparsers object of the main parser
+    """
+    parser_search = subparsers.add_parser('search',                         help=COMMANDS['search'])
+    parser_search.set_defaults(command='search', subcommand=None, no_cache=True)
+    parser_search.add_argument('value',         type=str, nargs='?',      help="the record, address or name to search for, like 192.0.2.1 or old-lb.example.net (glob patterns with *, ? and [])")
+    parser_search.add_argument('--type',        type=str, required=False, action='append', help="filter the records by type (A, CNAME, MX, ...), repeat or separate by comma for several types")
+    parser_search.add_argument('--subname',     type=str, required=False, help="filter the records by sub-domain / host-part (glob patterns allowed, @ for the domain itself)")
+    parser_search.add_argument('--name',        type=str, required=False, help="filter the records by full name (glob patterns allowed)")
+    parser_search.add_argument('--zone',        type=str, required=False, action='append', help="search in the domain only (repeatable, default all domains)")
+    parser_search_refresh = parser_search.add_mutually_exclusive_group()
+    parser_search_refresh.add_argument('--refresh', action='store_true', help="bring the index up to date before searching, even if it is recent")
+    parser_search_refresh.add_argument('--offline', action='store_true', help="search the index as it is, without any request to the api")
+    parser_search.add_argument('--rebuild',     action='store_true',      help="request the rrsets of all domains again, even those not touched")
+    parser_search.add_argument('--max-age',     type=int, required=False, default=60, help="specify the seconds the index is used before it is refreshed (default 60)")
+    parser_search.add_argument('--index',       type=str, required=False, help="specify the index file (default ~/.cache/desec-dns-cli/index.sqlite)")
+    parser_search.add_argument('--limit',       type=int, required=False, help="specify the maximum number of records shown")
+    parser_search.add_argument('--concurrency', type=int, required=False, help="specify the number of changed domains requested at the same time (default 10)")
+    parser_search.add_argument('--output',      type=str, required=False, choices=OUTPUT_FORMATS, help="write the records in a machine readable format (jsonl, csv, json) instead of a table")
+    parser_search.add_argument("--debug",       action='store_true',      help="show debug information")
+
+
+def add_backup_parser(subparsers):
+    """
+    Function to add the parser of the "backup" command and its actions
+
+    Keyword arguments:
+    subparsers -- The subparsers object of the main parser
+    """
+    parser_backup = subparsers.add_parser('backup',                         help=COMMANDS['backup'])
+    parser_backup.set_defaults(command='backup', subcommand=None, no_cache=True)
+    parser_backup.add_argument('--dir',         type=str, required=True,  help="specify the directory keeping the snapshots")
+    parser_backup_zones = parser_backup.add_mutually_exclusive_group()
+    parser_backup_zones.add_argument('--zone',  type=str, action='append', help="specify the domain / zone to back up (repeatable, default all domains)")
+    parser_backup_zones.add_argument('--zones-from', type=str, required=False, help="back up the domains in the file (one per line)")
+    parser_backup_zones.add_argument('--list',  action='store_true',      help="list the snapshots of the account instead of taking one")
+    parser_backup.add_argument('--full',        action='store_true',      help="request the rrsets of all domains, even those not touched since the previous snapshot")
+    parser_backup.add_argument('--keep',        type=int, required=False, help="keep only the latest snapshots of the account and remove the objects no snapshot uses")
+    parser_backup.add_argument('--concurrency', type=int, required=False, help="specify the number of domains requested at the same time (default 10)")
+    parser_backup.add_argument("--debug",       action='store_true',      help="show debug information")
+
+
+def add_restore_parser(subparsers):
+    """
+    Function to add the parser of the "restore" command and its actions
+
+    Keyword arguments:
+    subparsers -- The subparsers object of the main parser
+    """
+    parser_restore = subparsers.add_parser('restore',                       help=COMMANDS['restore'])
+    parser_restore.set_defaults(command='restore', subcommand=None, no_cache=True)
+    parser_restore.add_argument('--dir',        type=str, required=True,  help="specify the directory keeping the snapshots")
+    parser_restore.add_argument('--snapshot',   type=str, required=False, help="specify the snapshot to restore (name or manifest file, default the latest of the account)")
+    parser_restore_zones = parser_restore.add_mutually_exclusive_group(required=True)
+    parser_restore_zones.add_argument('--zone', type=str, action='append', help="specify the domain / zone to restore (repeatable)")
+    parser_restore_zones.add_argument('--zones-from', type=str,           help="restore the domains in the file (one per line)")
+    parser_restore_zones.add_argument('--all-zones', action='store_true', help="restore all domains of the snapshot")
+    parser_restore.add_argument('--dry-run',    action='store_true',      help="only show the changes, do not apply them")
+    parser_restore.add_argument('--no-delete',  action='store_true',      help="do not delete rrsets missing in the snapshot")
+    parser_restore.add_argument('--force',      action='store_true',      help="compare the rrsets of all domains, even those not touched since the snapshot")
+    parser_restore.add_argument('--chunk-size', type=int, required=False, default=500, help="specify the maximum number of rrsets sent in one request (default 500)")
+    parser_restore.add_argument('--concurrency', type=int, required=False, help="specify the number of domains restored at the same time (default 10)")
+    parser_restore.add_argument("--debug",      action='store_true',      help="show debug information")
+
+
+def add_serve_parser(subparsers):
+    """
+    Function to add the parser of the "serve" command and its actions
+
+    Keyword arguments:
+    subparsers -- The subparsers object of the main parser
+    """
+    parser_serve = subparsers.add_parser('serve',                           help=COMMANDS['serve'])
+    parser_serve.set_defaults(command='serve', subcommand=None)
+    parser_serve.add_argument('--socket',     type=str, required=False, help="specify the unix socket to listen on (default " + DEFAULT_SOCKET + ")")
+    parser_serve.add_argument('--stdin',      action='store_true',      help="read the commands from standard input instead of a socket")
+    parser_serve.add_argument("--debug",      action='store_true',      help="show debug information")
+
+
+def command_name(argv):
+    """
+    Function to find the command of a command line without parsing it
+    Return: string (None if no known command is given)
+
+    Keyword arguments:
+    argv -- The list of command line arguments (without the script name)
+    """
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg in GLOBAL_VALUE_OPTIONS:
+            # the next argument is the value of the option
+            skip = True
+        elif arg in COMMANDS:
+            return arg
+        elif not arg.startswith("-"):
+            return None
+    return None
+
+
+def build_parser(command=None):
+    """
+    Function to create the parser for the commands, actions and options
+    Only the actions and options of the given command are added, the other
+    commands get an empty parser for the help. Building the whole tree
+    takes longer than parsing a single command line.
+    Return: argparse.ArgumentParser object
+
+    Keyword arguments:
+    command -- The command to build the parser for (default None, all commands)
+    """
+    # create argparser
+    parser = argparse.ArgumentParser(description="A python script utilysing the deSEC DNS api to manipulate DNS resource records from the command line.")
+
+    parser.add_argument('--stats',        action='store_true',      help="show the latency, throughput and errors of the api requests at the end")
+    parser.add_argument('--stats-format', type=str, required=False, default='table', choices=('table', 'json', 'prometheus'), help="select the format of the statistics (default table)")
+    parser.add_argument('--stats-file',   type=str, required=False, help="write the statistics to a file instead of standard error")
+    parser.add_argument('--account',      type=str, required=False, help="select the account of the settings file (NAME or all, default the account holding --zone or the default_account)")
+
+    # add subparsers
+    subparsers = parser.add_subparsers()
+    add_parsers = {'domain': add_domain_parser, 'rrset': add_rrset_parser, 'zone': add_zone_parser,
+                   'acme': add_acme_parser, 'watch': add_watch_parser, 'search': add_search_parser,
+                   'backup': add_backup_parser, 'restore': add_restore_parser, 'serve': add_serve_parser}
+    for name in COMMANDS:
+        if command is None or name == command:
+            add_parsers[name](subparsers)
+        else:
+            subparsers.add_parser(name, help=COMMANDS[name])
 
+    return parser
 
 
 
 # ##############################################################################
 
-# Read settings from config file
-if not os.path.isfile("desec-dns-cli.yml"):
-    print("ERROR: The settings file 'desec-dns-cli.yml' is missing.")
-    print("Please refer to the example config file and the README for more details.")
-    exit()
 
-with open("desec-dns-cli.yml", "r") as stream:
+def settings_cache_file(filename):
+    """
+    Function to get the cache file of a settings file
+    Return: tuple of the cache file name and the key of the current version of the settings file
+
+    Keyword arguments:
+    filename -- The settings file
+    """
+    path = os.path.abspath(filename)
+    info = os.stat(path)
+    name = hashlib.sha256(path.encode('utf-8')).hexdigest()[:16] + ".json"
+    return os.path.join(SETTINGS_CACHE, name), [path, info.st_mtime_ns, info.st_size]
+
+
+def load_cached_settings(filename):
+    """
+    Function to read the parsed settings of a settings file from the cache
+    Return: dict (None if the cache is missing or the file changed since)
+
+    Keyword arguments:
+    filename -- The settings file
+    """
+    cache, key = settings_cache_file(filename)
+    try:
+        with open(cache, "r") as stream:
+            data = json.load(stream)
+    except (OSError, ValueError):
+        return None
+    if data.get('key') != key:
+        return None
+    return data['settings']
+
+
+def save_cached_settings(filename, settings):
+    """
+    Function to keep the parsed settings of a settings file in the cache
+    The cache file holds the api tokens, it is only readable by the user.
+    Settings json can not represent (like dates) are not cached.
+
+    Keyword arguments:
+    filename -- The settings file
+    settings -- The parsed settings
+    """
+    cache, key = settings_cache_file(filename)
     try:
-        settings = yaml.load(stream, Loader=yaml.FullLoader)
-    except yaml.YAMLError as exc:
-        print("ERROR: The settings file 'desec-dns-cli.yml' is invalid YAML syntax.")
+        data = json.dumps({'key': key, 'settings': settings})
+    except (TypeError, ValueError):
+        return
+    try:
+        if not os.path.isdir(SETTINGS_CACHE):
+            os.makedirs(SETTINGS_CACHE, 0o700)
+        temp = cache + "." + str(os.getpid())
+        with os.fdopen(os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as stream:
+            stream.write(data)
+        os.replace(temp, cache)
+    except OSError:
+        # without a writable cache directory the settings are parsed every time
+        pass
+
+
+def read_settings(filename="desec-dns-cli.yml"):
+    """
+    Function to read the settings from the config file
+    Return: dict (exits on error)
+
+    Keyword arguments:
+    filename -- The config file to read (default 'desec-dns-cli.yml')
+    """
+    if not os.path.isfile(filename):
+        print("ERROR: The settings file '" + filename + "' is missing.")
+        print("Please refer to the example config file and the README for more details.")
+        sys.exit()
+
+    # the settings parsed before are used as long as the file is not changed
+    settings = load_cached_settings(filename)
+    if settings is None:
+        import yaml
+        with open(filename, "r") as stream:
+            try:
+                # the C parser of libyaml is much faster, if pyyaml was built with it
+                settings = yaml.load(stream, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+            except yaml.YAMLError as exc:
+                print("ERROR: The settings file '" + filename + "' is invalid YAML syntax.")
+                print("Please refer to the example config file and the README for more details.")
+                sys.exit()
+        save_cached_settings(filename, settings)
+
+    accounts = settings.get('accounts')
+    if accounts is not None and not isinstance(accounts, dict):
+        print("ERROR: The 'accounts' settings in the '" + filename + "' config file has to map account names to their settings.")
         print("Please refer to the example config file and the README for more details.")
-        exit()
+        sys.exit()
+
+    for setting in ('api_url', 'api_token'):
+        if accounts:
+            for name in accounts:
+                if setting not in (accounts[name] or dict()) and setting not in settings:
+                    print("ERROR: The '" + setting + "' settings of the account '" + name + "' is missing in the '" + filename + "' config file.")
+                    print("Please refer to the example config file and the README for more details.")
+                    sys.exit()
+        elif setting not in settings:
+            print("ERROR: The '" + setting + "' settings is missing in the '" + filename + "' config file.")
+            print("Please refer to the example config file and the README for more details.")
+            sys.exit()
+
+    if accounts and settings.get('default_account') and settings['default_account'] not in accounts:
+        print("ERROR: The default_account '" + settings['default_account'] + "' is not defined in the '" + filename + "' config file.")
+        sys.exit()
+
+    return settings
+
+
+def get_concurrency(settings, args):
+    """
+    Function to get the number of concurrent requests for multi-zone operations
+    Return: int
+
+    Keyword arguments:
+    settings -- The dict of settings read from the config file
+    args -- The parsed command line arguments
+    """
+    if getattr(args, 'concurrency', None):
+        return args.concurrency
+    return settings.get('concurrency', 10)
+
+
+def create_api(settings, args):
+    """
+    Function to create the api object from the settings
+    Return: tuple of deSEC_DNS_API object and the number of concurrent requests
+
+    Keyword arguments:
+    settings -- The dict of settings read from the config file
+    args -- The parsed command line arguments
+    """
+    from desec_dns_api import deSEC_DNS_API
+    from desec_dns_cache import deSEC_DNS_Cache
+
+    # Optional connection pool and rate limit settings
+    api_settings = dict()
+    for setting in ('pool_size', 'keep_alive', 'timeout_connect', 'timeout_read', 'rate_limits', 'max_retries', 'single_flight'):
+        if setting in settings:
+            api_settings[setting] = settings[setting]
+
+    # Number of concurrent requests for multi-zone operations
+    concurrency = get_concurrency(settings, args)
+    if concurrency > api_settings.get('pool_size', 10):
+        # keep a connection for every concurrent request
+        api_settings['pool_size'] = concurrency
+
+    # Optional local cache of read responses
+    cache_settings = settings.get('cache') or dict()
+    if cache_settings.get('enabled') and not getattr(args, 'no_cache', False):
+        api_settings['cache'] = deSEC_DNS_Cache(path=cache_settings.get('path'), ttl=cache_settings.get('ttl', 60),
+                                                max_entries=cache_settings.get('max_entries', 1000))
+
+    # Instantiate deSEC API object
+    api = deSEC_DNS_API(api_url=settings['api_url'], api_token=settings['api_token'], debug=args.debug, **api_settings)
+    return api, concurrency
+
+
+
+def create_accounts(settings, args, stats=None):
+    """
+    Function to create the accounts of the settings, their api objects are created on first use
+    Return: AccountSet object
+
+    Keyword arguments:
+    settings -- The dict of settings read from the config file
+    args -- The parsed command line arguments
+    stats -- The StatsCollector object registered on every api object (default None)
+    """
+    from desec_dns_accounts import AccountSet, account_names, account_settings, DEFAULT_INDEX
+
+    def create_account_api(name):
+        api = create_api(account_settings(settings, name), args)[0]
+        if stats:
+            stats.register(api)
+        return api
+
+    names = account_names(settings)
+    index_settings = settings.get('zone_index') or dict()
+    # the index is only used for the same urls and tokens, they are hashed, never stored
+    fingerprint = "\0".join(account_settings(settings, name)['api_url'] + "\0" + account_settings(settings, name)['api_token'] for name in names)
+    return AccountSet(names, create_account_api,
+                      index_path=os.path.expanduser(index_settings.get('path', DEFAULT_INDEX)),
+                      index_ttl=index_settings.get('ttl', 86400), fingerprint=fingerprint)
+
+
+def select_accounts(accounts, settings, args):
+    """
+    Function to select the accounts a command is executed for
+    An account given with --account is used. Otherwise a command for a
+    single existing domain (--zone) is routed to the account holding it with
+    the zone index, other commands use the default_account. Listing domains
+    and rrsets runs for all accounts with --account all or without
+    default_account.
+    Return: list of account names (exits on error)
+
+    Keyword arguments:
+    accounts -- The AccountSet object
+    settings -- The dict of settings read from the config file
+    args -- The parsed command line arguments
+    """
+    from desec_dns_api import deSEC_DNS_Error
+
+    if args.account and args.account != "all":
+        if args.account not in accounts.names:
+            print("ERROR: The account '" + args.account + "' is not defined in the settings file (" + ", ".join(accounts.names) + ").")
+            sys.exit()
+        return [args.account]
+
+    zone = getattr(args, 'zone', None)
+    if isinstance(zone, str) and not (args.command == "domain" and args.subcommand == "create"):
+        try:
+            name = accounts.account_for(zone)
+        except deSEC_DNS_Error as err:
+            print("Error: The request failed with " + str(err.response.http_code) + ": " + err.response.http_errmsg + "'\n   " + err.response.http_body)
+            sys.exit()
+        if name is None:
+            print("ERROR: The domain '" + zone + "' does not belong to any account of the settings file.")
+            sys.exit()
+        return [name]
+
+    listing = (args.command in ("domain", "rrset") and args.subcommand == "list") or args.command in ("search", "backup")
+    if args.account == "all":
+        if not listing:
+            print("ERROR: Only 'domain list', 'rrset list', 'search' and 'backup' can be executed for all accounts, select one with --account NAME.")
+            sys.exit()
+        return list(accounts.names)
+    if settings.get('default_account'):
+        return [settings['default_account']]
+    if listing:
+        return list(accounts.names)
+    print("ERROR: Please select the account with --account (" + ", ".join(accounts.names) + ").")
+    sys.exit()
+
+
+class ThreadOutput(object):
+    """
+    Class replacing sys.stdout while a command is executed for several accounts at once
+    Every thread that called capture writes to its own buffer, all other
+    threads write to the original stream.
+    """
+
+    def __init__(self, stream):
+        """
+        Initially set the original stream
+
+        Keyword arguments:
+        stream -- The original sys.stdout
+        """
+        super(ThreadOutput, self).__init__()
+        self.stream = stream
+        self.local = threading.local()
+
+
+    def capture(self):
+        """
+        Function to send the output of the current thread to a new buffer
+        Return: io.StringIO object
+        """
+        self.local.buffer = io.StringIO()
+        return self.local.buffer
+
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        return (self.stream if buffer is None else buffer).write(text)
+
+
+    def flush(self):
+        if getattr(self.local, 'buffer', None) is None:
+            self.stream.flush()
+
+
+def run_accounts(accounts, names, settings, args):
+    """
+    Function to execute a command for the selected accounts
+    Several accounts run concurrently, every account with its own api
+    object, connection pool and rate limits. Their output is collected and
+    printed in the order of the accounts.
+
+    Keyword arguments:
+    accounts -- The AccountSet object
+    names -- The list of account names (see select_accounts)
+    settings -- The dict of settings read from the config file
+    args -- The parsed command line arguments
+    """
+    from desec_dns_accounts import account_settings
+
+    # split the domains of --zones-from by the account holding them
+    zones = dict()
+    if len(names) > 1 and args.command == "rrset" and getattr(args, 'zones_from', None):
+        with open(args.zones_from, "r") as stream:
+            grouped, unknown = accounts.group_zones([line.strip() for line in stream if line.strip() and not line.startswith("#")])
+        for zone in unknown:
+            print("ERROR: The domain '" + zone + "' does not belong to any account of the settings file.")
+        names = [name for name in names if name in grouped]
+        zones = grouped
+
+    def run(name, api):
+        account_args = argparse.Namespace(**vars(args))
+        if name in zones:
+            account_args.zones = zones[name]
+        run_command(account_args, api, get_concurrency(account_settings(settings, name), account_args))
+
+    if len(names) == 1:
+        try:
+            run(names[0], accounts.api(names[0]))
+        finally:
+            if args.command == "domain" and args.subcommand in ("create", "delete"):
+                if args.from_file:
+                    # many domains changed, the index is built again when it is used next
+                    accounts.reset_index()
+                else:
+                    accounts.forget_zone(args.zone)
+        return
+
+    output = ThreadOutput(sys.stdout)
+
+    def run_captured(name, api):
+        buffer = output.capture()
+        try:
+            run(name, api)
+        except SystemExit:
+            pass
+        except Exception as err:
+            print("ERROR: The command failed with " + repr(err))
+        return buffer.getvalue()
+
+    sys.stdout = output
+    try:
+        results = accounts.map(run_captured, names)
+    finally:
+        sys.stdout = output.stream
+    for name, text in zip(names, results):
+        if not getattr(args, 'output', None):
+            print("Account: " + name)
+        sys.stdout.write(text)
 
-if 'api_url' in settings:
-    api_url = settings['api_url']
-else:
-    print("ERROR: The 'api_url' settings is missing in the 'desec-dns-cli.yml' config file.")
-    print("Please refer to the example config file and the README for more details.")
-    exit()
 
-if 'api_token' in settings:
-    api_token = settings['api_token']
-else:
-    print("ERROR: The 'api_token' settings is missing in the 'desec-dns-cli.yml' config file.")
-    print("Please refer to the example config file and the README for more details.")
-    exit()
 
+# ##############################################################################
 
-# Instantiate deSEC API object
-api = deSEC_DNS_API(api_url=api_url, api_token=api_token, debug=args.debug)
 
-# ##############################################################################
+def read_data_file(filename, list_key):
+    """
+    Function to read a list of entries from a json or yaml file
+    Return: list of dicts (exits on error)
+
+    Keyword arguments:
+    filename -- The json or yaml file to read
+    list_key -- The key holding the list if the file contains a dict
+    """
+    if not os.path.isfile(filename):
+        print("ERROR: The file '" + filename + "' is missing.")
+        sys.exit()
+    import yaml
+    with open(filename, "r") as stream:
+        try:
+            if filename.endswith(".json"):
+                data = json.load(stream)
+            else:
+                data = yaml.safe_load(stream)
+        except (ValueError, yaml.YAMLError) as exc:
+            print("ERROR: The file '" + filename + "' could not be parsed: " + str(exc))
+            sys.exit()
+    if isinstance(data, dict):
+        data = data.get(list_key, [])
+    return data or []
+
+
+def read_challenges(args):
+    """
+    Function to collect the ACME challenges given on the command line and in a file
+    Return: list of tuples (name, token) (exits on error)
+
+    Keyword arguments:
+    args -- The parsed command line arguments
+    """
+    challenges = [tuple(challenge) for challenge in args.challenge or []]
+    if args.file:
+        for entry in read_data_file(args.file, 'challenges'):
+            if 'name' not in entry or 'token' not in entry:
+                print("ERROR: Every challenge needs a 'name' and a 'token': " + str(entry))
+                sys.exit()
+            challenges.append((entry['name'], entry['token']))
+    if not challenges:
+        print("ERROR: No challenges given, use --challenge or --file.")
+        sys.exit()
+    return challenges
+
+
+def open_journal(args):
+    """
+    Function to open the journal of a bulk command (--journal or --resume)
+    Return: Journal object (None if no journal is used, exits on error)
+
+    Keyword arguments:
+    args -- The parsed command line arguments
+    """
+    from desec_dns_journal import Journal
+
+    if args.resume:
+        if not os.path.isfile(args.resume):
+            print("ERROR: The journal '" + args.resume + "' is missing.")
+            sys.exit()
+        return Journal(args.resume, resume=True)
+    if args.journal:
+        return Journal(args.journal)
+    return None
+
+
+
+def read_zone_lines(stream, invalid):
+    """
+    Generator reading the domains of a file line by line
+    A line holds a domain name or a json object with 'name' and 'rrsets'
+    (the initial rrsets of this domain). Empty lines and comments are
+    skipped, invalid lines are reported and counted.
+    Return: generator of strings or dicts
+
+    Keyword arguments:
+    stream -- The open file (or standard input)
+    invalid -- List the invalid lines are appended to
+    """
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if not line.startswith("{"):
+            yield line
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            item = None
+        if not isinstance(item, dict) or not item.get('name'):
+            sys.stderr.write("ERROR: Expected a domain name or a json object with 'name': " + line + "\n")
+            invalid.append(line)
+            continue
+        yield item
+
+
+def run_domains_from(args, api, concurrency):
+    """
+    Function to create or delete the domains of a file (--from) and print the results as json lines
+    The results are printed as soon as the domains are done, the summary
+    is written to standard error. Exits with 1 if a domain failed.
+
+    Keyword arguments:
+    args -- The parsed command line arguments
+    api -- The deSEC_DNS_API object
+    concurrency -- The number of domains in progress at the same time
+    """
+    rrsets = None
+    if args.subcommand == "create" and args.rrsets:
+        rrsets = read_data_file(args.rrsets, 'rrsets')
+        invalid = [rrset for rrset in rrsets if 'type' not in rrset]
+        if invalid:
+            print("ERROR: Every rrset needs a 'type': " + str(invalid[0]))
+            return
+        if not check_changes(rrsets):
+            return
+
+    stream = sys.stdin
+    if args.from_file != "-":
+        if not os.path.isfile(args.from_file):
+            print("ERROR: The file '" + args.from_file + "' is missing.")
+            return
+        stream = open(args.from_file, "r")
+
+    invalid = list()
+    counts = {'ok': 0, 'failed': 0}
+    try:
+        zones = read_zone_lines(stream, invalid)
+        if args.subcommand == "create":
+            results = api.domain_create_many(zones, rrsets=rrsets, concurrency=concurrency, retries=args.retries)
+        else:
+            results = api.domain_delete_many(zones, concurrency=concurrency, retries=args.retries)
+        for result in results:
+            counts[result['status']] += 1
+            sys.stdout.write(json.dumps(result) + "\n")
+            sys.stdout.flush()
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    action = "created" if args.subcommand == "create" else "deleted"
+    sys.stderr.write(str(counts['ok']) + " domains " + action + " successfully, " + str(counts['failed']) + " failed, "
+                     + str(len(invalid)) + " invalid lines.\n")
+    if counts['failed'] or invalid:
+        sys.exit(1)
+
+
+
+def check_changes(changes):
+    """
+    Function to check the rrset changes of a file before any request is sent
+    Every invalid change is printed with its error.
+    Return: boolean (True if all changes are valid)
+
+    Keyword arguments:
+    changes -- List of change dicts (action, subname, type, ttl, records)
+    """
+    from desec_dns_records import validate_changes
+
+    invalid = validate_changes(changes)[1]
+    for change, error in invalid:
+        print("ERROR: " + str(change.get('subname') or '@') + " " + str(change.get('type')) + ": " + error)
+    if invalid:
+        print(str(len(invalid)) + " of " + str(len(changes)) + " rrsets are invalid, nothing was sent.")
+    return not invalid
+
+
+def print_bulk_results(results, column_order=None):
+    """
+    Function to print the results of rrset_bulk as table
+
+    Keyword arguments:
+    results -- The list of result dicts returned by rrset_bulk
+    column_order -- The columns to print (default action, subname, type, status and error)
+    """
+    from tabulate import tabulate
+
+    if column_order is None:
+        column_order = ["action","subname","type","status","error"]
+    res_dict_ordered = [{key: row[key] for key in column_order} for row in results]
+    print(tabulate(res_dict_ordered, headers="keys", showindex="always", tablefmt="grid"))
+
+    failed = len([result for result in results if result['status'] != 'ok'])
+    print(str(len(results) - failed) + " rrsets applied successfully, " + str(failed) + " failed.")
+
+
+
+def split_values(values, apex=False, upper=False):
+    """
+    Function to split the values of a repeatable, comma separated option
+    Return: list of strings (None if the option was not given)
+
+    Keyword arguments:
+    values -- The list of option values (None if not given)
+    apex -- Replace '@' by '' (the subname of the domain itself) (default False)
+    upper -- Convert the values to upper case, used for rrset types (default False)
+    """
+    if not values:
+        return None
+    result = [value.strip() for item in values for value in item.split(",")]
+    if upper:
+        result = [value.upper() for value in result]
+    if apex:
+        result = ['' if value == '@' else value for value in result]
+    return result
+
+
+
+def print_rrset_table(rrsets, column_order, tbidx, tblf):
+    """
+    Function to print rrsets as one table
+    Only the ttl column is checked for numbers, parsing every cell of the
+    other columns as number is slow for big rrset lists.
+    Return: int (number of rrsets printed)
+
+    Keyword arguments:
+    rrsets -- Iterable of rrset dicts or RRset objects
+    column_order -- The columns to print
+    tbidx -- The showindex option of tabulate ("always" or "never")
+    tblf -- The table format of tabulate
+    """
+    from tabulate import tabulate
+
+    rows = [['\n'.join(rrset[key]) if key == "records" else rrset[key] for key in column_order] for rrset in rrsets]
+    if not rows:
+        return 0
+    offset = 1 if tbidx == "always" else 0
+    numparse = [index + offset for index, key in enumerate(column_order) if key != "ttl"]
+    print(tabulate(rows, headers=column_order, showindex=tbidx, tablefmt=tblf, disable_numparse=numparse))
+    return len(rows)
+
+
+
+def print_stats(stats, args):
+    """
+    Function to print the statistics of the api requests
+    The statistics are written to standard error (or the --stats-file), so
+    they do not mix with the output of the command.
+
+    Keyword arguments:
+    stats -- The StatsCollector object
+    args -- The parsed command line arguments
+    """
+    if args.stats_format == 'json':
+        text = stats.to_json() + "\n"
+    elif args.stats_format == 'prometheus':
+        text = stats.to_prometheus()
+    else:
+        from tabulate import tabulate
+        rows = list()
+        for row in stats.report():
+            total = row['timings']['total']
+            rows.append({'method': row['method'], 'endpoint': row['endpoint'], 'count': row['count'],
+                         'errors': row['errors'], 'retries': row['retries'], 'cached': row['cached'], 'coalesced': row['coalesced'],
+                         'req/s': round(row['throughput'], 1),
+                         'p50 ms': round(total['p50'] * 1000, 1), 'p95 ms': round(total['p95'] * 1000, 1),
+                         'p99 ms': round(total['p99'] * 1000, 1), 'ttfb p50 ms': round(row['timings']['ttfb']['p50'] * 1000, 1),
+                         'connect ms': round((row['timings']['dns']['sum'] + row['timings']['connect']['sum'] + row['timings']['tls']['sum']) * 1000, 1),
+                         'kB received': round(row['bytes_received'] / 1024.0, 1)})
+        text = tabulate(rows, headers="keys", tablefmt="grid") + "\n"
+
+    if args.stats_file:
+        with open(args.stats_file, "w") as stream:
+            stream.write(text)
+    else:
+        sys.stderr.write(text)
 
 
+def run_command(args, api, concurrency):
+    """
+    Function to execute the command and action selected on the command line
 
-#
-# DOMAIN LIST
-#
-if args.command == "domain" and args.subcommand == "list":
+    Keyword arguments:
+    args -- The parsed command line arguments
+    api -- The deSEC_DNS_API object
+    concurrency -- The number of concurrent requests for multi-zone operations
+    """
+    from desec_dns_api import deSEC_DNS_Error
 
-    ret_status = api.domain_list(zone=args.zone)
+    #
+    # DOMAIN LIST
+    #
+    if args.command == "domain" and args.subcommand == "list":
 
-    # create a plain text list from the records array
-    if ret_status:
-        # Post process the result
-        res_dict = api.get_response_dict()
-        for res_entry in res_dict:
-            # remove the keys for console output
-            res_entry.pop('keys', None)
+        ret = api.domain_list(zone=args.zone)
 
-        # Sort the array by key specified by user
-        sort_field = "name"
-        if args.sort:
-            if args.sort in res_dict[0]:
-                sort_field = args.sort
+        # create a plain text list from the records array
+        if ret:
+            # Post process the result
+            res_dict = ret.get_response_dict()
+            for res_entry in res_dict:
+                # remove the keys for console output
+                res_entry.pop('keys', None)
+
+            # Sort the array by key specified by user
+            sort_field = "name"
+            if args.sort:
+                if args.sort in res_dict[0]:
+                    sort_field = args.sort
+                else:
+                    print("\nError: Sort field specified does not exist. Fallback to default sort order.\n")
+            res_dict_sorted = sorted(res_dict, key=lambda k: k[sort_field])
+
+            column_order = ["created","published","touched","name","minimum_ttl"]
+            tblf = "grid"
+            tbidx = "always"
+            if args.format:
+                if "compact" in args.format:
+                    tblf="outline"
+                else:
+                    tblf = "grid"
+
+                if "short" in args.format:
+                    column_order = ["name","minimum_ttl"]
+                    tbidx = "always"
+
+            # print the result as table or in a machine readable format
+            if args.output:
+                write_rows(sys.stdout, res_dict_sorted, column_order, args.output)
             else:
-                print("\nError: Sort field specified does not exist. Fallback to default sort order.\n")
-        res_dict_sorted = sorted(res_dict, key=lambda k: k[sort_field])
+                from tabulate import tabulate
+                res_dict_sorted_ordered = [{key: row[key] for key in column_order} for row in res_dict_sorted]
+                print(tabulate(res_dict_sorted_ordered, headers="keys", showindex=tbidx, tablefmt=tblf))
+        else:
+            print("Error: The request failed with " + str(ret.http_code) + ": " + ret.http_errmsg)
 
-        column_order = ["created","published","touched","name","minimum_ttl"]
-        tblf = "grid"
-        tbidx = "always"
-        if args.format:
-            if "compact" in args.format:
-                tblf="outline"
-            else:
-                tblf = "grid"
 
-            if "short" in args.format:
-                column_order = ["name","minimum_ttl"]
-                tbidx = "always"
+    #
+    # DOMAIN CREATE
+    #
+    if args.command == "domain" and args.subcommand == "create" and args.from_file:
 
-        # print the result as table
-        res_dict_sorted_ordered = [{key: row[key] for key in column_order} for row in res_dict_sorted]
-        print(tabulate(res_dict_sorted_ordered, headers="keys", showindex=tbidx, tablefmt=tblf))
-    else:
-        print("Error: The request failed with " + str(api.http_code) + ": " + api.http_errmsg)
+        run_domains_from(args, api, concurrency)
 
+    elif args.command == "domain" and args.subcommand == "create":
 
-#
-# DOMAIN CREATE
-#
-if args.command == "domain" and args.subcommand == "create":
+        ret = api.domain_create(zone=args.zone)
 
-    ret_status = api.domain_create(zone=args.zone)
+        # create a plain text list from the records array
+        if ret:
+            from tabulate import tabulate
+            # Post process the result
+            res_dict = ret.get_response_dict()
+            for res_entry in res_dict:
+                # remove the keys for console output
+                res_entry.pop('keys', None)
+            print(tabulate(res_dict, headers='keys', showindex="always", tablefmt="grid"))
+        else:
+            print("Error: The request failed with '" + str(ret.http_code) + ": " + ret.http_errmsg + "'\n   " + ret.http_body)
 
-    # create a plain text list from the records array
-    if ret_status:
-        # Post process the result
-        res_dict = api.get_response_dict()
-        for res_entry in res_dict:
-            # remove the keys for console output
-            res_entry.pop('keys', None)
-        print(tabulate(res_dict, headers='keys', showindex="always", tablefmt="grid"))
-    else:
-        print("Error: The request failed with '" + str(api.http_code) + ": " + api.http_errmsg + "'\n   " + api.http_body)
 
+    #
+    # DOMAIN DELETE
+    #
+    if args.command == "domain" and args.subcommand == "delete" and args.from_file:
 
-#
-# DOMAIN DELETE
-#
-if args.command == "domain" and args.subcommand == "delete":
+        run_domains_from(args, api, concurrency)
 
-    ret_status = api.domain_delete(zone=args.zone)
-    if ret_status:
-        print("Delete executed successfully.")
-    else:
-        print("Delete failed with '" + str(api.http_code) + " " + api.http_errmsg + "'\n   " + api.http_body)
+    elif args.command == "domain" and args.subcommand == "delete":
 
+        ret = api.domain_delete(zone=args.zone)
+        if ret:
+            print("Delete executed successfully.")
+        else:
+            print("Delete failed with '" + str(ret.http_code) + " " + ret.http_errmsg + "'\n   " + ret.http_body)
 
 
 
 
-# ##############################################################################
 
+    # ##############################################################################
 
-#
-# RRSET LIST
-#
-if args.command == "rrset" and args.subcommand == "list":
 
-    ret_status = api.rrset_list(zone=args.zone, type=args.type, subname=args.subname)
+    #
+    # RRSET LIST
+    #
+    if args.command == "rrset" and args.subcommand == "list":
 
-    # create a plain text list from the records array
-    if ret_status:
-        # Post process the result
-        res_dict = api.get_response_dict()
-        for res_entry in res_dict:
-            # prepare "records" for console output
-            res_entry['records'] = '\n'.join(res_entry['records'])
+        # select the domains to list the rrsets for
+        if args.zones:
+            zones = args.zones
+        elif args.all_zones:
+            ret = api.domain_list()
+            if not ret:
+                print("Error: The request failed with " + str(ret.http_code) + ": " + ret.http_errmsg + "'\n   " + ret.http_body)
+                return
+            zones = [domain['name'] for domain in ret.get_response_dict()]
+        elif args.zones_from:
+            with open(args.zones_from, "r") as stream:
+                zones = [line.strip() for line in stream if line.strip() and not line.startswith("#")]
+        else:
+            zones = [args.zone]
 
-        # Sort the array by key specified by user
-        sort_field = "name"
-        if args.sort:
-            if args.sort in res_dict[0]:
-                sort_field = args.sort
-            else:
-                print("\nError: Sort field specified does not exist. Fallback to default sort order.\n")
-        res_dict_sorted = sorted(res_dict, key=lambda k: k[sort_field])
+        types = split_values(args.type, upper=True)
+        subnames = split_values(args.subname, apex=True)
 
         column_order = ["created","touched","domain","subname","name","ttl","type","records"]
         tbidx = "always"
@@ -257,58 +1147,627 @@ if args.command == "rrset" and args.subcommand == "list":
                 tblf = "plain"
                 tbidx = "never"
 
-        res_dict_sorted_ordered = [{key: row[key] for key in column_order} for row in res_dict_sorted]
-        print(tabulate(res_dict_sorted_ordered, headers="keys", showindex=tbidx, tablefmt=tblf))
-    else:
-        print("Error: The request failed with " + str(api.http_code) + ": " + api.http_errmsg + "'\n   " + api.http_body)
-
-#
-# RRSET CREATE
-#
-if args.command == "rrset" and args.subcommand == "create":
-
-    ret_status = api.rrset_create(zone=args.zone, type=args.type, subname=args.subname, records=args.records, ttl=args.ttl)
-
-    # create a plain text list from the records array
-    if ret_status:
-        res_dict = api.get_response_dict()
-        # Post process the result
-        for res_entry in res_dict:
-            # prepare "records" for console output
-            res_entry['records'] = '\n'.join(res_entry['records'])
-        print(tabulate(res_dict, headers='keys', showindex="always", tablefmt="grid"))
-    else:
-        print("Error: The request failed with " + str(api.http_code) + ": " + api.http_errmsg + "'\n   " + api.http_body)
-
+        if len(zones) == 1 and not args.sort and args.output:
+            # stream the rrsets of a single domain row by row as they arrive (in the order of the api)
+            try:
+                write_rows(sys.stdout, api.iter_rrsets(zone=zones[0], type=types, subname=subnames, subname_pattern=args.subname_match), column_order, args.output)
+            except deSEC_DNS_Error as err:
+                print("Error: The request failed with " + str(err.response.http_code) + ": " + err.response.http_errmsg + "'\n   " + err.response.http_body)
+            return
+
+        # request the rrsets of all domains and merge them into one list of compact RRset objects
+        res_dict = list()
+        pages = api.rrset_list_zones(zones=zones, type=types, subname=subnames, concurrency=concurrency, subname_pattern=args.subname_match)
+        for index, (zone, ret) in enumerate(pages):
+            if ret:
+                res_dict.extend(ret.get_response_rrsets())
+            elif len(zones) > 1:
+                print("Error: The request for '" + zone + "' failed with " + str(ret.http_code) + ": " + ret.http_errmsg + "'\n   " + ret.http_body)
+            else:
+                print("Error: The request failed with " + str(ret.http_code) + ": " + ret.http_errmsg + "'\n   " + ret.http_body)
+            # release the body of the page as soon as it is converted
+            pages[index] = None
+        del pages
+
+        # create a plain text list from the records array
+        if res_dict:
+            # Sort the array by key specified by user
+            sort_field = "name"
+            if args.sort:
+                if args.sort in res_dict[0]:
+                    sort_field = args.sort
+                else:
+                    print("\nError: Sort field specified does not exist. Fallback to default sort order.\n")
+            res_dict.sort(key=attrgetter(sort_field))
+
+            # print the result as one table (the column widths fit all rows) or in a machine readable format
+            if args.output:
+                write_rows(sys.stdout, res_dict, column_order, args.output)
+            else:
+                print_rrset_table(res_dict, column_order, tbidx, tblf)
 
-#
-# RRSET CREATE
-#
-if args.command == "rrset" and args.subcommand == "delete":
+    #
+    # RRSET CREATE
+    #
+    if args.command == "rrset" and args.subcommand == "create":
 
-    ret_status = api.rrset_delete(zone=args.zone, type=args.type, subname=args.subname)
-    if ret_status:
-        print("Delete executed successfully.")
-    else:
-        print("Delete failed with '" + str(api.http_code) + " " + api.http_errmsg + "'" + "'\n   " + api.http_body)
+        from desec_dns_records import canonical_change
 
-#
-# RRSET MODIFY
-#
-if args.command == "rrset" and args.subcommand == "modify":
+        # check the records before the request, the api would reject them with a wasted round trip
+        try:
+            rrset = canonical_change({'action': 'create', 'subname': args.subname, 'type': args.type, 'ttl': args.ttl, 'records': args.records})
+        except ValueError as err:
+            print("ERROR: " + str(err))
+            return
 
-    if args.ttl or args.records:
-        ret_status = api.rrset_modify(zone=args.zone, type=args.type, subname=args.subname, records=args.records, ttl=args.ttl)
+        ret = api.rrset_create(zone=args.zone, type=args.type, subname=args.subname, records=rrset['records'], ttl=args.ttl)
 
-        if ret_status:
-            res_dict = api.get_response_dict()
+        # create a plain text list from the records array
+        if ret:
+            from tabulate import tabulate
+            res_dict = ret.get_response_dict()
             # Post process the result
             for res_entry in res_dict:
                 # prepare "records" for console output
                 res_entry['records'] = '\n'.join(res_entry['records'])
             print(tabulate(res_dict, headers='keys', showindex="always", tablefmt="grid"))
         else:
-            print("Error: The request failed with " + str(api.http_code) + ": " + api.http_errmsg + "'\n   " + api.http_body)
+            print("Error: The request failed with " + str(ret.http_code) + ": " + ret.http_errmsg + "'\n   " + ret.http_body)
+
+
+    #
+    # RRSET CREATE
+    #
+    if args.command == "rrset" and args.subcommand == "delete":
+
+        ret = api.rrset_delete(zone=args.zone, type=args.type, subname=args.subname)
+        if ret:
+            print("Delete executed successfully.")
+        else:
+            print("Delete failed with '" + str(ret.http_code) + " " + ret.http_errmsg + "'" + "'\n   " + ret.http_body)
+
+    #
+    # RRSET MODIFY
+    #
+    if args.command == "rrset" and args.subcommand == "modify":
+
+        if args.ttl or args.records:
+            from desec_dns_records import canonical_change
+
+            try:
+                rrset = canonical_change({'action': 'modify', 'subname': args.subname, 'type': args.type, 'ttl': args.ttl, 'records': args.records})
+            except ValueError as err:
+                print("ERROR: " + str(err))
+                return
+
+            ret = api.rrset_modify(zone=args.zone, type=args.type, subname=args.subname, records=rrset.get('records'), ttl=args.ttl)
+
+            if ret:
+                from tabulate import tabulate
+                res_dict = ret.get_response_dict()
+                # Post process the result
+                for res_entry in res_dict:
+                    # prepare "records" for console output
+                    res_entry['records'] = '\n'.join(res_entry['records'])
+                print(tabulate(res_dict, headers='keys', showindex="always", tablefmt="grid"))
+            else:
+                print("Error: The request failed with " + str(ret.http_code) + ": " + ret.http_errmsg + "'\n   " + ret.http_body)
+
+        else:
+            print(sys.argv[0] + " " + args.command +": error: at least one of --ttl or --records need to be provided")
+
+
+    #
+    # RRSET APPLY
+    #
+    if args.command == "rrset" and args.subcommand == "apply":
+
+        # read the changes from the json / yaml file
+        changes = read_data_file(args.file, 'changes')
+
+        invalid = [change for change in changes if change.get('action', 'modify') not in ('create', 'modify', 'delete') or 'type' not in change]
+        if invalid:
+            print("ERROR: Every change needs a 'type' and an 'action' of create, modify or delete: " + str(invalid[0]))
+            return
+        if not check_changes(changes):
+            return
+
+        journal = open_journal(args)
+        try:
+            results = api.rrset_bulk(zone=args.zone, changes=changes, chunk_size=args.chunk_size, journal=journal)
+        finally:
+            if journal:
+                journal.close()
+        print_bulk_results(results)
+        if journal and journal.resumed:
+            print(str(journal.resumed) + " changes were skipped, they were applied before according to the journal.")
+
+
+
+    # ##############################################################################
+
+
+    #
+    # ZONE SYNC
+    #
+    if args.command == "zone" and args.subcommand == "sync":
+
+        from desec_dns_zone import zone_diff
+
+        # read the desired rrsets from the json / yaml file
+        desired = read_data_file(args.file, 'rrsets')
+
+        invalid = [rrset for rrset in desired if 'type' not in rrset]
+        if invalid:
+            print("ERROR: Every rrset needs a 'type': " + str(invalid[0]))
+            return
+        if not check_changes(desired):
+            return
+
+        # fetch the live rrsets once and compute the changes
+        try:
+            plan = zone_diff(desired, api.iter_rrsets(zone=args.zone), delete=not args.no_delete)
+        except ValueError as err:
+            print("ERROR: " + str(err) + ", nothing was sent.")
+            return
+        except deSEC_DNS_Error as err:
+            print("Error: The request failed with " + str(err.response.http_code) + ": " + err.response.http_errmsg + "'\n   " + err.response.http_body)
+            return
+
+        changes = plan['create'] + plan['modify'] + plan['delete']
+        if args.dry_run:
+            from tabulate import tabulate
+            column_order = ["action","subname","type","ttl","records"]
+            res_dict_ordered = [{key: ('\n'.join(row[key]) if key == "records" else row[key]) for key in column_order} for row in changes]
+            if res_dict_ordered:
+                print(tabulate(res_dict_ordered, headers="keys", showindex="always", tablefmt="grid"))
+            print(str(len(plan['create'])) + " to create, " + str(len(plan['modify'])) + " to modify, "
+                  + str(len(plan['delete'])) + " to delete, " + str(plan['unchanged']) + " unchanged.")
+        elif changes:
+            # the changes applied by an interrupted run are already unchanged, the journal records them
+            journal = open_journal(args)
+            try:
+                results = api.rrset_bulk(zone=args.zone, changes=changes, chunk_size=args.chunk_size, journal=journal)
+            finally:
+                if journal:
+                    journal.close()
+            print_bulk_results(results)
+            print(str(plan['unchanged']) + " rrsets unchanged.")
+        else:
+            print("Nothing to do, " + str(plan['unchanged']) + " rrsets unchanged.")
+
+
+    #
+    # ZONE EXPORT
+    #
+    if args.command == "zone" and args.subcommand == "export":
+
+        from desec_dns_bind import write_zone_file
+
+        # write the rrsets to the zone file while they are fetched
+        try:
+            if args.file:
+                with open(args.file, "w") as stream:
+                    count = write_zone_file(stream, args.zone, api.iter_rrsets(zone=args.zone))
+                print(str(count) + " rrsets written to '" + args.file + "'.")
+            else:
+                write_zone_file(sys.stdout, args.zone, api.iter_rrsets(zone=args.zone))
+        except deSEC_DNS_Error as err:
+            print("Error: The request failed with " + str(err.response.http_code) + ": " + err.response.http_errmsg + "'\n   " + err.response.http_body)
+            return
+
+
+    #
+    # ZONE IMPORT
+    #
+    if args.command == "zone" and args.subcommand == "import":
+
+        from desec_dns_bind import import_zone_file, ZoneFileError
+
+        if not os.path.isfile(args.file):
+            print("ERROR: The file '" + args.file + "' is missing.")
+            return
+
+        # upload the rrsets while the zone file is parsed, only failures are listed
+        # a rrset merged with records found later has two results, it is counted once (failed if one failed)
+        status = dict()
+        skipped = list()
+        journal = open_journal(args)
+        with open(args.file, "r") as stream:
+            try:
+                for result in import_zone_file(api, args.zone, stream, chunk_size=args.chunk_size, ttl=args.ttl, journal=journal, skipped=skipped):
+                    key = (result['subname'], result['type'])
+                    if result['status'] == 'ok':
+                        status.setdefault(key, 'ok')
+                    else:
+                        status[key] = 'failed'
+                        print("Failed: " + result['subname'] + " " + result['type'] + ": " + result['error'])
+            except ZoneFileError as err:
+                print("ERROR: The zone file '" + args.file + "' could not be parsed, " + str(err))
+            finally:
+                if journal:
+                    journal.close()
+        failed = sum(1 for value in status.values() if value == 'failed')
+        print(str(len(status) - failed) + " rrsets imported successfully, " + str(failed) + " failed.")
+        if journal and journal.resumed:
+            print(str(journal.resumed) + " of them were skipped, they were applied before according to the journal.")
+        if skipped:
+            print(str(len(skipped)) + " records outside of the zone " + args.zone + " were skipped: " + ", ".join(sorted(set(name + " " + type for name, type in skipped))))
+
+
+    #
+    # ACME PUBLISH
+    #
+    if args.command == "acme" and args.subcommand == "publish":
+
+        from desec_dns_acme import acme_publish, acme_wait
+
+        challenges = read_challenges(args)
+        try:
+            # one bulk request per domain, merged with the existing TXT records
+            results = acme_publish(api, challenges, ttl=args.ttl, concurrency=concurrency)
+            print_bulk_results(results, ["zone","action","subname","type","status","error"])
+            if args.no_wait or any(result['status'] != 'ok' for result in results):
+                return
+
+            start = time.time()
+            pending = acme_wait(api, challenges, nameservers=args.nameserver, timeout=args.timeout)
+        except ValueError as err:
+            print("ERROR: " + str(err))
+            return
+        except OSError as err:
+            print("ERROR: The nameservers could not be resolved: " + str(err))
+            return
+        except deSEC_DNS_Error as err:
+            print("Error: The request failed with " + str(err.response.http_code) + ": " + err.response.http_errmsg + "'\n   " + err.response.http_body)
+            return
+        if pending:
+            for server, name, tokens in pending:
+                print("Not propagated: " + name + " at " + server[0] + ":" + str(server[1]))
+            print("ERROR: The challenges did not propagate within " + str(args.timeout) + " seconds.")
+            sys.exit(1)
+        print("All nameservers answer the challenges after " + str(round(time.time() - start, 2)) + " seconds.")
+
+
+    #
+    # ACME CLEANUP
+    #
+    if args.command == "acme" and args.subcommand == "cleanup":
+
+        from desec_dns_acme import acme_cleanup
+
+        challenges = read_challenges(args)
+        try:
+            results = acme_cleanup(api, challenges, concurrency=concurrency)
+        except ValueError as err:
+            print("ERROR: " + str(err))
+            return
+        except deSEC_DNS_Error as err:
+            print("Error: The request failed with " + str(err.response.http_code) + ": " + err.response.http_errmsg + "'\n   " + err.response.http_body)
+            return
+        print_bulk_results(results, ["zone","action","subname","type","status","error"])
+
+
+    #
+    # WATCH
+    #
+    if args.command == "watch":
+
+        from desec_dns_watch import poll_changes, load_snapshot, save_snapshot
+
+        zones = args.zone
+        if args.zones_from:
+            with open(args.zones_from, "r") as stream:
+                zones = [line.strip() for line in stream if line.strip() and not line.startswith("#")]
+
+        snapshot = load_snapshot(args.state) if args.state else dict()
+        try:
+            while True:
+                started = time.time()
+                try:
+                    events = poll_changes(api, snapshot, zones=zones, concurrency=concurrency, initial=args.initial)
+                except deSEC_DNS_Error as err:
+                    print("Error: The request failed with " + str(err.response.http_code) + ": " + err.response.http_errmsg + "'\n   " + err.response.http_body)
+                    return
+                for event in events:
+                    print(json.dumps(event))
+                sys.stdout.flush()
+                # keep the snapshot after every poll, a restart continues from there
+                if args.state:
+                    save_snapshot(args.state, snapshot)
+                if args.once:
+                    break
+                time.sleep(max(0, args.interval - (time.time() - started)))
+        except KeyboardInterrupt:
+            return
+
+
+    #
+    # BACKUP
+    #
+    if args.command == "backup":
+
+        from desec_dns_backup import BackupStore, backup_zones
+
+        store = BackupStore(args.dir)
+        if args.list:
+            from tabulate import tabulate
+            rows = list()
+            for name in store.snapshots(api.cache_account):
+                manifest = store.load_snapshot(name)
+                rows.append({'snapshot': name, 'created': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(manifest['created'])),
+                             'zones': len(manifest['zones']), 'rrsets': sum(entry['rrsets'] for entry in manifest['zones'].values())})
+            if rows:
+                print(tabulate(rows, headers="keys", showindex="always", tablefmt="grid"))
+            else:
+                print("No snapshots of this account in '" + args.dir + "'.")
+            return
+
+        zones = args.zone
+        if args.zones_from:
+            with open(args.zones_from, "r") as stream:
+                zones = [line.strip() for line in stream if line.strip() and not line.startswith("#")]
+        try:
+            manifest = backup_zones(api, store, zones=zones, concurrency=concurrency, full=args.full)
+        except deSEC_DNS_Error as err:
+            print("Error: The request failed with " + str(err.response.http_code) + ": " + err.response.http_errmsg + "'\n   " + err.response.http_body)
+            return
+        stats = manifest['stats']
+        print("Snapshot " + manifest['name'] + ": " + str(stats['zones']) + " domains, " + str(stats['unchanged']) + " unchanged, "
+              + str(stats['fetched']) + " requested (" + str(stats['rrsets']) + " rrsets), " + str(stats['written']) + " objects written ("
+              + str(round(stats['bytes_written'] / 1024.0, 1)) + " kB), " + str(stats['deduplicated']) + " deduplicated in "
+              + str(stats['seconds']) + " seconds.")
+        if args.keep:
+            snapshots, objects = store.prune(args.keep, api.cache_account)
+            print(str(snapshots) + " old snapshots and " + str(objects) + " unused objects removed.")
+
+
+    #
+    # RESTORE
+    #
+    if args.command == "restore":
+
+        from desec_dns_backup import BackupStore, restore_zones
+
+        store = BackupStore(args.dir)
+        name = args.snapshot
+        if not name:
+            names = store.snapshots(api.cache_account)
+            if not names:
+                print("ERROR: There is no snapshot of this account in '" + args.dir + "', select one with --snapshot.")
+                return
+            name = names[-1]
+        try:
+            manifest = store.load_snapshot(name)
+        except (OSError, ValueError) as err:
+            print("ERROR: The snapshot '" + name + "' could not be read: " + str(err))
+            return
+
+        zones = args.zone
+        if args.zones_from:
+            with open(args.zones_from, "r") as stream:
+                zones = [line.strip() for line in stream if line.strip() and not line.startswith("#")]
+        try:
+            results = restore_zones(api, store, manifest, zones=zones, concurrency=concurrency, delete=not args.no_delete,
+                                    dry_run=args.dry_run, chunk_size=args.chunk_size, force=args.force)
+        except deSEC_DNS_Error as err:
+            print("Error: The request failed with " + str(err.response.http_code) + ": " + err.response.http_errmsg + "'\n   " + err.response.http_body)
+            return
+
+        from tabulate import tabulate
+        column_order = ["zone","created","create","modify","delete","unchanged","failed","error"]
+        print(tabulate([[result[key] for key in column_order] for result in results], headers=column_order, showindex="always", tablefmt="grid"))
+        failed = [result for result in results if result['failed'] or result['error']]
+        print(("Planned" if args.dry_run else "Restored") + " " + str(len(results) - len(failed)) + " domains from snapshot "
+              + manifest.get('name', name) + ", " + str(len(failed)) + " failed.")
+        if failed:
+            sys.exit(1)
+
+
+    #
+    # SEARCH
+    #
+    if args.command == "search":
+
+        from desec_dns_index import ZoneIndex
+
+        if args.value is None and not (args.type or args.subname or args.name or args.zone):
+            print("ERROR: Please specify a value or at least one of --type, --subname, --name or --zone to search for.")
+            return
+
+        with ZoneIndex(path=args.index, account=api.cache_account) as index:
+            # refresh only the touched domains, and only if the index is old
+            if not args.offline and (args.refresh or args.rebuild or time.time() - index.refreshed() > args.max_age):
+                try:
+                    counts = index.refresh(api, concurrency=concurrency, force=args.rebuild)
+                except deSEC_DNS_Error as err:
+                    print("Error: The request failed with " + str(err.response.http_code) + ": " + err.response.http_errmsg + "'\n   " + err.response.http_body)
+                    return
+                if args.debug:
+                    print("Index refreshed: " + json.dumps(counts))
+
+            subname = '' if args.subname == '@' else args.subname
+            records = index.search(value=args.value, type=split_values(args.type, upper=True), subname=subname, name=args.name,
+                                   zone=args.zone, limit=args.limit)
+
+        column_order = ["domain","subname","type","ttl","record"]
+        if args.output:
+            write_rows(sys.stdout, records, ["domain","subname","name","type","ttl","record"], args.output)
+        elif records:
+            from tabulate import tabulate
+            rows = [[record[key] for key in column_order] for record in records]
+            print(tabulate(rows, headers=column_order, showindex="always", tablefmt="grid", disable_numparse=[1, 2, 3, 5]))
+
+
+
+# ##############################################################################
+
+
+def execute_argv(parser, api, settings, argv):
+    """
+    Function to execute one command line with an existing api object
+    Everything printed by the command is captured and returned.
+    Return: tuple of exit status and output
+
+    Keyword arguments:
+    parser -- The argparse.ArgumentParser object
+    api -- The deSEC_DNS_API object
+    settings -- The dict of settings read from the config file
+    argv -- The list of command line arguments (without the script name)
+    """
+    from desec_dns_stats import StatsCollector
+
+    output = io.StringIO()
+    status = 0
+    with redirect_stdout(output), redirect_stderr(output):
+        try:
+            args = parser.parse_args(argv)
+            if args.command == "serve":
+                print("ERROR: The serve command can not be sent to a server.")
+                status = 1
+            else:
+                if args.debug:
+                    print(args)
+                # apply the options of this command to the shared api object
+                api.debug = args.debug
+                cache = api.cache
+                if getattr(args, 'no_cache', False):
+                    api.cache = None
+                stats = None
+                if args.stats:
+                    stats = StatsCollector().register(api)
+                try:
+                    run_command(args, api, get_concurrency(settings, args))
+                finally:
+                    api.cache = cache
+                    if stats:
+                        stats.unregister(api)
+                        print_stats(stats, args)
+        except SystemExit as err:
+            if isinstance(err.code, int):
+                status = err.code
+            elif err.code is not None:
+                print(err.code)
+                status = 1
+        except Exception as err:
+            print("ERROR: The command failed with " + repr(err))
+            status = 1
+    return status, output.getvalue()
+
+
+def serve(parser, settings, args):
+    """
+    Function to execute commands with one warm api object until interrupted
+    Every command is a json object per line like {"argv": ["domain", "list"]},
+    it is answered with a json object per line {"status": 0, "output": "..."}.
+    The commands are read from a unix socket or standard input.
+
+    Keyword arguments:
+    parser -- The argparse.ArgumentParser object
+    settings -- The dict of settings read from the config file
+    args -- The parsed command line arguments of the serve command
+    """
+    import socketserver
+
+    api, concurrency = create_api(settings, args)
+    lock = threading.Lock()
+
+    def handle_line(line):
+        try:
+            argv = json.loads(line)['argv']
+        except (ValueError, KeyError, TypeError):
+            return {'status': 2, 'output': "ERROR: Expected a json object with 'argv' (list of arguments).\n"}
+        # commands share the api object and the captured output, so one runs at a time
+        with lock:
+            status, output = execute_argv(parser, api, settings, [str(arg) for arg in argv])
+        return {'status': status, 'output': output}
+
+    if args.stdin:
+        for line in iter(sys.stdin.readline, ''):
+            if line.strip():
+                sys.stdout.write(json.dumps(handle_line(line)) + "\n")
+                sys.stdout.flush()
+        return
+
+    class CommandHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if line.strip():
+                    self.wfile.write((json.dumps(handle_line(line.decode('utf-8'))) + "\n").encode('utf-8'))
+
+    class CommandServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    # replace a socket left over by a previous server
+    path = args.socket or DEFAULT_SOCKET
+    if os.path.dirname(path) and not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    if os.path.exists(path):
+        os.remove(path)
+
+    server = CommandServer(path, CommandHandler)
+    os.chmod(path, 0o600)
+    print("Serving commands on '" + path + "'")
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(path)
+        api.close()
+
+
+
+# ##############################################################################
+
 
+if __name__ == "__main__":
+
+    # start parsing args, only the parser of the given command is built
+    parser = build_parser(command_name(sys.argv[1:]))
+    args = parser.parse_args()
+
+    if args.debug:
+        print(args)
+
+    settings = read_settings()
+    from desec_dns_accounts import account_names, account_settings
+    from desec_dns_stats import StatsCollector
+    names = account_names(settings)
+
+    if args.command == "serve":
+        if names:
+            # the server keeps the api object of a single account
+            name = args.account or settings.get('default_account')
+            if name not in names:
+                print("ERROR: Please select the account to serve with --account (" + ", ".join(names) + ").")
+                sys.exit()
+            settings = account_settings(settings, name)
+        # the server executes any command, it needs the parser of all of them
+        serve(build_parser(), settings, args)
+    elif names:
+        stats = None
+        if args.stats:
+            stats = StatsCollector()
+        accounts = create_accounts(settings, args, stats)
+        try:
+            run_accounts(accounts, select_accounts(accounts, settings, args), settings, args)
+        finally:
+            accounts.close()
+            if stats:
+                print_stats(stats, args)
     else:
-        print(sys.argv[0] + " " + args.command +": error: at least one of --ttl or --records need to be provided")
+        if args.account:
+            print("ERROR: No accounts are defined in the settings file, remove the --account option.")
+            sys.exit()
+        api, concurrency = create_api(settings, args)
+        stats = None
+        if args.stats:
+            stats = StatsCollector().register(api)
+        try:
+            run_command(args, api, concurrency)
+        finally:
+            if stats:
+                print_stats(stats, args)
@@ -0,0 +1,47 @@
+#!/usr/bin/python
+"""
+Author: Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+# Thin client forwarding its command line to a running "desec-dns-cli.py serve".
+# Only standard modules are imported, so the client starts without loading
+# requests, yaml or the api.
+#
+# Usage: desec-dns-client.py [--socket PATH] <command> <action> [options]
+
+from __future__ import print_function
+import sys
+import os.path
+import json
+import socket
+
+
+# Unix socket of the server (same default as desec-dns-cli.py serve)
+DEFAULT_SOCKET = os.path.join(os.path.expanduser("~"), ".cache", "desec-dns-cli", "serve.sock")
+
+
+argv = sys.argv[1:]
+path = os.environ.get('DESEC_DNS_SOCKET', DEFAULT_SOCKET)
+if argv[:1] == ['--socket'] and len(argv) > 1:
+    path = argv[1]
+    argv = argv[2:]
+
+# send the command as one json line and read the answer line
+try:
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conn.connect(path)
+    conn.sendall((json.dumps({'argv': argv}) + "\n").encode('utf-8'))
+    reply = conn.makefile('rb').readline()
+    conn.close()
+except (IOError, OSError) as err:
+    print("ERROR: No server listening on '" + path + "' (" + str(err) + "), start one with 'desec-dns-cli.py serve'.", file=sys.stderr)
+    sys.exit(1)
+
+if not reply:
+    print("ERROR: The server closed the connection without an answer.", file=sys.stderr)
+    sys.exit(1)
+
+reply = json.loads(reply.decode('utf-8'))
+sys.stdout.write(reply['output'])
+sys.exit(reply['status'])
@@ -0,0 +1,239 @@
+#!/usr/bin/python
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from desec_dns_api import deSEC_DNS_Error
+
+
+DEFAULT_INDEX = os.path.join(os.path.expanduser("~"), ".cache", "desec-dns-cli", "zones.json")
+
+
+def account_names(settings):
+    """
+    Function to get the names of the accounts defined in the settings
+    Return: list of strings (empty if the settings hold a single api_token)
+
+    Keyword arguments:
+    settings -- The dict of settings read from the config file
+    """
+    return list(settings.get('accounts') or [])
+
+
+def account_settings(settings, name):
+    """
+    Function to get the settings of one account
+    The settings of the account override the top level settings (like
+    api_url, pool_size or rate_limits), so common values are set once.
+    Return: dict
+
+    Keyword arguments:
+    settings -- The dict of settings read from the config file
+    name -- The name of the account
+    """
+    merged = dict((key, value) for key, value in settings.items() if key != 'accounts')
+    merged.update(settings['accounts'][name] or dict())
+    return merged
+
+
+class AccountSet(object):
+    """
+    Class holding one api object per account and the index of which account holds which domain
+    Every account gets its own api object, with its own connection pool and
+    rate limiter, created on first use. The zone index is built by listing
+    the domains of all accounts concurrently and kept in a json file, so a
+    domain is routed to its account without listing every account again.
+    """
+
+    def __init__(self, names, factory, index_path=DEFAULT_INDEX, index_ttl=86400, fingerprint=''):
+        """
+        Initially set the accounts
+
+        Keyword arguments:
+        names -- The list of account names
+        factory -- Function creating the api object of an account from its name
+        index_path -- The file keeping the zone index, None to keep it in memory only (default ~/.cache/desec-dns-cli/zones.json)
+        index_ttl -- Seconds the zone index is used before it is built again (default 86400)
+        fingerprint -- String identifying the accounts, an index of other accounts is not used (default '')
+        """
+        super(AccountSet, self).__init__()
+        self.names = list(names)
+        self.factory = factory
+        self.index_path = index_path
+        self.index_ttl = index_ttl
+        self.fingerprint = hashlib.sha256((fingerprint + "\0" + "\0".join(self.names)).encode('utf-8')).hexdigest()[:16]
+        self.lock = threading.Lock()
+        self.apis = dict()
+        self.zones = None
+        self.built = 0
+        self.index_built = False
+
+
+    def api(self, name):
+        """
+        Function to get the api object of an account, it is created on first use
+        Return: deSEC_DNS_API object
+
+        Keyword arguments:
+        name -- The name of the account
+        """
+        with self.lock:
+            if name not in self.apis:
+                self.apis[name] = self.factory(name)
+            return self.apis[name]
+
+
+    def close(self):
+        """
+        Function to close the api objects of all accounts
+        """
+        with self.lock:
+            for api in self.apis.values():
+                api.close()
+            self.apis = dict()
+
+
+    def map(self, function, names=None):
+        """
+        Function to call a function for many accounts concurrently, one thread per account
+        Return: list of the results in the order of names
+
+        Keyword arguments:
+        function -- Function called with the account name and its api object
+        names -- The list of account names (default None, all accounts)
+        """
+        names = self.names if names is None else names
+        if not names:
+            return []
+        with ThreadPoolExecutor(max_workers=len(names)) as executor:
+            return list(executor.map(lambda name: function(name, self.api(name)), names))
+
+
+    def build_index(self):
+        """
+        Function to list the domains of all accounts and save the zone index
+        Return: dict of zone to account name (raises deSEC_DNS_Error if a request fails)
+        """
+        def list_zones(name, api):
+            response = api.domain_list()
+            if not response:
+                raise deSEC_DNS_Error(response)
+            return [domain['name'] for domain in response.get_response_dict()]
+
+        zones = dict()
+        for name, names in zip(self.names, self.map(list_zones)):
+            for zone in names:
+                zones.setdefault(zone, name)
+        self.zones = zones
+        self.built = time.time()
+        self.index_built = True
+        self.save_index()
+        return zones
+
+
+    def load_index(self):
+        """
+        Function to read the zone index from its file
+        Return: dict of zone to account name (None if the file is missing, expired or of other accounts)
+        """
+        if not self.index_path or not os.path.exists(self.index_path):
+            return None
+        try:
+            with open(self.index_path, "r") as stream:
+                data = json.load(stream)
+        except ValueError:
+            return None
+        if data.get('fingerprint') != self.fingerprint or time.time() - data.get('built', 0) > self.index_ttl:
+            return None
+        self.built = data['built']
+        return data['zones']
+
+
+    def save_index(self):
+        """
+        Function to save the zone index, the file is replaced at once
+        """
+        if not self.index_path or self.zones is None:
+            return
+        if os.path.dirname(self.index_path) and not os.path.isdir(os.path.dirname(self.index_path)):
+            os.makedirs(os.path.dirname(self.index_path))
+        temp = self.index_path + ".tmp"
+        with open(temp, "w") as stream:
+            json.dump({'fingerprint': self.fingerprint, 'built': self.built, 'zones': self.zones}, stream)
+        os.replace(temp, self.index_path)
+
+
+    def account_for(self, zone):
+        """
+        Function to find the account holding a domain
+        The cached index is used, it is built again once if the domain is missing (like a domain created elsewhere).
+        After forget_zone or reset_index a missing domain builds the index again.
+        Return: string (None if no account holds the domain)
+
+        Keyword arguments:
+        zone -- The domain name
+        """
+        if self.zones is None:
+            self.zones = self.load_index()
+            if self.zones is None:
+                self.build_index()
+        if zone not in self.zones and not self.index_built:
+            self.build_index()
+        return self.zones.get(zone)
+
+
+    def group_zones(self, zones):
+        """
+        Function to group domains by the account holding them
+        Return: tuple of dict of account name to list of domains, and the list of domains no account holds
+
+        Keyword arguments:
+        zones -- The list of domain names
+        """
+        grouped = dict()
+        unknown = list()
+        for zone in zones:
+            name = self.account_for(zone)
+            if name is None:
+                unknown.append(zone)
+            else:
+                grouped.setdefault(name, list()).append(zone)
+        return grouped, unknown
+
+
+    def forget_zone(self, zone):
+        """
+        Function to remove a domain from the zone index (after it was created or deleted)
+        A later lookup of the domain builds the index again, so it always finds the current account.
+
+        Keyword arguments:
+        zone -- The domain name
+        """
+        # allow the next lookup of a missing domain to build the index again, even if it was built before
+        self.index_built = False
+        if self.zones is None:
+            self.zones = self.load_index()
+            if self.zones is None:
+                # nothing cached yet, the next lookup builds the index
+                return
+        if self.zones.pop(zone, None) is not None:
+            self.save_index()
+
+
+    def reset_index(self):
+        """
+        Function to drop the zone index (after many domains were created or deleted)
+        The next lookup of a domain builds the index again.
+        """
+        self.zones = None
+        self.index_built = False
+        if self.index_path and os.path.exists(self.index_path):
+            os.remove(self.index_path)
@@ -0,0 +1,256 @@
+#!/usr/bin/python
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import time
+from concurrent.futures import ThreadPoolExecutor
+from desec_dns_api import deSEC_DNS_Error
+from desec_dns_resolver import query_txt, resolve_nameserver
+
+
+# Nameservers of the domains hosted by deSEC, used if a domain has no NS rrset
+DESEC_NAMESERVERS = ('ns1.desec.io', 'ns2.desec.org')
+
+ACME_LABEL = '_acme-challenge'
+
+
+def challenge_name(name):
+    """
+    Function to get the name of the TXT rrset holding the challenge of a certificate name
+    Return: string (like _acme-challenge.www.domain.tld, without trailing dot)
+
+    Keyword arguments:
+    name -- The name of the certificate (wildcards use the challenge of the base name)
+    """
+    name = name.strip().rstrip('.').lower()
+    if name.startswith('*.'):
+        name = name[2:]
+    return ACME_LABEL + '.' + name
+
+
+def find_zone(name, zones):
+    """
+    Function to find the domain of the account a name belongs to
+    Return: string (the longest matching domain, None if no domain matches)
+
+    Keyword arguments:
+    name -- The domain name (without trailing dot)
+    zones -- The list of domain names of the account
+    """
+    best = None
+    for zone in zones:
+        if (name == zone or name.endswith('.' + zone)) and (best is None or len(zone) > len(best)):
+            best = zone
+    return best
+
+
+def group_challenges(challenges, zones):
+    """
+    Function to group the challenges by domain and TXT rrset
+    Return: dict of zone to dict of subname to list of tokens
+
+    Keyword arguments:
+    challenges -- Iterable of tuples (certificate name, token)
+    zones -- The list of domain names of the account
+    """
+    grouped = dict()
+    for name, token in challenges:
+        fqdn = challenge_name(name)
+        zone = find_zone(fqdn, zones)
+        if zone is None:
+            raise ValueError("no domain of the account contains '" + name + "'")
+        subname = fqdn[:-len(zone) - 1]
+        tokens = grouped.setdefault(zone, dict()).setdefault(subname, list())
+        if token not in tokens:
+            tokens.append(token)
+    return grouped
+
+
+def quote_txt(token):
+    """
+    Function to quote a token as TXT record
+    Return: string
+
+    Keyword arguments:
+    token -- The token of the challenge
+    """
+    return '"' + token + '"'
+
+
+def _account_zones(api):
+    """
+    Function to get the domain names of the account
+    Return: list of strings (raises deSEC_DNS_Error if the request fails)
+
+    Keyword arguments:
+    api -- The deSEC_DNS_API object
+    """
+    response = api.domain_list()
+    if not response:
+        raise deSEC_DNS_Error(response)
+    return [domain['name'] for domain in response.get_response_dict()]
+
+
+def _update_zones(api, grouped, merge, ttl=None, concurrency=10, chunk_size=500):
+    """
+    Function to change the challenge TXT rrsets of every domain with one bulk request each
+    The TXT rrsets of a domain are fetched once, the domains are changed concurrently.
+    Return: list of result dicts (see deSEC_DNS_API.rrset_bulk, with 'zone')
+
+    Keyword arguments:
+    api -- The deSEC_DNS_API object
+    grouped -- The challenges grouped by group_challenges
+    merge -- Function returning the new records from the current records and the tokens
+    ttl -- The ttl of newly created TXT rrsets (default None)
+    concurrency -- The maximum number of domains changed at the same time (default 10)
+    chunk_size -- The maximum number of rrsets sent in one request (default 500)
+    """
+    def update_zone(zone):
+        existing = dict()
+        for rrset in api.iter_rrsets(zone, type='TXT'):
+            existing[rrset['subname']] = rrset['records']
+
+        changes = list()
+        results = list()
+        for subname, tokens in grouped[zone].items():
+            current = existing.get(subname, [])
+            records = merge(current, tokens)
+            if sorted(records) == sorted(current):
+                results.append({'action': 'unchanged', 'subname': subname, 'type': 'TXT', 'status': 'ok', 'error': ''})
+            elif not records:
+                changes.append({'action': 'delete', 'subname': subname, 'type': 'TXT'})
+            elif current:
+                changes.append({'action': 'modify', 'subname': subname, 'type': 'TXT', 'records': records})
+            else:
+                changes.append({'action': 'create', 'subname': subname, 'type': 'TXT', 'ttl': ttl, 'records': records})
+        if changes:
+            results.extend(api.rrset_bulk(zone=zone, changes=changes, chunk_size=chunk_size))
+        for result in results:
+            result['zone'] = zone
+        return results
+
+    zones = sorted(grouped)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return [result for results in executor.map(update_zone, zones) for result in results]
+
+
+def acme_publish(api, challenges, ttl=60, concurrency=10, chunk_size=500):
+    """
+    Function to publish the TXT records of many ACME DNS-01 challenges
+    The challenges of a domain are sent together in one bulk request. Existing
+    TXT values (like the challenges of other pending orders) are kept, the
+    tokens are added to them.
+    Return: list of result dicts (see deSEC_DNS_API.rrset_bulk, with 'zone')
+
+    Keyword arguments:
+    api -- The deSEC_DNS_API object
+    challenges -- Iterable of tuples (certificate name, token)
+    ttl -- The ttl of newly created TXT rrsets (default 60)
+    concurrency -- The maximum number of domains changed at the same time (default 10)
+    chunk_size -- The maximum number of rrsets sent in one request (default 500)
+    """
+    def merge(current, tokens):
+        return list(current) + [quote_txt(token) for token in tokens if quote_txt(token) not in current]
+
+    grouped = group_challenges(challenges, _account_zones(api))
+    return _update_zones(api, grouped, merge, ttl=ttl, concurrency=concurrency, chunk_size=chunk_size)
+
+
+def acme_cleanup(api, challenges, concurrency=10, chunk_size=500):
+    """
+    Function to remove the TXT records of ACME DNS-01 challenges
+    Only the given tokens are removed, a TXT rrset without records left is deleted.
+    Return: list of result dicts (see deSEC_DNS_API.rrset_bulk, with 'zone')
+
+    Keyword arguments:
+    api -- The deSEC_DNS_API object
+    challenges -- Iterable of tuples (certificate name, token)
+    concurrency -- The maximum number of domains changed at the same time (default 10)
+    chunk_size -- The maximum number of rrsets sent in one request (default 500)
+    """
+    def merge(current, tokens):
+        quoted = [quote_txt(token) for token in tokens]
+        return [record for record in current if record not in quoted]
+
+    grouped = group_challenges(challenges, _account_zones(api))
+    return _update_zones(api, grouped, merge, concurrency=concurrency, chunk_size=chunk_size)
+
+
+def zone_nameservers(api, zone, port=53):
+    """
+    Function to get the addresses of the authoritative nameservers of a domain
+    Return: list of tuples (address, port)
+
+    Keyword arguments:
+    api -- The deSEC_DNS_API object
+    zone -- The domain name
+    port -- The port of the nameservers (default 53)
+    """
+    names = list()
+    response = api.rrset_list(zone=zone, type='NS')
+    if response:
+        for rrset in response.get_response_dict():
+            if rrset['subname'] == '':
+                names = rrset['records']
+    return [resolve_nameserver(name, port=port) for name in (names or DESEC_NAMESERVERS)]
+
+
+def wait_for_propagation(checks, timeout=120, interval=0.5, max_interval=8.0, concurrency=32, query_timeout=2.0):
+    """
+    Function to wait until every nameserver answers with the expected TXT values
+    All pending queries are sent concurrently, the pause between the rounds
+    doubles (exponential backoff) up to max_interval.
+    Return: list of the checks still pending at the timeout (empty if all propagated)
+
+    Keyword arguments:
+    checks -- List of tuples (nameserver address tuple, name, set of expected TXT values)
+    timeout -- Seconds to wait at most (default 120)
+    interval -- Seconds to wait after the first round (default 0.5)
+    max_interval -- The longest pause between two rounds in seconds (default 8.0)
+    concurrency -- The maximum number of queries running at the same time (default 32)
+    query_timeout -- Seconds to wait for a single answer (default 2.0)
+    """
+    def propagated(check):
+        server, name, expected = check
+        values = query_txt(server, name, timeout=query_timeout)
+        return values is not None and expected <= values
+
+    deadline = time.time() + timeout
+    pending = list(checks)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while pending:
+            pending = [check for check, done in zip(pending, executor.map(propagated, pending)) if not done]
+            remaining = deadline - time.time()
+            if not pending or remaining <= 0:
+                break
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 2, max_interval)
+    return pending
+
+
+def acme_wait(api, challenges, nameservers=None, timeout=120, concurrency=32):
+    """
+    Function to wait until the challenges are answered by the authoritative nameservers
+    Return: list of the checks still pending at the timeout (see wait_for_propagation)
+
+    Keyword arguments:
+    api -- The deSEC_DNS_API object
+    challenges -- Iterable of tuples (certificate name, token)
+    nameservers -- List of nameservers (host or host:port) asked instead of those of the domains (default None)
+    timeout -- Seconds to wait at most (default 120)
+    concurrency -- The maximum number of queries running at the same time (default 32)
+    """
+    grouped = group_challenges(challenges, _account_zones(api))
+    servers = None
+    if nameservers:
+        servers = [resolve_nameserver(nameserver) for nameserver in nameservers]
+
+    checks = list()
+    for zone, subnames in sorted(grouped.items()):
+        for server in servers or zone_nameservers(api, zone):
+            for subname, tokens in subnames.items():
+                checks.append((server, subname + '.' + zone, set(tokens)))
+    return wait_for_propagation(checks, timeout=timeout, concurrency=concurrency)
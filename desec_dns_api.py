@@ -5,13 +5,213 @@ Version: 0.2.0
 """
 
 from __future__ import print_function
+import fnmatch
+import hashlib
 import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlencode
 import requests
+import requests.adapters
+import requests.utils
+import urllib3.connection
+import urllib3.connectionpool
+from desec_dns_flight import SingleFlight
+from desec_dns_ratelimit import RateLimiter, endpoint_class, parse_retry_after, IDEMPOTENT_METHODS
+from desec_dns_records import split_records, canonical_records, validate_changes
+from desec_dns_stats import endpoint_template, PHASES
+from desec_dns_zone import RRset
 
 
-class deSEC_DNS_API(object):
+# json decode function, set by json_loads on first use
+_json_decode = None
+
+
+def json_loads(data):
     """
-    Class to handle the deSEC DNS APIT requests
+    Function to decode json, with orjson if it is installed (several times faster for big rrset lists)
+    orjson is imported on the first call, so commands without responses to decode start faster.
+    Return: the decoded object (raises ValueError for invalid json)
+
+    Keyword arguments:
+    data -- The json string or bytes
+    """
+    global _json_decode
+    if _json_decode is None:
+        try:
+            # orjson - fast json library, used to decode the responses if installed
+            #   https://github.com/ijl/orjson
+            import orjson
+            _json_decode = orjson.loads
+        except ImportError:
+            _json_decode = json.loads
+    return _json_decode(data)
+
+
+# timings of the request sent by the current thread, filled in by the connections
+_phase_timings = threading.local()
+
+
+class _TimedHTTPConnection(urllib3.connection.HTTPConnection):
+    """
+    Connection measuring name resolution and connect separately while a request is instrumented
+    """
+
+    def _new_conn(self):
+        timings = getattr(_phase_timings, 'current', None)
+        if timings is None:
+            return super(_TimedHTTPConnection, self)._new_conn()
+        start = time.time()
+        dns_host = self._dns_host
+        try:
+            # resolve the name here to tell the time of the lookup from the connect
+            self._dns_host = socket.getaddrinfo(dns_host, self.port, 0, socket.SOCK_STREAM)[0][4][0]
+        except socket.error:
+            pass
+        resolved = time.time()
+        try:
+            return super(_TimedHTTPConnection, self)._new_conn()
+        finally:
+            self._dns_host = dns_host
+            timings['dns'] += resolved - start
+            timings['connect'] += time.time() - resolved
+
+
+class _TimedHTTPSConnection(_TimedHTTPConnection, urllib3.connection.HTTPSConnection):
+    """
+    Connection additionally measuring the TLS handshake while a request is instrumented
+    """
+
+    def connect(self):
+        timings = getattr(_phase_timings, 'current', None)
+        if timings is None:
+            return super(_TimedHTTPSConnection, self).connect()
+        start = time.time()
+        before = timings['dns'] + timings['connect']
+        super(_TimedHTTPSConnection, self).connect()
+        timings['tls'] += max(0.0, time.time() - start - (timings['dns'] + timings['connect'] - before))
+
+
+class _TimedHTTPConnectionPool(urllib3.connectionpool.HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(urllib3.connectionpool.HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(requests.adapters.HTTPAdapter):
+    """
+    Adapter creating connection pools with the timed connections
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(_TimedHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _TimedHTTPConnectionPool, 'https': _TimedHTTPSConnectionPool}
+
+
+
+class deSEC_DNS_Response(object):
+    """
+    Class holding the result of a single API request
+    Evaluates to True when the request was successful (http_code below 300)
+    """
+
+    def __init__(self, http_code=0, http_body='', http_errmsg='', headers=None, single_result=False, retries=0, debug=False):
+        """
+        Initially set the result of the request
+
+        Keyword arguments:
+        http_code -- The http status code of the response, 0 if no response was received (default 0)
+        http_body -- The body of the response (default '')
+        http_errmsg -- The http reason or error message of the request (default '')
+        headers -- The headers of the response (default None)
+        single_result -- The response contains a single object instead of a list (default False)
+        retries -- The number of times the request was sent again after being throttled (default 0)
+        debug -- Enable / Disable debug output (default False)
+        """
+        super(deSEC_DNS_Response, self).__init__()
+        self.http_code = http_code
+        self.http_body = http_body
+        self.http_errmsg = http_errmsg
+        self.headers = headers or dict()
+        self.single_result = single_result
+        self.retries = retries
+        self.debug = debug
+        self._rrsets = None
+
+
+    def __bool__(self):
+        return 0 < self.http_code < 300
+
+    __nonzero__ = __bool__
+
+
+    @property
+    def links(self):
+        """
+        The links of the Link header (used for pagination) as dict of rel to url
+        """
+        links = dict()
+        for link in requests.utils.parse_header_links(self.headers.get('Link', '')):
+            links[link.get('rel')] = link['url']
+        return links
+
+
+    def get_response_dict(self):
+        """
+        Function to get json response parsed
+
+        Return: array of dicts
+        """
+
+        # decode http_body from json to dict
+        ret_dict = json_loads(self.http_body)
+
+        # if single result is expected, create an array to remain structure
+        if self.single_result:
+            ret_dict = [ret_dict]
+
+        if self.debug:
+            print("*** DEBUG: json2dict    : ret_dict    : " + str(ret_dict))
+
+        return ret_dict
+
+
+    def get_response_rrsets(self):
+        """
+        Function to get the rrsets of the json response as compact RRset objects
+        The body is parsed once, a response shared by several threads (see
+        SingleFlight) gives all of them the same RRset objects.
+        Return: list of RRset objects
+        """
+        rrsets = self._rrsets
+        if rrsets is None:
+            rrsets = tuple(RRset.from_dict(rrset) for rrset in self.get_response_dict())
+            self._rrsets = rrsets
+        return list(rrsets)
+
+
+
+class deSEC_DNS_Error(Exception):
+    """
+    Exception raised by the generator functions when a request fails
+    The failed deSEC_DNS_Response object is available as response.
+    """
+
+    def __init__(self, response):
+        super(deSEC_DNS_Error, self).__init__(str(response.http_code) + ": " + str(response.http_errmsg))
+        self.response = response
+
+
+
+class deSEC_DNS_Base(object):
+    """
+    Class building the urls and payloads of the api requests
+    Shared by the synchronous deSEC_DNS_API and the asyncio deSEC_DNS_API_Async
+    class, so both send exactly the same requests.
     Requires: api_url, api_token
     """
 
@@ -24,27 +224,615 @@ class deSEC_DNS_API(object):
         api_token -- The API token used to authentiocate on the API
         debug -- Enable / Disable debug output (default False)
         """
-        super(deSEC_DNS_API, self).__init__()
+        super(deSEC_DNS_Base, self).__init__()
         self.url_base = api_url
         self.header = {'Authorization': 'Token ' + api_token}
         self.debug = debug
-        self.http_body = None
-        self.http_code = None
-        self.http_errmsg = None
-        self.single_result = False
+        self.hooks = {'before_request': [], 'after_response': []}
+
+
+    def add_hook(self, event, callback):
+        """
+        Function to register an instrumentation callback
+        Both events pass a dict describing the request: method, url, endpoint
+        (template without names), endpoint_class and start. For after_response
+        it also holds status, retries, cache, bytes_sent, bytes_received, error
+        and timings (dns, connect, tls, ttfb, total in seconds).
+
+        Keyword arguments:
+        event -- The event to be called for ('before_request' or 'after_response')
+        callback -- The function called with the dict of the request
+        """
+        if event not in self.hooks:
+            raise ValueError("unknown hook event '" + str(event) + "'")
+        self.hooks[event].append(callback)
+
+
+    def _request_info(self, method, url):
+        """
+        Function to start the instrumentation of a request and call the before_request hooks
+        Return: dict describing the request (None if no hooks are registered)
+
+        Keyword arguments:
+        method -- The HTTP method of the request
+        url -- The api url of the request
+        """
+        if not self.hooks['before_request'] and not self.hooks['after_response']:
+            return None
+        path = url[len(self.url_base):] if url.startswith(self.url_base) else url
+        info = dict()
+        info['method'] = method
+        info['url'] = url
+        info['endpoint'] = endpoint_template(path)
+        info['endpoint_class'] = endpoint_class(method, url)
+        info['start'] = time.time()
+        info['status'] = 0
+        info['retries'] = 0
+        info['cache'] = None
+        info['bytes_sent'] = 0
+        info['bytes_received'] = 0
+        info['error'] = ''
+        info['timings'] = dict((phase, 0.0) for phase in PHASES)
+        for callback in self.hooks['before_request']:
+            callback(info)
+        return info
+
+
+    def _request_done(self, info, response):
+        """
+        Function to finish the instrumentation of a request and call the after_response hooks
+        Return: the deSEC_DNS_Response object
+
+        Keyword arguments:
+        info -- The dict describing the request (returned by _request_info)
+        response -- The deSEC_DNS_Response object of the request
+        """
+        info['status'] = response.http_code
+        info['retries'] = response.retries
+        if not response:
+            info['error'] = response.http_errmsg
+        info['timings']['total'] = time.time() - info['start']
+        for callback in self.hooks['after_response']:
+            callback(info)
+        return response
+
+
+    def _json_header(self):
+        """
+        Function to get the headers of a request sending json data
+        Return: dict (a copy, the auth header of the object is not changed)
+        """
+        headers = dict(self.header)
+        headers['Content-Type'] = "application/json"
+        return headers
 
 
-    def http_request(self, url, header, method='GET', data=None):
+    def _url_zone(self, url):
+        """
+        Function to get the domain a request url belongs to
+        Return: string ('' for the domain list)
+
+        Keyword arguments:
+        url -- The api url of the request
+        """
+        if url.startswith(self.url_base):
+            return url[len(self.url_base):].split('/')[0].split('?')[0]
+        return ''
+
+
+    def _domain_url(self, zone=None):
+        """
+        Function to compile the url of a domain request
+        Return: tuple of url and single_result
+
+        Keyword arguments:
+        zone -- The domain name, None for the domain list (default None)
+        """
+        if zone:
+            return self.url_base + zone + "/", True
+        return self.url_base, False
+
+
+    def _domain_create_data(self, zone):
+        """
+        Function to compose the data of a domain create request
+        Return: string (json)
+
+        Keyword arguments:
+        zone -- The domain name that should be created
+        """
+        post_data = dict()
+        post_data['name'] = zone
+        return json.dumps(post_data)
+
+
+    def _domain_item(self, item, rrsets=None):
+        """
+        Function to get the name and the initial rrsets of an entry of a domain list
+        Return: tuple of the domain name and the list of rrset dicts
+
+        Keyword arguments:
+        item -- The domain name or a dict with 'name' and optionally 'rrsets'
+        rrsets -- The rrsets of entries without own rrsets (default None)
+        """
+        if isinstance(item, dict):
+            return item['name'], item.get('rrsets', rrsets)
+        return item, rrsets
+
+
+    def _domain_transient(self, response):
+        """
+        Function to check whether a failed request may succeed when it is sent again
+        Connection errors, throttling and server errors are temporary, a
+        request rejected for its content fails the same way again.
+        Return: boolean
+
+        Keyword arguments:
+        response -- The failed deSEC_DNS_Response object
+        """
+        return response.http_code in (0, 429) or response.http_code >= 500
+
+
+    def _domain_result(self, zone, action, response, attempts):
+        """
+        Function to compose the result of creating or deleting one of many domains
+        Return: dict (zone, action, status, error, attempts, rrsets)
+
+        Keyword arguments:
+        zone -- The domain name
+        action -- 'create' or 'delete'
+        response -- The deSEC_DNS_Response object of the last attempt
+        attempts -- The number of times the request was sent
+        """
+        result = dict()
+        result['zone'] = zone
+        result['action'] = action
+        result['status'] = 'ok'
+        result['error'] = ''
+        result['attempts'] = attempts
+        result['rrsets'] = 0
+        if response:
+            return result
+        if action == 'delete' and response.http_code == 404 and attempts > 1:
+            # the response of an earlier attempt was lost, the domain is gone
+            result['error'] = "deleted by an earlier attempt"
+            return result
+        result['status'] = 'failed'
+        result['error'] = str(response.http_code) + ": " + str(response.http_errmsg) + " " + str(response.http_body)
+        return result
+
+
+    def _domain_seeded(self, result, rrset_results):
+        """
+        Function to add the results of setting the initial rrsets of a new domain to its result
+
+        Keyword arguments:
+        result -- The result dict of the domain (see _domain_result)
+        rrset_results -- The list of result dicts of rrset_bulk
+        """
+        failed = [rrset for rrset in rrset_results if rrset['status'] != 'ok']
+        result['rrsets'] = len(rrset_results) - len(failed)
+        if failed:
+            result['status'] = 'failed'
+            result['error'] = (str(len(failed)) + " of " + str(len(rrset_results)) + " rrsets failed, "
+                               + failed[0]['subname'] + " " + failed[0]['type'] + ": " + failed[0]['error'])
+
+
+    def _rrset_list_url(self, zone, type=None, subname=None):
+        """
+        Function to compile the url of a rrset list request
+        Type and subname are both sent as filter of the list, so a missing rrset is an empty list.
+        Return: string (url)
+
+        Keyword arguments:
+        zone -- The domain that should be used
+        type -- The type of rrsets that should be shown (default None)
+        subname -- The subname of rrset that should be shown (default None)
+        """
+        # check for filter arguments
+        params = list()
+        if subname:
+            params.append(('subname', subname))
+        if type:
+            params.append(('type', type))
+
+        # compile request url
+        req_url = self.url_base + zone + "/rrsets/"
+        if params:
+            req_url += "?" + urlencode(params)
+        return req_url
+
+
+    def _rrset_filter(self, type=None, subname=None, subname_pattern=None, max_queries=10):
+        """
+        Function to plan the requests of a filtered rrset list
+        The api filters by one type and one subname per request, so every
+        combination of several types and subnames is requested on its own.
+        Subname patterns (glob, like 'www*'), the zone apex ('' in a list)
+        and more than max_queries combinations cannot be expressed that way,
+        the types only (or the whole domain) are requested then and the
+        rrsets are filtered on the client.
+        Return: tuple of the list of (type, subname) queries and the filter function (None if not needed)
+
+        Keyword arguments:
+        type -- The type or list of types of the rrsets (default None)
+        subname -- The subname or list of subnames of the rrsets (default None)
+        subname_pattern -- The glob pattern or list of patterns the subname has to match (default None)
+        max_queries -- The maximum number of requests used for the filter (default 10)
+        """
+        def values(value):
+            if value is None or isinstance(value, str):
+                return [value] if value else []
+            return list(dict.fromkeys(item or '' for item in value))
+
+        types = values(type)
+        subnames = values(subname)
+        patterns = values(subname_pattern)
+
+        query_types = types or [None]
+        query_subnames = subnames or [None]
+        if patterns or '' in subnames or len(query_types) * len(query_subnames) > max_queries:
+            query_subnames = [None]
+        if len(query_types) > max_queries:
+            query_types = [None]
+        queries = [(query_type, query_subname) for query_type in query_types for query_subname in query_subnames]
+
+        # filter on the client only what the requests do not filter already
+        if (query_subnames != [None] or not (subnames or patterns)) and (query_types != [None] or not types):
+            return queries, None
+
+        def match(rrset):
+            if types and rrset['type'] not in types:
+                return False
+            if not (subnames or patterns):
+                return True
+            subname = rrset['subname'] or ''
+            return subname in subnames or any(fnmatch.fnmatchcase(subname, pattern) for pattern in patterns)
+
+        return queries, match
+
+
+    def _rrset_merged_response(self, responses, match):
+        """
+        Function to merge the responses of the requests of a filtered rrset list into one
+        Return: deSEC_DNS_Response object (the first failed response if a request failed)
+
+        Keyword arguments:
+        responses -- Iterable of the deSEC_DNS_Response objects of every page of every query
+        match -- The filter function of the rrsets (None to keep all)
+        """
+        rrsets = list()
+        retries = 0
+        for response in responses:
+            if not response:
+                return response
+            retries += response.retries
+            rrsets.extend(rrset for rrset in response.get_response_dict() if match is None or match(rrset))
+        return deSEC_DNS_Response(http_code=200, http_body=json.dumps(rrsets), http_errmsg='OK', retries=retries, debug=self.debug)
+
+
+    def _rrset_first_page_url(self, req_url):
+        """
+        Function to add the empty cursor requesting the first page of a list
+        Return: string (url)
+
+        Keyword arguments:
+        req_url -- The url of the rrset list request
+        """
+        return req_url + ("&" if "?" in req_url else "?") + "cursor="
+
+
+    def _rrset_url(self, zone, type=None, subname=None):
+        """
+        Function to compile the url of a single rrset (or the rrsets endpoint without type)
+        Return: string (url)
+
+        Keyword arguments:
+        zone -- The domain that should be used
+        type -- The type of the rrset (default None)
+        subname -- The subname of the rrset (default None)
+        """
+        if type is None:
+            return self.url_base + zone + "/rrsets/"
+        return self.url_base + zone + "/rrsets/" + (subname or '') + ".../" + type + "/"
+
+
+    def _rrset_create_data(self, type, subname, records, ttl):
+        """
+        Function to compose the data of a rrset create request
+        The records are checked and sent in their canonical form like the
+        changes of a bulk request (see desec_dns_records).
+        Return: string (json, raises ValueError if a record is not valid)
+
+        Keyword arguments:
+        type -- The type of rrsets that should be created
+        subname -- The subname of rrset that should be created
+        records -- The records (comma separated string or list)
+        ttl -- The ttl that should be set for this rrset
+        """
+        post_data = dict()
+        post_data['subname'] = subname
+        post_data['type'] = type
+        post_data['ttl'] = ttl
+        post_data['records'] = canonical_records(type, records)
+        return json.dumps(post_data)
+
+
+    def _rrset_modify_data(self, type, records=None, ttl=None):
+        """
+        Function to compose the data of a rrset modify request
+        The records are checked and sent in their canonical form.
+        Return: string (json, raises ValueError if a record is not valid)
+
+        Keyword arguments:
+        type -- The type of the rrset that should be modified
+        records -- The records (comma separated string or list) (default None)
+        ttl -- The ttl that should be set for this rrset (default None)
+        """
+        post_data = dict()
+        if ttl:
+            post_data['ttl'] = ttl
+        if records:
+            post_data['records'] = canonical_records(type, records)
+        return json.dumps(post_data)
+
+
+    def _rrset_bulk_data(self, chunk):
+        """
+        Function to compose the data of a bulk request, an empty records list deletes the rrset
+        Return: string (json)
+
+        Keyword arguments:
+        chunk -- List of change dicts (see rrset_bulk)
+        """
+        patch_data = list()
+        for change in chunk:
+            item = dict()
+            item['subname'] = change.get('subname', '')
+            item['type'] = change['type']
+            if change.get('action') == 'delete':
+                item['records'] = []
+            else:
+                if change.get('ttl'):
+                    item['ttl'] = change['ttl']
+                records = change.get('records')
+                if records:
+                    item['records'] = split_records(records)
+            patch_data.append(item)
+        return json.dumps(patch_data)
+
+
+    def _rrset_bulk_validate(self, changes):
+        """
+        Function to check the changes of a bulk request before anything is sent
+        An invalid rrset would make the api reject its whole chunk, so it is
+        left out with its error instead. The records of the valid changes are
+        sent in their canonical form (see desec_dns_records).
+        Return: tuple of the list of valid changes and the list of result dicts of the invalid ones
+
+        Keyword arguments:
+        changes -- List of change dicts (see rrset_bulk)
+        """
+        valid, invalid = validate_changes(changes)
+        results = list()
+        for change, error in invalid:
+            results.append({'action': change.get('action', 'modify'), 'subname': change.get('subname') or '',
+                            'type': change.get('type'), 'status': 'failed', 'error': "not sent, " + error})
+        return valid, results
+
+
+    def _rrset_bulk_results(self, chunk, response):
+        """
+        Function to evaluate the response of a bulk request
+        Return: tuple of the list of result dicts and the list of (change, result) tuples to send again
+
+        Keyword arguments:
+        chunk -- List of change dicts (see rrset_bulk)
+        response -- The deSEC_DNS_Response object of the bulk request
+        """
+        results = list()
+        for change in chunk:
+            result = dict()
+            result['action'] = change.get('action', 'modify')
+            result['subname'] = change.get('subname', '')
+            result['type'] = change['type']
+            result['status'] = 'ok'
+            result['error'] = ''
+            results.append(result)
+
+        # return code indicates success of the whole chunk
+        if response:
+            return results, []
+
+        # a rejected chunk reports one error entry per rrset (empty for valid rrsets)
+        try:
+            errors = json_loads(response.http_body)
+        except ValueError:
+            errors = None
+        if not isinstance(errors, list) or len(errors) != len(chunk):
+            for result in results:
+                result['status'] = 'failed'
+                result['error'] = str(response.http_code) + ": " + str(response.http_errmsg) + " " + str(response.http_body)
+            return results, []
+
+        valid = list()
+        for change, result, error in zip(chunk, results, errors):
+            if error:
+                result['status'] = 'failed'
+                result['error'] = json.dumps(error)
+            else:
+                valid.append((change, result))
+        return results, valid
+
+
+    def _rrset_bulk_resent(self, valid, resend_results=None):
+        """
+        Function to take over the results of the valid rrsets sent again
+
+        Keyword arguments:
+        valid -- List of (change, result) tuples of the valid rrsets
+        resend_results -- The results of sending them again, None if they were not sent (default None)
+        """
+        if resend_results is None:
+            for change, result in valid:
+                result['status'] = 'failed'
+                result['error'] = "not applied, rejected together with other rrsets of the request"
+            return
+        for (change, result), resend_result in zip(valid, resend_results):
+            result['status'] = resend_result['status']
+            result['error'] = resend_result['error']
+
+
+
+class deSEC_DNS_API(deSEC_DNS_Base):
+    """
+    Class to handle the deSEC DNS APIT requests
+    Requires: api_url, api_token
+    """
+
+    def __init__(self, api_url, api_token, debug=False, pool_size=10, keep_alive=True, timeout_connect=10, timeout_read=60,
+                 rate_limits=None, max_retries=5, cache=None, single_flight=True):
+        """
+        Initially set the base url and the auth header
+
+        Keyword arguments:
+        api_url -- The API url used to cennect to
+        api_token -- The API token used to authentiocate on the API
+        debug -- Enable / Disable debug output (default False)
+        pool_size -- Maximum number of connections kept open to the API (default 10)
+        keep_alive -- Reuse connections between requests (default True)
+        timeout_connect -- Seconds to wait for a connection to be established (default 10)
+        timeout_read -- Seconds to wait for the API to send a response (default 60)
+        rate_limits -- Dict of endpoint class to dict with 'rate' and 'burst', False disables the rate limiting (default None)
+        max_retries -- The number of times a throttled idempotent request is retried (default 5)
+        cache -- deSEC_DNS_Cache object used to keep read responses (default None)
+        single_flight -- Let identical read requests running at the same time share one request (default True)
+        """
+        super(deSEC_DNS_API, self).__init__(api_url, api_token, debug=debug)
+        self.timeout = (timeout_connect, timeout_read)
+
+        # create the session holding the connection pool for the lifetime of this object
+        self.session = requests.Session()
+        adapter = _TimedHTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if not keep_alive:
+            # ask the server to close the connection after every request
+            self.session.headers['Connection'] = 'close'
+
+        # cached responses are kept per account, identified without storing the token
+        self.cache = cache
+        self.cache_account = hashlib.sha256((api_url + "\0" + api_token).encode('utf-8')).hexdigest()[:16]
+
+        # create the client side rate limiter (one token bucket per endpoint class)
+        self.rate_limiter = None
+        if rate_limits is not False:
+            self.rate_limiter = RateLimiter(rate_limits=rate_limits, max_retries=max_retries)
+
+        # threads reading the same url at the same time share one request
+        self.single_flight = SingleFlight() if single_flight else None
+
+
+    def close(self):
+        """
+        Function to close all pooled connections of this object
+        """
+        self.session.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def http_request(self, url, header, method='GET', data=None, single_result=False, idempotent=None):
         """
         Function performing http requests
+        Identical read requests of several threads running at the same time
+        share one request and its response object. A write to a domain waits
+        for no one, but reads of the domain started before it are not shared
+        with later threads, so they see the result of the write.
+        Return: deSEC_DNS_Response object
+
+        Keyword arguments:
+        url -- The api url to send the request to
+        header -- Headers to send with the HTTP request
+        method -- The HTTP method used for the request (default 'GET')
+        data -- The request data to be sent with the request (default None)
+        single_result -- The response contains a single object instead of a list (default False)
+        idempotent -- The request can be sent again safely (default None, based on the method)
+        """
+        if self.single_flight is None:
+            return self._timed_request(url, header, method=method, data=data, single_result=single_result, idempotent=idempotent)
+
+        zone = self._url_zone(url)
+        if method != 'GET':
+            # the write is a barrier for the reads of the domain, before and after it
+            self.single_flight.barrier(zone)
+            try:
+                return self._timed_request(url, header, method=method, data=data, single_result=single_result, idempotent=idempotent)
+            finally:
+                self.single_flight.barrier(zone)
+
+        response, shared = self.single_flight.do((url, single_result), zone, lambda: self._timed_request(
+            url, header, method=method, data=data, single_result=single_result, idempotent=idempotent))
+        if shared:
+            if self.debug:
+                print("*** DEBUG: http-request : coalesced   : " + url)
+            info = self._request_info(method, url)
+            if info is not None:
+                info['cache'] = 'coalesced'
+                self._request_done(info, response)
+        return response
+
+
+    def _timed_request(self, url, header, method='GET', data=None, single_result=False, idempotent=None):
+        """
+        Function performing http requests and calling the instrumentation hooks
+        Throttled requests (429) slow down the endpoint class of the request and
+        are sent again after the time requested by the api, if they are idempotent.
+        The registered instrumentation hooks are called before and after the request.
+        Return: deSEC_DNS_Response object
+
+        Keyword arguments:
+        url -- The api url to send the request to
+        header -- Headers to send with the HTTP request
+        method -- The HTTP method used for the request (default 'GET')
+        data -- The request data to be sent with the request (default None)
+        single_result -- The response contains a single object instead of a list (default False)
+        idempotent -- The request can be sent again safely (default None, based on the method)
+        """
+        info = self._request_info(method, url)
+        if info is None:
+            return self._http_request(url, header, method=method, data=data, single_result=single_result, idempotent=idempotent)
+
+        # let the connections of this thread record their timings
+        _phase_timings.current = info['timings']
+        try:
+            response = self._http_request(url, header, method=method, data=data, single_result=single_result,
+                                          idempotent=idempotent, info=info)
+        finally:
+            _phase_timings.current = None
+        return self._request_done(info, response)
+
+
+    def _http_request(self, url, header, method='GET', data=None, single_result=False, idempotent=None, info=None):
+        """
+        Function performing http requests (see http_request)
+        Return: deSEC_DNS_Response object
 
         Keyword arguments:
         url -- The api url to send the request to
         header -- Headers to send with the HTTP request
         method -- The HTTP method used for the request (default 'GET')
         data -- The request data to be sent with the request (default None)
+        single_result -- The response contains a single object instead of a list (default False)
+        idempotent -- The request can be sent again safely (default None, based on the method)
+        info -- The dict describing the request, filled with cache use, bytes and time to first byte (default None)
         """
-        self.http_errmsg = ''
         if self.debug:
             print("*** DEBUG: http-request : http-url    : " + url)
             print("*** DEBUG: http-request : http-method : " + method)
@@ -56,177 +844,365 @@ class deSEC_DNS_API(object):
         else:
             # encode data if passed to the function
             req_data = data.encode('utf-8')
-        
-        
-        # Set the request type (GET, POST, PATCH, DELETE)
-        
-        try:
-            ret = requests.request(method=method, url=url, data=data, headers=header)
-        except requests.exceptions.RequestException as err:
-            self.http_code = err.code
-            self.http_errmsg = err.msg
-            self.http_body = err.read()
-            if self.debug:
-                print("*** DEBUG: http-response: http-code   : "  + str(self.http_code))
-                print("*** DEBUG: http-response: http-error  : '" + str(err.code) + ": " + err.msg + "'")
-                print("*** DEBUG: http-response: http-body   :\n" + self.http_body + "\n")
-            return False
-
-        self.http_body = ret.text
-        self.http_code = ret.status_code
-        if self.debug:
-            print("*** DEBUG: http-request : url         : "  + ret.geturl())
-            print("*** DEBUG: http-response: http-code   : "  + str(self.http_code))
-            print("*** DEBUG: http-response: http-header :\n" + str(ret.info()))
-            print("*** DEBUG: http-response: http-body   :\n" + self.http_body + "\n")
-
-        return True
-
-
-    def get_response_dict(self):
-        """
-        Function to get json response parsed
-
-        Return: array of dicts
-        """
-
-        # decode http_body from json to dict
-        ret_dict = json.loads(self.http_body)
-
-        # if single result is expected, create an array to remain structure
-        if self.single_result:
-            ret_dict = [ret_dict]
 
+        # answer read requests from the cache, stale entries are revalidated with the api
+        zone = self._url_zone(url)
+        cached = None
+        if self.cache and method == 'GET':
+            cached = self.cache.get(self.cache_account, url)
+            if cached and cached['fresh']:
+                if info is not None:
+                    info['cache'] = 'hit'
+                    info['bytes_received'] = len(cached['body'])
+                if self.debug:
+                    print("*** DEBUG: http-cache   : hit         : " + url)
+                return deSEC_DNS_Response(http_code=cached['code'], http_body=cached['body'], http_errmsg='OK',
+                                          headers=cached['headers'], single_result=single_result, debug=self.debug)
+            if cached and (cached['etag'] or cached['last_modified']):
+                header = dict(header)
+                if cached['etag']:
+                    header['If-None-Match'] = cached['etag']
+                if cached['last_modified']:
+                    header['If-Modified-Since'] = cached['last_modified']
+
+        endpoint = endpoint_class(method, url)
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+
+        attempt = 0
+        while True:
+            # wait for the rate limit of the endpoint class
+            if self.rate_limiter:
+                self.rate_limiter.acquire(endpoint)
+
+            # Send the request (GET, POST, PATCH, DELETE) through the pooled session
+            try:
+                ret = self.session.request(method=method, url=url, data=req_data, headers=header, timeout=self.timeout)
+            except requests.exceptions.RequestException as err:
+                response = deSEC_DNS_Response(http_errmsg=str(err), single_result=single_result, retries=attempt, debug=self.debug)
+                if self.debug:
+                    print("*** DEBUG: http-response: http-code   : "  + str(response.http_code))
+                    print("*** DEBUG: http-response: http-error  : '" + response.http_errmsg + "'")
+                return response
+
+            if info is not None:
+                info['bytes_sent'] += len(req_data or b'')
+                info['bytes_received'] = len(ret.content)
+                info['timings']['ttfb'] = ret.elapsed.total_seconds()
+
+            if not self.rate_limiter:
+                break
+            if ret.status_code != 429:
+                self.rate_limiter.succeeded(endpoint)
+                break
+
+            # slow down and retry throttled requests if this is safe
+            wait = self.rate_limiter.throttled(endpoint, parse_retry_after(ret.headers.get('Retry-After')), attempt)
+            if not idempotent or attempt >= self.rate_limiter.max_retries:
+                break
+            attempt += 1
+            if self.debug:
+                print("*** DEBUG: http-response: throttled   : retry " + str(attempt) + " in " + str(round(wait, 2)) + "s")
+
+        if self.cache and method == 'GET':
+            if ret.status_code == 304 and cached:
+                # the cached response is still valid
+                self.cache.refresh(self.cache_account, url)
+                if info is not None:
+                    info['cache'] = 'revalidated'
+                if self.debug:
+                    print("*** DEBUG: http-cache   : not-modified: " + url)
+                return deSEC_DNS_Response(http_code=cached['code'], http_body=cached['body'], http_errmsg='OK',
+                                          headers=cached['headers'], single_result=single_result, retries=attempt, debug=self.debug)
+            if ret.status_code == 200:
+                self.cache.put(self.cache_account, url, zone, ret.status_code, ret.text, ret.headers)
+        elif self.cache:
+            # writes invalidate the cached responses of the domain and the domain list
+            self.cache.invalidate(self.cache_account, zone)
+            self.cache.invalidate(self.cache_account, '')
+
+        response = deSEC_DNS_Response(http_code=ret.status_code, http_body=ret.text, http_errmsg=ret.reason,
+                                      headers=ret.headers, single_result=single_result, retries=attempt, debug=self.debug)
         if self.debug:
-            print("*** DEBUG: json2dict    : ret_dict    : " + str(ret_dict))
+            print("*** DEBUG: http-request : url         : "  + ret.url)
+            print("*** DEBUG: http-response: http-code   : "  + str(response.http_code))
+            print("*** DEBUG: http-response: http-header :\n" + str(ret.headers))
+            print("*** DEBUG: http-response: http-body   :\n" + response.http_body + "\n")
 
-        return ret_dict
+        return response
 
 
 
     def domain_list(self, zone=None):
         """
         Function to request the domain list
-        Return: boolean (based on http_code)
+        Return: deSEC_DNS_Response object (evaluates to boolean based on http_code)
 
         Keyword arguments:
         zone -- The domain name that should be filtered for
         """
 
-        # check for zone to filter result
-        url_addition = ''
-        self.single_result = False
-        if zone:
-            url_addition = zone + "/"
-            self.single_result = True
-
         # compile request url
-        req_url = self.url_base + url_addition
+        req_url, single_result = self._domain_url(zone)
         # request the list from the api
-        self.http_request(url=req_url, header=self.header, data=None, method='GET')
+        response = self.http_request(url=req_url, header=self.header, data=None, method='GET', single_result=single_result)
 
-        # return code indicates success
-        if self.http_code < 300:
-            return True
-        else:
-            return False
+        return response
 
 
     def domain_create(self, zone):
         """
         Function to create a new domain
-        Return: boolean (based on http_code)
+        Return: deSEC_DNS_Response object (evaluates to boolean based on http_code)
 
         Keyword arguments:
         zone -- The domain name that should be created
         """
-        self.single_result = True
-
         # compose POST data
-        post_data = dict()
-        post_data['name'] = zone
-        data = json.dumps(post_data)
-
-        # Extend headers with Content-Type
-        headers = self.header
-        headers['Content-Type'] = "application/json"
+        data = self._domain_create_data(zone)
+        headers = self._json_header()
 
         # compile request url
-        req_url = self.url_base
+        req_url = self._domain_url()[0]
         # request the list from the api
-        self.http_request(url=req_url, header=headers, data=data, method='POST')
+        response = self.http_request(url=req_url, header=headers, data=data, method='POST', single_result=True)
 
-        # return code indicates success
-        if self.http_code < 300:
-            return True
-        else:
-            return False
+        return response
 
 
     def domain_delete(self, zone):
         """
         Function to delete a domain
-        Return: boolean (based on http_code)
+        Return: deSEC_DNS_Response object (evaluates to boolean based on http_code)
 
         Keyword arguments:
         zone -- The domain name that should be deleted
         """
 
-        # set zone to specify domain
-        url_addition = ''
-        url_addition = zone + "/"
-
         # compile request url
-        req_url = self.url_base + url_addition
+        req_url = self._domain_url(zone)[0]
         # request the list from the api
-        self.http_request(url=req_url, header=self.header, method='DELETE')
+        response = self.http_request(url=req_url, header=self.header, method='DELETE')
 
-        # return code indicates success
-        if self.http_code < 300:
-            return True
-        else:
-            return False
+        return response
+
+
+    def _pipeline(self, function, items, concurrency):
+        """
+        Generator calling a function for many items in threads, with at most concurrency calls running
+        The items are taken from the iterable only when a thread is free, so
+        a long stream (like the lines of a file) is never read completely.
+        Return: generator of the results in the order the calls finish
+
+        Keyword arguments:
+        function -- Function called with an item
+        items -- Iterable of the items
+        concurrency -- The maximum number of calls running at the same time
+        """
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending = set()
+            for item in items:
+                if len(pending) >= concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                pending.add(executor.submit(function, item))
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+
+    def _domain_attempts(self, request, retries):
+        """
+        Function to send a request again while it fails temporarily (see _domain_transient)
+        Return: tuple of the deSEC_DNS_Response object of the last attempt and the number of attempts
 
+        Keyword arguments:
+        request -- Function sending the request
+        retries -- The number of times the request is sent again
+        """
+        attempt = 0
+        while True:
+            response = request()
+            if response or attempt >= retries or not self._domain_transient(response):
+                return response, attempt + 1
+            attempt += 1
+            # throttling already slows down the rate limiter, other errors get a moment to recover
+            if response.http_code != 429:
+                time.sleep(attempt)
+
+
+    def domain_create_many(self, zones, rrsets=None, concurrency=10, retries=2, chunk_size=500):
+        """
+        Generator creating many domains and setting their initial rrsets
+        The domain names are taken from zones while earlier domains are still
+        created, at most concurrency domains are in progress at a time and all
+        of them share the connection pool. A new domain gets its rrsets with
+        bulk requests right after it was created, by the same thread.
+        Requests failing temporarily are sent again up to retries times, other
+        failures are reported in the result of the domain.
+        Return: generator of result dicts (zone, action, status, error, attempts, rrsets) in the order they finish
+
+        Keyword arguments:
+        zones -- Iterable of domain names or dicts with 'name' and 'rrsets' (the rrsets of this domain)
+        rrsets -- List of rrset dicts (subname, type, ttl, records) set in every domain without own rrsets (default None)
+        concurrency -- The maximum number of domains in progress at the same time (default 10)
+        retries -- The number of times a request failing temporarily is sent again (default 2)
+        chunk_size -- The maximum number of rrsets sent in one request (default 500)
+        """
+        def create(item):
+            zone, zone_rrsets = self._domain_item(item, rrsets)
+            response, attempts = self._domain_attempts(lambda: self.domain_create(zone), retries)
+            result = self._domain_result(zone, 'create', response, attempts)
+            if response and zone_rrsets:
+                self._domain_seeded(result, self.rrset_bulk(zone, zone_rrsets, chunk_size=chunk_size))
+            return result
+
+        return self._pipeline(create, zones, concurrency)
 
 
+    def domain_delete_many(self, zones, concurrency=10, retries=2):
+        """
+        Generator deleting many domains
+        Works like domain_create_many, a domain missing when a request is
+        sent again counts as deleted.
+        Return: generator of result dicts (zone, action, status, error, attempts, rrsets) in the order they finish
 
-    def rrset_list(self, zone, type=None, subname=None):
+        Keyword arguments:
+        zones -- Iterable of domain names (or dicts with 'name')
+        concurrency -- The maximum number of domains in progress at the same time (default 10)
+        retries -- The number of times a request failing temporarily is sent again (default 2)
+        """
+        def delete(item):
+            zone = self._domain_item(item)[0]
+            response, attempts = self._domain_attempts(lambda: self.domain_delete(zone), retries)
+            return self._domain_result(zone, 'delete', response, attempts)
+
+        return self._pipeline(delete, zones, concurrency)
+
+
+    def rrset_list(self, zone, type=None, subname=None, subname_pattern=None):
         """
         Function to request the rrset list
-        Return: boolean (based on http_code)
+        Several types and subnames are requested concurrently and merged into
+        one response (see iter_rrset_pages). Zones with more rrsets than fit on
+        one page need iter_rrset_pages or iter_rrsets.
+        Return: deSEC_DNS_Response object (evaluates to boolean based on http_code)
+
+        Keyword arguments:
+        zone -- The domain that should be used
+        type -- The type or list of types of rrsets that should be shown (default None)
+        subname -- The subname or list of subnames of rrsets that should be shown (default None)
+        subname_pattern -- The glob pattern or list of patterns the subnames have to match (default None)
+        """
+        queries, match = self._rrset_filter(type=type, subname=subname, subname_pattern=subname_pattern)
+        if len(queries) > 1 or match is not None:
+            return next(self.iter_rrset_pages(zone, type=type, subname=subname, subname_pattern=subname_pattern))
+
+        req_url = self._rrset_list_url(zone, type=queries[0][0], subname=queries[0][1])
+        # request the list from the api
+        response = self.http_request(url=req_url, header=self.header, data=None, method='GET')
+
+        return response
+
+
+    def _iter_query_pages(self, zone, type=None, subname=None):
+        """
+        Generator requesting the pages of a rrset list with a single type and subname filter
+        Return: generator of deSEC_DNS_Response objects (stops after a failed request)
 
         Keyword arguments:
         zone -- The domain that should be used
         type -- The type of rrsets that should be shown (default None)
         subname -- The subname of rrset that should be shown (default None)
         """
-        # check for filter arguments
-        url_addition = ''
-        self.single_result = False
-        if type:
-            url_addition = "?type=" + type
-        if subname:
-            url_addition = "?subname=" + subname
-        if type and subname:
-            url_addition = subname + ".../" + type + "/"
-            self.single_result = True
+        # an empty cursor requests the first page
+        req_url = self._rrset_first_page_url(self._rrset_list_url(zone, type=type, subname=subname))
 
-        # compile request url
-        req_url = self.url_base + zone + "/rrsets/" + url_addition
-        # request the list from the api
-        self.http_request(url=req_url, header=self.header, data=None, method='GET')
+        while req_url:
+            response = self.http_request(url=req_url, header=self.header, data=None, method='GET')
+            yield response
+            if not response:
+                return
+            req_url = response.links.get('next')
 
-        # return code indicates success
-        if self.http_code < 300:
-            return True
-        else:
-            return False
+
+    def iter_rrset_pages(self, zone, type=None, subname=None, subname_pattern=None, concurrency=10):
+        """
+        Generator requesting the rrset list page by page
+        The cursor links of the api are followed lazily, the next page is only
+        requested when the previous one has been consumed. Filters the api
+        cannot express in one request (see _rrset_filter) are requested
+        concurrently, filtered on the client and merged into a single page.
+        Return: generator of deSEC_DNS_Response objects (stops after a failed request)
+
+        Keyword arguments:
+        zone -- The domain that should be used
+        type -- The type or list of types of rrsets that should be shown (default None)
+        subname -- The subname or list of subnames of rrsets that should be shown (default None)
+        subname_pattern -- The glob pattern or list of patterns the subnames have to match (default None)
+        concurrency -- The maximum number of requests running at the same time (default 10)
+        """
+        queries, match = self._rrset_filter(type=type, subname=subname, subname_pattern=subname_pattern)
+        if len(queries) == 1 and match is None:
+            for response in self._iter_query_pages(zone, type=queries[0][0], subname=queries[0][1]):
+                yield response
+            return
+
+        def list_pages(query):
+            return list(self._iter_query_pages(zone, type=query[0], subname=query[1]))
+
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(queries))) as executor:
+            results = list(executor.map(list_pages, queries))
+        yield self._rrset_merged_response((response for pages in results for response in pages), match)
+
+
+    def iter_rrsets(self, zone, type=None, subname=None, compact=False, subname_pattern=None):
+        """
+        Generator yielding the rrsets of a domain one by one
+        Only one page of rrsets is kept in memory at a time.
+        Return: generator of dicts or RRset objects (raises deSEC_DNS_Error if a request fails)
+
+        Keyword arguments:
+        zone -- The domain that should be used
+        type -- The type or list of types of rrsets that should be shown (default None)
+        subname -- The subname or list of subnames of rrsets that should be shown (default None)
+        compact -- Yield RRset objects instead of dicts, for keeping many rrsets in memory (default False)
+        subname_pattern -- The glob pattern or list of patterns the subnames have to match (default None)
+        """
+        for response in self.iter_rrset_pages(zone, type=type, subname=subname, subname_pattern=subname_pattern):
+            if not response:
+                raise deSEC_DNS_Error(response)
+            for rrset in (response.get_response_rrsets() if compact else response.get_response_dict()):
+                yield rrset
+
+
+    def rrset_list_zones(self, zones, type=None, subname=None, concurrency=10, subname_pattern=None):
+        """
+        Function to request the rrset lists of many domains concurrently
+        Return: list of tuples (zone, deSEC_DNS_Response object), one per page, in the order of zones
+
+        Keyword arguments:
+        zones -- The list of domains that should be used
+        type -- The type or list of types of rrsets that should be shown (default None)
+        subname -- The subname or list of subnames of rrsets that should be shown (default None)
+        concurrency -- The maximum number of requests running at the same time (default 10)
+        subname_pattern -- The glob pattern or list of patterns the subnames have to match (default None)
+        """
+        def list_pages(zone):
+            # the queries of a filter are not run concurrently again, the domains already are
+            return list(self.iter_rrset_pages(zone, type=type, subname=subname, subname_pattern=subname_pattern, concurrency=1))
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(list_pages, zone) for zone in zones]
+            return [(zone, response) for zone, future in zip(zones, futures) for response in future.result()]
 
 
     def rrset_create(self, zone, type, subname, records, ttl):
         """
         Function to create a new rrset
-        Return: boolean (based on http_code)
+        Return: deSEC_DNS_Response object (evaluates to boolean based on http_code; raises ValueError for invalid records, nothing is sent)
 
         Keyword arguments:
         zone -- The domain that should be used
@@ -235,63 +1211,43 @@ class deSEC_DNS_API(object):
         records -- The records that should be set for this rrset
         ttl -- The ttl that should be set for this rrset
         """
-        self.single_result = True
-
         # compose POST data
-        post_data = dict()
-        post_data['subname'] = subname
-        post_data['type'] = type
-        post_data['ttl'] = ttl
-        post_data['records'] = records.split(",")
-        data = json.dumps(post_data)
+        data = self._rrset_create_data(type, subname, records, ttl)
+        headers = self._json_header()
 
         if self.debug:
             print("*** DEBUG: data=" + data)
 
-        # Extend headers with Content-Type
-        headers = self.header
-        headers['Content-Type'] = "application/json"
-
         # compile request url
-        req_url = self.url_base + zone + "/rrsets/"
+        req_url = self._rrset_url(zone)
         # request the list from the api
-        self.http_request(url=req_url, header=headers, data=data, method='POST')
+        response = self.http_request(url=req_url, header=headers, data=data, method='POST', single_result=True)
 
-        # return code indicates success
-        if self.http_code < 300:
-            return True
-        else:
-            return False
+        return response
 
 
     def rrset_delete(self, zone, type, subname):
         """
         Function to delete a new rrset
-        Return: boolean (based on http_code)
+        Return: deSEC_DNS_Response object (evaluates to boolean based on http_code)
 
         Keyword arguments:
         zone -- The domain that should be used
         type -- The type of rrsets that should be deleted
         subname -- The subname of rrset that should be deleted
         """
-        self.single_result = True
-
         # compile request url
-        req_url = self.url_base + zone + "/rrsets/" + subname + ".../" + type + "/"
+        req_url = self._rrset_url(zone, type=type, subname=subname)
         # request the list from the api
-        self.http_request(url=req_url, header=self.header, data=None, method='DELETE')
+        response = self.http_request(url=req_url, header=self.header, data=None, method='DELETE')
 
-        # return code indicates success
-        if self.http_code < 300:
-            return True
-        else:
-            return False
+        return response
 
 
     def rrset_modify(self, zone, type, subname, records=None, ttl=None):
         """
         Function to modify a new rrset
-        Return: boolean (based on http_code)
+        Return: deSEC_DNS_Response object (evaluates to boolean based on http_code; raises ValueError for invalid records, nothing is sent)
 
         Keyword arguments:
         zone -- The domain that should be used
@@ -300,27 +1256,71 @@ class deSEC_DNS_API(object):
         records -- The records that should be set for this rrset (default None)
         ttl -- The ttl that should be set for this rrset (default None)
         """
-        self.single_result = True
-
-        # compose POST data
-        post_data = dict()
-        if ttl:
-            post_data['ttl'] = ttl
-        if records:
-            post_data['records'] = records.split(",")
-        data = json.dumps(post_data)
-
-        # Extend headers with Content-Type
-        headers = self.header
-        headers['Content-Type'] = "application/json"
+        # compose PATCH data
+        data = self._rrset_modify_data(type, records=records, ttl=ttl)
+        headers = self._json_header()
 
         # compile request url
-        req_url = self.url_base + zone + "/rrsets/" + subname + ".../" + type + "/"
+        req_url = self._rrset_url(zone, type=type, subname=subname)
         # request the list from the api
-        self.http_request(url=req_url, header=headers, data=data, method='PATCH')
+        # the rrset is set to the given values, so the request can be repeated safely
+        response = self.http_request(url=req_url, header=headers, data=data, method='PATCH', single_result=True, idempotent=True)
 
-        # return code indicates success
-        if self.http_code < 300:
-            return True
+        return response
+
+
+    def rrset_bulk(self, zone, changes, chunk_size=500, journal=None):
+        """
+        Function to apply many rrset changes of a zone with bulk requests
+        The changes are sent in chunks as bulk PATCH to the rrsets endpoint.
+        As the api applies a bulk request either completely or not at all,
+        a chunk rejected for some of its rrsets is sent again without them.
+        Invalid changes are found before they are sent and fail on their own.
+        Return: list of dicts (one per change, with 'status' and 'error')
+
+        Keyword arguments:
+        zone -- The domain that should be used
+        changes -- List of dicts with 'action' (create, modify, delete), 'subname', 'type', 'ttl' and 'records'
+        chunk_size -- The maximum number of rrsets sent in one request (default 500)
+        journal -- Journal object recording the changes, changes completed before are skipped (default None)
+        """
+        changes, results = self._rrset_bulk_validate(changes)
+        if journal is not None:
+            changes, skipped = journal.plan(zone, changes)
+            results.extend(skipped)
+        for start in range(0, len(changes), chunk_size):
+            chunk = changes[start:start + chunk_size]
+            chunk_results = self._rrset_bulk_chunk(zone, chunk)
+            if journal is not None:
+                journal.record(zone, chunk, chunk_results)
+            results.extend(chunk_results)
+        return results
+
+
+    def _rrset_bulk_chunk(self, zone, chunk, resend=True):
+        """
+        Function to send one chunk of rrset changes as bulk request
+        Return: list of dicts (one per change, with 'status' and 'error')
+
+        Keyword arguments:
+        zone -- The domain that should be used
+        chunk -- List of change dicts (see rrset_bulk)
+        resend -- Send the chunk again without the rejected rrsets (default True)
+        """
+        # compose PATCH data, an empty records list deletes the rrset
+        data = self._rrset_bulk_data(chunk)
+        headers = self._json_header()
+
+        # compile request url
+        req_url = self._rrset_url(zone)
+        # send the chunk to the api, the rrsets are set to the given values so the request can be repeated safely
+        response = self.http_request(url=req_url, header=headers, data=data, method='PATCH', idempotent=True)
+        results, valid = self._rrset_bulk_results(chunk, response)
+
+        # send the valid rrsets again, they have not been applied together with the rejected ones
+        if valid and resend:
+            self._rrset_bulk_resent(valid, self._rrset_bulk_chunk(zone, [change for change, result in valid], resend=False))
         else:
-            return False
+            self._rrset_bulk_resent(valid)
+
+        return results
@@ -0,0 +1,528 @@
+#!/usr/bin/python
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+import asyncio
+import time
+try:
+    # aiohttp - asyncio http client, only required for this module
+    #   https://docs.aiohttp.org
+    import aiohttp
+except ImportError:
+    aiohttp = None
+from desec_dns_api import deSEC_DNS_Base, deSEC_DNS_Response, deSEC_DNS_Error, json_loads
+from desec_dns_ratelimit import RateLimiter, endpoint_class, parse_retry_after, IDEMPOTENT_METHODS
+
+
+class deSEC_DNS_API_Async(deSEC_DNS_Base):
+    """
+    Class to handle the deSEC DNS API requests with asyncio
+    Offers the methods of deSEC_DNS_API as coroutines. Instead of response
+    objects they return the parsed json of the response and raise
+    deSEC_DNS_Error when a request fails, so many requests can run at the
+    same time with asyncio.gather.
+    Requires: api_url, api_token
+    """
+
+    def __init__(self, api_url, api_token, debug=False, pool_size=10, keep_alive=True, timeout_connect=10, timeout_read=60,
+                 rate_limits=None, max_retries=5):
+        """
+        Initially set the base url and the auth header
+        The connection pool is created with the first request, within the running event loop.
+
+        Keyword arguments:
+        api_url -- The API url used to cennect to
+        api_token -- The API token used to authentiocate on the API
+        debug -- Enable / Disable debug output (default False)
+        pool_size -- Maximum number of connections open to the API at the same time (default 10)
+        keep_alive -- Reuse connections between requests (default True)
+        timeout_connect -- Seconds to wait for a connection to be established (default 10)
+        timeout_read -- Seconds to wait for the API to send a response (default 60)
+        rate_limits -- Dict of endpoint class to dict with 'rate' and 'burst', False disables the rate limiting (default None)
+        max_retries -- The number of times a throttled idempotent request is retried (default 5)
+        """
+        if aiohttp is None:
+            raise ImportError("deSEC_DNS_API_Async requires the aiohttp module (pip install aiohttp)")
+        super(deSEC_DNS_API_Async, self).__init__(api_url, api_token, debug=debug)
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.timeout = aiohttp.ClientTimeout(sock_connect=timeout_connect, sock_read=timeout_read)
+        self.session = None
+
+        # create the client side rate limiter (one token bucket per endpoint class)
+        self.rate_limiter = None
+        if rate_limits is not False:
+            self.rate_limiter = RateLimiter(rate_limits=rate_limits, max_retries=max_retries)
+
+
+    def _get_session(self):
+        """
+        Function to get the session holding the connection pool, created on first use
+        Return: aiohttp.ClientSession object
+        """
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, force_close=not self.keep_alive)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self.session
+
+
+    async def close(self):
+        """
+        Function to close all pooled connections of this object
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+    async def http_request(self, url, header, method='GET', data=None, single_result=False, idempotent=None):
+        """
+        Function performing http requests
+        Throttled requests (429) slow down the endpoint class of the request and
+        are sent again after the time requested by the api, if they are idempotent.
+        Waiting for the rate limit does not block the event loop. The registered
+        instrumentation hooks are called before and after the request (the
+        phases dns, connect and tls are not measured).
+        Return: deSEC_DNS_Response object
+
+        Keyword arguments:
+        url -- The api url to send the request to
+        header -- Headers to send with the HTTP request
+        method -- The HTTP method used for the request (default 'GET')
+        data -- The request data to be sent with the request (default None)
+        single_result -- The response contains a single object instead of a list (default False)
+        idempotent -- The request can be sent again safely (default None, based on the method)
+        """
+        info = self._request_info(method, url)
+        response = await self._http_request(url, header, method=method, data=data, single_result=single_result,
+                                            idempotent=idempotent, info=info)
+        if info is None:
+            return response
+        return self._request_done(info, response)
+
+
+    async def _http_request(self, url, header, method='GET', data=None, single_result=False, idempotent=None, info=None):
+        """
+        Function performing http requests (see http_request)
+        Return: deSEC_DNS_Response object
+
+        Keyword arguments:
+        url -- The api url to send the request to
+        header -- Headers to send with the HTTP request
+        method -- The HTTP method used for the request (default 'GET')
+        data -- The request data to be sent with the request (default None)
+        single_result -- The response contains a single object instead of a list (default False)
+        idempotent -- The request can be sent again safely (default None, based on the method)
+        info -- The dict describing the request, filled with bytes and time to first byte (default None)
+        """
+        if self.debug:
+            print("*** DEBUG: http-request : http-url    : " + url)
+            print("*** DEBUG: http-request : http-method : " + method)
+            print("*** DEBUG: http-request : http-header : " + str(header))
+            print("*** DEBUG: http-request : http-data   : " + str(data))
+
+        req_data = None
+        if data is not None:
+            req_data = data.encode('utf-8')
+
+        endpoint = endpoint_class(method, url)
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        session = self._get_session()
+
+        attempt = 0
+        while True:
+            # wait for the rate limit of the endpoint class
+            if self.rate_limiter:
+                wait = self.rate_limiter.reserve(endpoint)
+                while wait > 0:
+                    await asyncio.sleep(wait)
+                    wait = self.rate_limiter.reserve(endpoint)
+
+            # Send the request (GET, POST, PATCH, DELETE) through the pooled session
+            try:
+                sent = time.time()
+                async with session.request(method, url, data=req_data, headers=header) as ret:
+                    if info is not None:
+                        info['timings']['ttfb'] = time.time() - sent
+                    http_code = ret.status
+                    http_errmsg = ret.reason
+                    headers = dict(ret.headers)
+                    http_body = await ret.text()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                response = deSEC_DNS_Response(http_errmsg=str(err) or repr(err), single_result=single_result, retries=attempt, debug=self.debug)
+                if self.debug:
+                    print("*** DEBUG: http-response: http-code   : "  + str(response.http_code))
+                    print("*** DEBUG: http-response: http-error  : '" + response.http_errmsg + "'")
+                return response
+
+            if info is not None:
+                info['bytes_sent'] += len(req_data or b'')
+                info['bytes_received'] = len(http_body.encode('utf-8'))
+
+            if not self.rate_limiter:
+                break
+            if http_code != 429:
+                self.rate_limiter.succeeded(endpoint)
+                break
+
+            # slow down and retry throttled requests if this is safe
+            wait = self.rate_limiter.throttled(endpoint, parse_retry_after(headers.get('Retry-After')), attempt)
+            if not idempotent or attempt >= self.rate_limiter.max_retries:
+                break
+            attempt += 1
+            if self.debug:
+                print("*** DEBUG: http-response: throttled   : retry " + str(attempt) + " in " + str(round(wait, 2)) + "s")
+
+        response = deSEC_DNS_Response(http_code=http_code, http_body=http_body, http_errmsg=http_errmsg,
+                                      headers=headers, single_result=single_result, retries=attempt, debug=self.debug)
+        if self.debug:
+            print("*** DEBUG: http-response: http-code   : "  + str(response.http_code))
+            print("*** DEBUG: http-response: http-header :\n" + str(headers))
+            print("*** DEBUG: http-response: http-body   :\n" + response.http_body + "\n")
+
+        return response
+
+
+    async def _request(self, url, header, method='GET', data=None, idempotent=None):
+        """
+        Function performing a request and parsing the result
+        Return: the parsed json of the response (None for an empty response)
+
+        Keyword arguments:
+        url -- The api url to send the request to
+        header -- Headers to send with the HTTP request
+        method -- The HTTP method used for the request (default 'GET')
+        data -- The request data to be sent with the request (default None)
+        idempotent -- The request can be sent again safely (default None, based on the method)
+        """
+        response = await self.http_request(url=url, header=header, method=method, data=data, idempotent=idempotent)
+        if not response:
+            raise deSEC_DNS_Error(response)
+        if not response.http_body:
+            return None
+        return json_loads(response.http_body)
+
+
+
+    async def domain_list(self, zone=None):
+        """
+        Function to request the domain list
+        Return: list of dicts (dict of the domain if zone is given)
+
+        Keyword arguments:
+        zone -- The domain name that should be filtered for
+        """
+        req_url = self._domain_url(zone)[0]
+        return await self._request(url=req_url, header=self.header, method='GET')
+
+
+    async def domain_create(self, zone):
+        """
+        Function to create a new domain
+        Return: dict of the created domain
+
+        Keyword arguments:
+        zone -- The domain name that should be created
+        """
+        req_url = self._domain_url()[0]
+        return await self._request(url=req_url, header=self._json_header(), method='POST', data=self._domain_create_data(zone))
+
+
+    async def domain_delete(self, zone):
+        """
+        Function to delete a domain
+        Return: None
+
+        Keyword arguments:
+        zone -- The domain name that should be deleted
+        """
+        req_url = self._domain_url(zone)[0]
+        return await self._request(url=req_url, header=self.header, method='DELETE')
+
+
+    async def _pipeline(self, function, items, concurrency):
+        """
+        Generator running a coroutine function for many items, with at most concurrency of them running
+        The items are taken from the iterable only when a slot is free (see deSEC_DNS_API._pipeline).
+        Return: async generator of the results in the order the calls finish
+
+        Keyword arguments:
+        function -- Coroutine function called with an item
+        items -- Iterable of the items
+        concurrency -- The maximum number of calls running at the same time
+        """
+        pending = set()
+        for item in items:
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+            pending.add(asyncio.ensure_future(function(item)))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+
+
+    async def _domain_attempts(self, request, retries):
+        """
+        Function to send a request again while it fails temporarily (see deSEC_DNS_API._domain_attempts)
+        Return: tuple of the deSEC_DNS_Response object of the last attempt and the number of attempts
+
+        Keyword arguments:
+        request -- Coroutine function sending the request
+        retries -- The number of times the request is sent again
+        """
+        attempt = 0
+        while True:
+            response = await request()
+            if response or attempt >= retries or not self._domain_transient(response):
+                return response, attempt + 1
+            attempt += 1
+            if response.http_code != 429:
+                await asyncio.sleep(attempt)
+
+
+    async def domain_create_many(self, zones, rrsets=None, concurrency=10, retries=2, chunk_size=500):
+        """
+        Generator creating many domains and setting their initial rrsets (see deSEC_DNS_API.domain_create_many)
+        Return: async generator of result dicts (zone, action, status, error, attempts, rrsets) in the order they finish
+
+        Keyword arguments:
+        zones -- Iterable of domain names or dicts with 'name' and 'rrsets' (the rrsets of this domain)
+        rrsets -- List of rrset dicts (subname, type, ttl, records) set in every domain without own rrsets (default None)
+        concurrency -- The maximum number of domains in progress at the same time (default 10)
+        retries -- The number of times a request failing temporarily is sent again (default 2)
+        chunk_size -- The maximum number of rrsets sent in one request (default 500)
+        """
+        async def create(item):
+            zone, zone_rrsets = self._domain_item(item, rrsets)
+            response, attempts = await self._domain_attempts(
+                lambda: self.http_request(url=self._domain_url()[0], header=self._json_header(), method='POST',
+                                          data=self._domain_create_data(zone)), retries)
+            result = self._domain_result(zone, 'create', response, attempts)
+            if response and zone_rrsets:
+                self._domain_seeded(result, await self.rrset_bulk(zone, zone_rrsets, chunk_size=chunk_size))
+            return result
+
+        async for result in self._pipeline(create, zones, concurrency):
+            yield result
+
+
+    async def domain_delete_many(self, zones, concurrency=10, retries=2):
+        """
+        Generator deleting many domains (see deSEC_DNS_API.domain_delete_many)
+        Return: async generator of result dicts (zone, action, status, error, attempts, rrsets) in the order they finish
+
+        Keyword arguments:
+        zones -- Iterable of domain names (or dicts with 'name')
+        concurrency -- The maximum number of domains in progress at the same time (default 10)
+        retries -- The number of times a request failing temporarily is sent again (default 2)
+        """
+        async def delete(item):
+            zone = self._domain_item(item)[0]
+            response, attempts = await self._domain_attempts(
+                lambda: self.http_request(url=self._domain_url(zone)[0], header=self.header, method='DELETE'), retries)
+            return self._domain_result(zone, 'delete', response, attempts)
+
+        async for result in self._pipeline(delete, zones, concurrency):
+            yield result
+
+
+    async def _query_pages(self, zone, type=None, subname=None):
+        """
+        Function to request all pages of a rrset list with a single type and subname filter
+        Return: list of deSEC_DNS_Response objects (raises deSEC_DNS_Error if a request fails)
+
+        Keyword arguments:
+        zone -- The domain that should be used
+        type -- The type of rrsets that should be shown (default None)
+        subname -- The subname of rrset that should be shown (default None)
+        """
+        req_url = self._rrset_first_page_url(self._rrset_list_url(zone, type=type, subname=subname))
+        pages = list()
+        while req_url:
+            response = await self.http_request(url=req_url, header=self.header, method='GET')
+            if not response:
+                raise deSEC_DNS_Error(response)
+            pages.append(response)
+            req_url = response.links.get('next')
+        return pages
+
+
+    async def iter_rrsets(self, zone, type=None, subname=None, compact=False, subname_pattern=None):
+        """
+        Asynchronous generator yielding the rrsets of a domain one by one
+        The cursor links of the api are followed, one page is kept in memory at a time.
+        Filters the api cannot express in one request are requested concurrently
+        and filtered on the client (see deSEC_DNS_API.iter_rrset_pages).
+        Return: asynchronous generator of dicts or RRset objects (raises deSEC_DNS_Error if a request fails)
+
+        Keyword arguments:
+        zone -- The domain that should be used
+        type -- The type or list of types of rrsets that should be shown (default None)
+        subname -- The subname or list of subnames of rrsets that should be shown (default None)
+        compact -- Yield RRset objects instead of dicts (default False)
+        subname_pattern -- The glob pattern or list of patterns the subnames have to match (default None)
+        """
+        queries, match = self._rrset_filter(type=type, subname=subname, subname_pattern=subname_pattern)
+        if len(queries) == 1 and match is None:
+            req_url = self._rrset_first_page_url(self._rrset_list_url(zone, type=queries[0][0], subname=queries[0][1]))
+            while req_url:
+                response = await self.http_request(url=req_url, header=self.header, method='GET')
+                if not response:
+                    raise deSEC_DNS_Error(response)
+                for rrset in (response.get_response_rrsets() if compact else response.get_response_dict()):
+                    yield rrset
+                req_url = response.links.get('next')
+            return
+
+        results = await asyncio.gather(*[self._query_pages(zone, type=query[0], subname=query[1]) for query in queries])
+        response = self._rrset_merged_response((response for pages in results for response in pages), match)
+        for rrset in (response.get_response_rrsets() if compact else response.get_response_dict()):
+            yield rrset
+
+
+    async def rrset_list(self, zone, type=None, subname=None, subname_pattern=None):
+        """
+        Function to request the rrset list, all pages are requested
+        Return: list of dicts
+
+        Keyword arguments:
+        zone -- The domain that should be used
+        type -- The type or list of types of rrsets that should be shown (default None)
+        subname -- The subname or list of subnames of rrsets that should be shown (default None)
+        subname_pattern -- The glob pattern or list of patterns the subnames have to match (default None)
+        """
+        return [rrset async for rrset in self.iter_rrsets(zone, type=type, subname=subname, subname_pattern=subname_pattern)]
+
+
+    async def rrset_list_zones(self, zones, type=None, subname=None, concurrency=10, subname_pattern=None):
+        """
+        Function to request the rrset lists of many domains concurrently
+        Return: list of tuples (zone, list of dicts) in the order of zones
+
+        Keyword arguments:
+        zones -- The list of domains that should be used
+        type -- The type or list of types of rrsets that should be shown (default None)
+        subname -- The subname or list of subnames of rrsets that should be shown (default None)
+        concurrency -- The maximum number of domains requested at the same time (default 10)
+        subname_pattern -- The glob pattern or list of patterns the subnames have to match (default None)
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def list_zone(zone):
+            async with semaphore:
+                return await self.rrset_list(zone, type=type, subname=subname, subname_pattern=subname_pattern)
+
+        results = await asyncio.gather(*[list_zone(zone) for zone in zones])
+        return list(zip(zones, results))
+
+
+    async def rrset_create(self, zone, type, subname, records, ttl):
+        """
+        Function to create a new rrset
+        The records are checked before anything is sent, like the changes of rrset_bulk.
+        Return: dict of the created rrset (raises ValueError for invalid records)
+
+        Keyword arguments:
+        zone -- The domain that should be used
+        type -- The type of rrsets that should be created
+        subname -- The subname of rrset that should be created
+        records -- The records that should be set for this rrset (comma separated string or list)
+        ttl -- The ttl that should be set for this rrset
+        """
+        data = self._rrset_create_data(type, subname, records, ttl)
+        return await self._request(url=self._rrset_url(zone), header=self._json_header(), method='POST', data=data)
+
+
+    async def rrset_delete(self, zone, type, subname):
+        """
+        Function to delete a rrset
+        Return: None
+
+        Keyword arguments:
+        zone -- The domain that should be used
+        type -- The type of rrsets that should be deleted
+        subname -- The subname of rrset that should be deleted
+        """
+        req_url = self._rrset_url(zone, type=type, subname=subname)
+        return await self._request(url=req_url, header=self.header, method='DELETE')
+
+
+    async def rrset_modify(self, zone, type, subname, records=None, ttl=None):
+        """
+        Function to modify a rrset
+        The records are checked before anything is sent, like the changes of rrset_bulk.
+        Return: dict of the modified rrset (None if it was deleted by empty records; raises ValueError for invalid records)
+
+        Keyword arguments:
+        zone -- The domain that should be used
+        type -- The type of rrsets that should be modified
+        subname -- The subname of rrset that should be modified
+        records -- The records that should be set for this rrset (default None)
+        ttl -- The ttl that should be set for this rrset (default None)
+        """
+        data = self._rrset_modify_data(type, records=records, ttl=ttl)
+        req_url = self._rrset_url(zone, type=type, subname=subname)
+        # the rrset is set to the given values, so the request can be repeated safely
+        return await self._request(url=req_url, header=self._json_header(), method='PATCH', data=data, idempotent=True)
+
+
+    async def rrset_bulk(self, zone, changes, chunk_size=500, journal=None):
+        """
+        Function to apply many rrset changes of a zone with bulk requests
+        The chunks are sent one after the other, as in deSEC_DNS_API.rrset_bulk.
+        Return: list of dicts (one per change, with 'status' and 'error')
+
+        Keyword arguments:
+        zone -- The domain that should be used
+        changes -- List of dicts with 'action' (create, modify, delete), 'subname', 'type', 'ttl' and 'records'
+        chunk_size -- The maximum number of rrsets sent in one request (default 500)
+        journal -- Journal object recording the changes, changes completed before are skipped (default None)
+        """
+        changes, results = self._rrset_bulk_validate(changes)
+        if journal is not None:
+            changes, skipped = journal.plan(zone, changes)
+            results.extend(skipped)
+        for start in range(0, len(changes), chunk_size):
+            chunk = changes[start:start + chunk_size]
+            chunk_results = await self._rrset_bulk_chunk(zone, chunk)
+            if journal is not None:
+                journal.record(zone, chunk, chunk_results)
+            results.extend(chunk_results)
+        return results
+
+
+    async def _rrset_bulk_chunk(self, zone, chunk, resend=True):
+        """
+        Function to send one chunk of rrset changes as bulk request
+        Return: list of dicts (one per change, with 'status' and 'error')
+
+        Keyword arguments:
+        zone -- The domain that should be used
+        chunk -- List of change dicts (see rrset_bulk)
+        resend -- Send the chunk again without the rejected rrsets (default True)
+        """
+        response = await self.http_request(url=self._rrset_url(zone), header=self._json_header(), method='PATCH',
+                                           data=self._rrset_bulk_data(chunk), idempotent=True)
+        results, valid = self._rrset_bulk_results(chunk, response)
+
+        # send the valid rrsets again, they have not been applied together with the rejected ones
+        if valid and resend:
+            self._rrset_bulk_resent(valid, await self._rrset_bulk_chunk(zone, [change for change, result in valid], resend=False))
+        else:
+            self._rrset_bulk_resent(valid)
+
+        return results
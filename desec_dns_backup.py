@@ -0,0 +1,360 @@
+#!/usr/bin/python
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from desec_dns_api import deSEC_DNS_Error
+from desec_dns_zone import zone_diff
+
+
+class BackupStore(object):
+    """
+    Class keeping the snapshots of accounts in a directory
+    The rrsets of a domain are a gzip compressed json object named by the
+    sha256 of its content (objects/ab/cdef....json.gz), so a domain that did
+    not change and domains with the same rrsets share one object. A snapshot
+    is a compressed json manifest (snapshots/<time>-<account>.json.gz)
+    listing the domains, their touched time and their object.
+    """
+
+    def __init__(self, path):
+        """
+        Initially create the directories of the store
+
+        Keyword arguments:
+        path -- The directory of the store
+        """
+        super(BackupStore, self).__init__()
+        self.path = os.path.expanduser(path)
+        self.objects = os.path.join(self.path, "objects")
+        self.manifests = os.path.join(self.path, "snapshots")
+        for directory in (self.objects, self.manifests):
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+        self.lock = threading.Lock()
+
+
+    def object_path(self, digest):
+        """
+        Function to get the file of an object
+        Return: string
+
+        Keyword arguments:
+        digest -- The sha256 hex digest of the object content
+        """
+        return os.path.join(self.objects, digest[:2], digest[2:] + ".json.gz")
+
+
+    def has_object(self, digest):
+        """
+        Function to check whether an object is in the store
+        Return: boolean
+
+        Keyword arguments:
+        digest -- The sha256 hex digest of the object content
+        """
+        return os.path.exists(self.object_path(digest))
+
+
+    def write_object(self, rrsets):
+        """
+        Function to store the rrsets of a domain
+        The rrsets are sorted in memory, so the same rrsets give the same
+        object. They are compressed and hashed while they are written to a
+        temporary file, which becomes the object unless the store has the
+        same content already.
+        Return: tuple of the digest, a boolean telling whether the object was written and its size in bytes
+
+        Keyword arguments:
+        rrsets -- Iterable of rrset dicts or RRset objects
+        """
+        rows = sorted(((rrset['subname'], rrset['type'], rrset['ttl'], sorted(rrset['records'])) for rrset in rrsets))
+        temp = os.path.join(self.objects, "tmp-" + str(os.getpid()) + "-" + str(threading.get_ident()))
+        sha = hashlib.sha256()
+        with open(temp, "wb") as stream:
+            # mtime 0 gives the same file for the same content
+            with gzip.GzipFile(filename='', mode='wb', fileobj=stream, compresslevel=6, mtime=0) as compressed:
+                for index, row in enumerate(rows):
+                    data = ((",\n" if index else "[") + json.dumps(row, separators=(',', ':'))).encode('utf-8')
+                    sha.update(data)
+                    compressed.write(data)
+                data = (b"]" if rows else b"[]")
+                sha.update(data)
+                compressed.write(data)
+        digest = sha.hexdigest()
+
+        path = self.object_path(digest)
+        if os.path.exists(path):
+            os.remove(temp)
+            return digest, False, os.path.getsize(path)
+        with self.lock:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+        size = os.path.getsize(temp)
+        os.replace(temp, path)
+        return digest, True, size
+
+
+    def read_object(self, digest):
+        """
+        Function to read the rrsets of an object
+        Return: list of rrset dicts (subname, type, ttl, records)
+
+        Keyword arguments:
+        digest -- The sha256 hex digest of the object content
+        """
+        with gzip.open(self.object_path(digest), "rb") as stream:
+            rows = json.loads(stream.read().decode('utf-8'))
+        return [{'subname': subname, 'type': type, 'ttl': ttl, 'records': records} for subname, type, ttl, records in rows]
+
+
+    def snapshots(self, account=None):
+        """
+        Function to list the snapshots of the store, the oldest first
+        Return: list of strings (snapshot names)
+
+        Keyword arguments:
+        account -- Only list the snapshots of the account (see deSEC_DNS_API.cache_account) (default None, all)
+        """
+        names = [name[:-len(".json.gz")] for name in os.listdir(self.manifests) if name.endswith(".json.gz")]
+        if account is not None:
+            names = [name for name in names if name.endswith("-" + account)]
+        return sorted(names)
+
+
+    def load_snapshot(self, name):
+        """
+        Function to read the manifest of a snapshot
+        Return: dict (raises OSError if it does not exist)
+
+        Keyword arguments:
+        name -- The name of the snapshot (or the file of its manifest)
+        """
+        path = name if name.endswith(".json.gz") else os.path.join(self.manifests, name + ".json.gz")
+        with gzip.open(path, "rb") as stream:
+            return json.loads(stream.read().decode('utf-8'))
+
+
+    def save_snapshot(self, manifest):
+        """
+        Function to save the manifest of a snapshot, the file is replaced at once
+        Return: string (the name of the snapshot)
+
+        Keyword arguments:
+        manifest -- The manifest dict (see backup_zones)
+        """
+        created = manifest['created']
+        name = (time.strftime("%Y%m%dT%H%M%S", time.gmtime(created)) + ".%03dZ" % (int(created * 1000) % 1000)
+                + "-" + manifest['account'])
+        path = os.path.join(self.manifests, name + ".json.gz")
+        temp = path + ".tmp"
+        with gzip.open(temp, "wb") as stream:
+            stream.write(json.dumps(manifest, separators=(',', ':'), sort_keys=True).encode('utf-8'))
+        os.replace(temp, path)
+        return name
+
+
+    def prune(self, keep, account):
+        """
+        Function to remove old snapshots of an account and the objects no snapshot uses anymore
+        Return: tuple of the number of snapshots and objects removed
+
+        Keyword arguments:
+        keep -- The number of the latest snapshots of the account kept
+        account -- The account of the snapshots (see deSEC_DNS_API.cache_account)
+        """
+        names = self.snapshots(account)
+        removed = names[:-keep] if keep > 0 else names
+        for name in removed:
+            os.remove(os.path.join(self.manifests, name + ".json.gz"))
+
+        # the objects of all remaining snapshots (of every account) are kept
+        used = set()
+        for name in self.snapshots():
+            used.update(entry['object'] for entry in self.load_snapshot(name)['zones'].values())
+        objects = 0
+        for directory in os.listdir(self.objects):
+            if not os.path.isdir(os.path.join(self.objects, directory)):
+                continue
+            for filename in os.listdir(os.path.join(self.objects, directory)):
+                if directory + filename[:-len(".json.gz")] not in used:
+                    os.remove(os.path.join(self.objects, directory, filename))
+                    objects += 1
+        return len(removed), objects
+
+
+
+def backup_zones(api, store, zones=None, concurrency=10, full=False):
+    """
+    Function to take a snapshot of the domains of an account
+    One domain list request tells which domains were touched since the
+    previous snapshot of the account; unchanged domains keep their object
+    without any request. The rrsets of the other domains are requested
+    concurrently and each domain is written as soon as its rrsets arrived.
+    Return: dict (the manifest, with the name of the snapshot and its 'stats'; raises deSEC_DNS_Error if a request fails)
+
+    Keyword arguments:
+    api -- The deSEC_DNS_API object
+    store -- The BackupStore object
+    zones -- The list of domains to back up (default None, all domains of the account)
+    concurrency -- The maximum number of domains requested at the same time (default 10)
+    full -- Request the rrsets of all domains, even those not touched since the previous snapshot (default False)
+    """
+    started = time.time()
+    response = api.domain_list()
+    if not response:
+        raise deSEC_DNS_Error(response)
+    domains = dict((domain['name'], domain) for domain in response.get_response_dict())
+    if zones is not None:
+        domains = dict((zone, domains[zone]) for zone in zones if zone in domains)
+
+    previous = dict()
+    names = store.snapshots(api.cache_account)
+    if names and not full:
+        previous = store.load_snapshot(names[-1])['zones']
+
+    manifest = {'version': 1, 'created': started, 'account': api.cache_account, 'api_url': api.url_base, 'zones': dict()}
+    stats = {'zones': len(domains), 'unchanged': 0, 'fetched': 0, 'written': 0, 'deduplicated': 0, 'rrsets': 0, 'bytes_written': 0}
+    fetch = list()
+    for zone in sorted(domains):
+        entry = previous.get(zone)
+        if entry and entry['touched'] == domains[zone].get('touched') and store.has_object(entry['object']):
+            manifest['zones'][zone] = entry
+            stats['unchanged'] += 1
+        else:
+            fetch.append(zone)
+
+    # the rrsets of one domain per worker are kept in memory until its object is written
+    def backup_zone(zone):
+        rrsets = list(api.iter_rrsets(zone, compact=True))
+        return len(rrsets), store.write_object(rrsets)
+
+    if fetch:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = dict((executor.submit(backup_zone, zone), zone) for zone in fetch)
+            for future in as_completed(futures):
+                zone = futures[future]
+                count, (digest, written, size) = future.result()
+                manifest['zones'][zone] = {'touched': domains[zone].get('touched'), 'minimum_ttl': domains[zone].get('minimum_ttl'),
+                                           'object': digest, 'rrsets': count}
+                stats['fetched'] += 1
+                stats['rrsets'] += count
+                if written:
+                    stats['written'] += 1
+                    stats['bytes_written'] += size
+                else:
+                    stats['deduplicated'] += 1
+
+    stats['seconds'] = round(time.time() - started, 3)
+    manifest['stats'] = stats
+    manifest['name'] = store.save_snapshot(manifest)
+    return manifest
+
+
+def _restore_zone(api, store, zone, entry, exists, delete, dry_run, chunk_size):
+    """
+    Function to restore a single domain from its object
+    Return: result dict (zone, created, create, modify, delete, unchanged, failed, error)
+
+    Keyword arguments:
+    api -- The deSEC_DNS_API object
+    store -- The BackupStore object
+    zone -- The domain name
+    entry -- The manifest entry of the domain
+    exists -- The domain exists in the account
+    delete -- Delete rrsets not in the snapshot
+    dry_run -- Only compute the changes
+    chunk_size -- The maximum number of rrsets sent in one request
+    """
+    result = {'zone': zone, 'created': False, 'create': 0, 'modify': 0, 'delete': 0, 'unchanged': 0, 'failed': 0, 'error': ''}
+    desired = store.read_object(entry['object'])
+
+    if not exists:
+        result['created'] = True
+        if dry_run:
+            result['create'] = len(desired)
+            return result
+        response = api.domain_create(zone)
+        if not response:
+            result['error'] = "domain create failed with " + str(response.http_code) + ": " + str(response.http_body)
+            return result
+
+    try:
+        plan = zone_diff(desired, api.iter_rrsets(zone, compact=True), delete=delete)
+    except ValueError as err:
+        result['error'] = str(err)
+        return result
+    except deSEC_DNS_Error as err:
+        result['error'] = "rrset list failed with " + str(err.response.http_code) + ": " + str(err.response.http_body)
+        return result
+    for action in ('create', 'modify', 'delete'):
+        result[action] = len(plan[action])
+    result['unchanged'] = plan['unchanged']
+
+    changes = plan['create'] + plan['modify'] + plan['delete']
+    if changes and not dry_run:
+        failed = [change for change in api.rrset_bulk(zone, changes, chunk_size=chunk_size) if change['status'] != 'ok']
+        result['failed'] = len(failed)
+        if failed:
+            result['error'] = failed[0]['subname'] + " " + failed[0]['type'] + ": " + failed[0]['error']
+    return result
+
+
+def restore_zones(api, store, manifest, zones=None, concurrency=10, delete=True, dry_run=False, chunk_size=500, force=False):
+    """
+    Function to bring domains back to the state of a snapshot
+    The rrsets of every domain are compared with the live rrsets, only the
+    rrsets that differ are sent in bulk requests. Domains missing in the
+    account are created first. The domains are restored concurrently. A
+    domain of the same account not touched since the snapshot is unchanged
+    and needs no request at all.
+    Return: list of result dicts (zone, created, create, modify, delete, unchanged, failed, error), in the order of the domains
+
+    Keyword arguments:
+    api -- The deSEC_DNS_API object
+    store -- The BackupStore object
+    manifest -- The manifest dict of the snapshot
+    zones -- The list of domains to restore (default None, all domains of the snapshot)
+    concurrency -- The maximum number of domains restored at the same time (default 10)
+    delete -- Delete rrsets that are not in the snapshot (default True)
+    dry_run -- Only compute the changes, send nothing (default False)
+    chunk_size -- The maximum number of rrsets sent in one request (default 500)
+    force -- Compare the rrsets of all domains, even those not touched since the snapshot (default False)
+    """
+    response = api.domain_list()
+    if not response:
+        raise deSEC_DNS_Error(response)
+    existing = dict((domain['name'], domain.get('touched')) for domain in response.get_response_dict())
+    # the touched times of another account (or api) say nothing about this one
+    same_account = manifest.get('account') == api.cache_account and not force
+
+    selected = sorted(manifest['zones']) if zones is None else list(zones)
+    missing = [zone for zone in selected if zone not in manifest['zones']]
+    selected = [zone for zone in selected if zone in manifest['zones']]
+
+    results = dict()
+    for zone in selected:
+        entry = manifest['zones'][zone]
+        if same_account and entry['touched'] and existing.get(zone) == entry['touched']:
+            results[zone] = {'zone': zone, 'created': False, 'create': 0, 'modify': 0, 'delete': 0, 'unchanged': entry['rrsets'],
+                             'failed': 0, 'error': ''}
+    selected = [zone for zone in selected if zone not in results]
+    if selected:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = dict((executor.submit(_restore_zone, api, store, zone, manifest['zones'][zone], zone in existing,
+                                            delete, dry_run, chunk_size), zone) for zone in selected)
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+    for zone in missing:
+        results[zone] = {'zone': zone, 'created': False, 'create': 0, 'modify': 0, 'delete': 0, 'unchanged': 0, 'failed': 0,
+                         'error': "not in the snapshot"}
+    return [results[zone] for zone in (zones if zones is not None else sorted(manifest['zones']))]
@@ -0,0 +1,306 @@
+#!/usr/bin/python
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import re
+
+
+# Types managed by deSEC, they are skipped when importing a zone file
+SKIPPED_TYPES = ('SOA', 'RRSIG', 'NSEC', 'NSEC3', 'NSEC3PARAM')
+
+# Position of the domain name fields in the record data, relative names are completed with the origin
+NAME_FIELDS = {
+    'CNAME': (0,), 'DNAME': (0,), 'NS': (0,), 'PTR': (0,),
+    'MX': (1,), 'KX': (1,), 'AFSDB': (1,), 'RT': (1,),
+    'SRV': (3,), 'RP': (0, 1), 'NAPTR': (5,), 'SVCB': (1,), 'HTTPS': (1,),
+}
+
+CLASSES = ('IN', 'CH', 'HS', 'CS', 'ANY')
+
+re_token = re.compile(r'"(?:[^"\\]|\\.)*"|;|[()]|[^\s"();]+')
+re_ttl = re.compile(r'^(?:\d+[smhdwSMHDW]?)+$')
+re_ttl_part = re.compile(r'(\d+)([smhdwSMHDW]?)')
+re_type = re.compile(r'^(?:[A-Z][A-Z0-9]*|TYPE\d+)$')
+
+TTL_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+class ZoneFileError(Exception):
+    """
+    Exception raised for lines of a zone file that cannot be parsed
+    """
+
+    def __init__(self, message, line_number):
+        super(ZoneFileError, self).__init__("line " + str(line_number) + ": " + message)
+        self.line_number = line_number
+
+
+def parse_ttl(value):
+    """
+    Function to convert a ttl (seconds or BIND units like 1h30m) to seconds
+    Return: int
+
+    Keyword arguments:
+    value -- The ttl as written in the zone file
+    """
+    return sum(int(number) * TTL_UNITS[unit.lower()] for number, unit in re_ttl_part.findall(value))
+
+
+def absolute_name(name, origin):
+    """
+    Function to complete a (relative) domain name with the origin
+    Return: string (fully qualified with trailing dot)
+    (the case of the name is kept, owner names are lowercased by iter_records)
+
+    Keyword arguments:
+    name -- The name as written in the zone file
+    origin -- The current origin (fully qualified with trailing dot)
+    """
+    if name == '@':
+        return origin
+    if name.endswith('.'):
+        return name
+    if origin == '.':
+        return name + '.'
+    return name + '.' + origin
+
+
+def iter_logical_lines(stream):
+    """
+    Generator joining the lines of a zone file enclosed in parentheses
+    Comments and the parentheses are removed, quoted strings are kept as one token.
+    Return: generator of tuples (line number, owner given, list of tokens)
+
+    Keyword arguments:
+    stream -- The zone file opened for reading
+    """
+    tokens = list()
+    depth = 0
+    owner_given = True
+    start = 0
+    for line_number, line in enumerate(stream, 1):
+        if depth == 0:
+            # a line starting with whitespace uses the owner of the previous record
+            owner_given = not line[:1].isspace()
+            start = line_number
+        for token in re_token.findall(line):
+            if token == ';':
+                break
+            if token == '(':
+                depth += 1
+            elif token == ')':
+                if depth == 0:
+                    raise ZoneFileError("unbalanced parentheses", line_number)
+                depth -= 1
+            else:
+                tokens.append(token)
+        if depth == 0 and tokens:
+            yield start, owner_given, tokens
+            tokens = list()
+    if depth:
+        raise ZoneFileError("unclosed parentheses", start)
+
+
+def iter_records(stream, origin, ttl=3600):
+    """
+    Generator parsing a zone file (RFC 1035 master file) record by record
+    Supports $ORIGIN, $TTL, relative names, omitted owners, ttls and classes
+    and records spanning multiple lines in parentheses. Owner names and the
+    origin are lowercased, the record data keeps its case.
+    Return: generator of tuples (name, ttl, type, record)
+
+    Keyword arguments:
+    stream -- The zone file opened for reading
+    origin -- The initial origin, usually the domain name
+    ttl -- The ttl used until the file sets one (default 3600)
+    """
+    origin = absolute_name(origin, '.').lower()
+    owner = origin
+    for line_number, owner_given, tokens in iter_logical_lines(stream):
+        # control entries
+        if tokens[0] in ('$ORIGIN', '$TTL') and len(tokens) < 2:
+            raise ZoneFileError(tokens[0] + " without value", line_number)
+        if tokens[0] == '$ORIGIN':
+            origin = absolute_name(tokens[1], origin).lower()
+            continue
+        if tokens[0] == '$TTL':
+            if not re_ttl.match(tokens[1]):
+                raise ZoneFileError("invalid ttl " + tokens[1], line_number)
+            ttl = parse_ttl(tokens[1])
+            continue
+        if tokens[0].startswith('$'):
+            raise ZoneFileError("unsupported control entry " + tokens[0], line_number)
+
+        if owner_given:
+            owner = absolute_name(tokens.pop(0), origin).lower()
+
+        # ttl and class are optional and can be given in any order
+        record_ttl = ttl
+        while tokens and (re_ttl.match(tokens[0]) or tokens[0].upper() in CLASSES):
+            token = tokens.pop(0)
+            if re_ttl.match(token):
+                record_ttl = parse_ttl(token)
+        if not tokens or not re_type.match(tokens[0].upper()):
+            raise ZoneFileError("missing record type", line_number)
+        type = tokens.pop(0).upper()
+        if not tokens:
+            raise ZoneFileError("missing record data", line_number)
+
+        # complete relative names in the record data
+        for index in NAME_FIELDS.get(type, ()):
+            if index < len(tokens):
+                tokens[index] = absolute_name(tokens[index], origin)
+
+        yield owner, record_ttl, type, ' '.join(tokens)
+
+
+def iter_rrsets(stream, zone, ttl=3600, skipped=None):
+    """
+    Generator grouping the records of a zone file into rrsets of the domain
+    The records of an owner are collected until the next owner starts, so
+    only the rrsets of one owner are kept in memory. Types managed by deSEC
+    (SOA, DNSSEC) and the NS rrset of the zone apex are skipped, records of
+    names outside of the zone are skipped and added to the skipped list.
+    Return: generator of rrset dicts (subname, type, ttl, records)
+
+    Keyword arguments:
+    stream -- The zone file opened for reading
+    zone -- The domain name of the zone
+    ttl -- The ttl used until the file sets one (default 3600)
+    skipped -- List the (name, type) of records outside of the zone are appended to (default None)
+    """
+    zone_name = absolute_name(zone, '.').lower()
+    suffix = '.' + zone_name
+    owner = None
+    pending = dict()
+    for name, record_ttl, type, record in iter_records(stream, zone_name, ttl=ttl):
+        if name != owner:
+            for rrset in pending.values():
+                yield rrset
+            pending = dict()
+            owner = name
+
+        if type in SKIPPED_TYPES or (type == 'NS' and name == zone_name):
+            continue
+        if name == zone_name:
+            subname = ''
+        elif name.endswith(suffix):
+            subname = name[:-len(suffix)]
+        else:
+            if skipped is not None:
+                skipped.append((name, type))
+            continue
+
+        rrset = pending.get(type)
+        if rrset is None:
+            rrset = {'subname': subname, 'type': type, 'ttl': record_ttl, 'records': []}
+            pending[type] = rrset
+        # all records of a rrset share the lowest ttl
+        rrset['ttl'] = min(rrset['ttl'], record_ttl)
+        rrset['records'].append(record)
+
+    for rrset in pending.values():
+        yield rrset
+
+
+def write_zone_file(stream, zone, rrsets):
+    """
+    Function to write rrsets as RFC 1035 master file
+    The rrsets are written one by one as they are consumed from the iterable.
+    Return: int (number of rrsets written)
+
+    Keyword arguments:
+    stream -- The file opened for writing
+    zone -- The domain name of the zone
+    rrsets -- Iterable of rrset dicts (name, ttl, type, records)
+    """
+    stream.write("$ORIGIN " + absolute_name(zone, '.') + "\n")
+    count = 0
+    for rrset in rrsets:
+        for record in rrset['records']:
+            stream.write(rrset['name'] + "\t" + str(rrset['ttl']) + "\tIN\t" + rrset['type'] + "\t" + record + "\n")
+        count += 1
+    return count
+
+
+def _merge_rrset(rrset, other):
+    """
+    Function to add the records of a repeated owner to a rrset
+    Records already in the rrset are not added again, the lowest ttl is kept.
+
+    Keyword arguments:
+    rrset -- The rrset dict the records are added to
+    other -- The rrset dict of the same subname and type found later
+    """
+    rrset['records'].extend(record for record in other['records'] if record not in rrset['records'])
+    rrset['ttl'] = min(rrset['ttl'], other['ttl'])
+
+
+def import_zone_file(api, zone, stream, chunk_size=500, ttl=3600, journal=None, skipped=None):
+    """
+    Generator uploading the rrsets of a zone file with bulk requests
+    The rrsets are sent as soon as a chunk is complete, so memory use does
+    not grow with the size of the file. Records of an owner that appear
+    again later in the file are merged into its rrset while it waits in the
+    chunk, or with the uploaded rrset once all chunks were sent.
+    A rrset merged after its upload has a second result (action modify).
+    Return: generator of result dicts (see deSEC_DNS_API.rrset_bulk)
+
+    Keyword arguments:
+    api -- The deSEC_DNS_API object
+    zone -- The domain name of the zone
+    stream -- The zone file opened for reading
+    chunk_size -- The maximum number of rrsets sent in one request (default 500)
+    ttl -- The ttl used until the file sets one (default 3600)
+    journal -- Journal object recording the changes, changes completed before are skipped (default None)
+    skipped -- List the (name, type) of records outside of the zone are appended to (default None)
+    """
+    sent = set()
+    late = dict()
+    chunk = dict()
+    for rrset in iter_rrsets(stream, zone, ttl=ttl, skipped=skipped):
+        key = (rrset['subname'], rrset['type'])
+        if key in chunk:
+            _merge_rrset(chunk[key], rrset)
+            continue
+        if key in sent:
+            if key in late:
+                _merge_rrset(late[key], rrset)
+            else:
+                late[key] = rrset
+            continue
+
+        rrset['action'] = 'create'
+        chunk[key] = rrset
+        if len(chunk) >= chunk_size:
+            for result in api.rrset_bulk(zone=zone, changes=list(chunk.values()), chunk_size=chunk_size, journal=journal):
+                yield result
+            sent.update(chunk)
+            chunk = dict()
+
+    # the created rrsets have to be on the server before the late records are merged with them
+    if chunk:
+        for result in api.rrset_bulk(zone=zone, changes=list(chunk.values()), chunk_size=chunk_size, journal=journal):
+            yield result
+    chunk = list()
+
+    # merge the records of repeated owners with the rrsets uploaded before
+    for key, rrset in late.items():
+        ret = api.rrset_list(zone=zone, type=key[1], subname=key[0])
+        if ret:
+            for current in ret.get_response_dict():
+                if current['subname'] == key[0] and current['type'] == key[1]:
+                    rrset['records'] = current['records'] + [record for record in rrset['records'] if record not in current['records']]
+        rrset['action'] = 'modify'
+        chunk.append(rrset)
+        if len(chunk) >= chunk_size:
+            for result in api.rrset_bulk(zone=zone, changes=chunk, chunk_size=chunk_size, journal=journal):
+                yield result
+            chunk = list()
+
+    if chunk:
+        for result in api.rrset_bulk(zone=zone, changes=chunk, chunk_size=chunk_size, journal=journal):
+            yield result
@@ -0,0 +1,141 @@
+#!/usr/bin/python
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "desec-dns-cli")
+
+
+class deSEC_DNS_Cache(object):
+    """
+    Class to keep api responses in a local SQLite database
+    Entries are keyed by account and url (which contains zone and filter),
+    expire after the ttl and the least recently used entries are evicted
+    when the cache holds more than max_entries.
+    """
+
+    def __init__(self, path=None, ttl=60, max_entries=1000):
+        """
+        Initially open (and create) the cache database
+
+        Keyword arguments:
+        path -- The file of the cache database (default ~/.cache/desec-dns-cli/cache.sqlite)
+        ttl -- Seconds a cached response is used without asking the api (default 60)
+        max_entries -- The maximum number of responses kept in the cache (default 1000)
+        """
+        super(deSEC_DNS_Cache, self).__init__()
+        if path is None:
+            path = os.path.join(DEFAULT_CACHE_DIR, "cache.sqlite")
+        path = os.path.expanduser(path)
+        if os.path.dirname(path) and not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS responses ("
+                        " account TEXT, url TEXT, zone TEXT, code INTEGER, body TEXT, headers TEXT,"
+                        " etag TEXT, last_modified TEXT, fetched REAL, accessed REAL,"
+                        " PRIMARY KEY (account, url))")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_zone ON responses (account, zone)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.db.commit()
+
+
+    def close(self):
+        """
+        Function to close the cache database
+        """
+        with self.lock:
+            self.db.close()
+
+
+    def get(self, account, url):
+        """
+        Function to get a cached response
+        Return: dict with code, body, headers, etag, last_modified and fresh (or None)
+
+        Keyword arguments:
+        account -- The key of the account the response belongs to
+        url -- The url of the request
+        """
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("SELECT code, body, headers, etag, last_modified, fetched FROM responses"
+                                  " WHERE account = ? AND url = ?", (account, url)).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE responses SET accessed = ? WHERE account = ? AND url = ?", (now, account, url))
+            self.db.commit()
+        entry = dict()
+        entry['code'] = row[0]
+        entry['body'] = row[1]
+        entry['headers'] = json.loads(row[2])
+        entry['etag'] = row[3]
+        entry['last_modified'] = row[4]
+        entry['fresh'] = now - row[5] < self.ttl
+        return entry
+
+
+    def put(self, account, url, zone, code, body, headers):
+        """
+        Function to store a response in the cache
+
+        Keyword arguments:
+        account -- The key of the account the response belongs to
+        url -- The url of the request
+        zone -- The domain the response belongs to ('' for the domain list)
+        code -- The http status code of the response
+        body -- The body of the response
+        headers -- The headers of the response
+        """
+        now = time.time()
+        kept = dict((name, headers[name]) for name in ('Link',) if name in headers)
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            (account, url, zone, code, body, json.dumps(kept),
+                             headers.get('ETag'), headers.get('Last-Modified'), now, now))
+            # evict the least recently used entries
+            self.db.execute("DELETE FROM responses WHERE rowid IN (SELECT rowid FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                            (self.max_entries,))
+            self.db.commit()
+
+
+    def refresh(self, account, url):
+        """
+        Function to mark a cached response as fresh again (after 304 Not Modified)
+
+        Keyword arguments:
+        account -- The key of the account the response belongs to
+        url -- The url of the request
+        """
+        now = time.time()
+        with self.lock:
+            self.db.execute("UPDATE responses SET fetched = ?, accessed = ? WHERE account = ? AND url = ?", (now, now, account, url))
+            self.db.commit()
+
+
+    def invalidate(self, account, zone=None):
+        """
+        Function to remove cached responses of a domain (or the whole account)
+
+        Keyword arguments:
+        account -- The key of the account the responses belong to
+        zone -- The domain whose responses should be removed, None removes all of the account (default None)
+        """
+        with self.lock:
+            if zone is None:
+                self.db.execute("DELETE FROM responses WHERE account = ?", (account,))
+            else:
+                self.db.execute("DELETE FROM responses WHERE account = ? AND zone = ?", (account, zone))
+            self.db.commit()
@@ -0,0 +1,114 @@
+#!/usr/bin/python
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import threading
+
+
+class _Call(object):
+    """
+    Class holding a request in progress and the threads waiting for its result
+    """
+
+    def __init__(self, zone):
+        """
+        Initially set up the call of a domain
+
+        Keyword arguments:
+        zone -- The domain the request belongs to ('' for the domain list)
+        """
+        super(_Call, self).__init__()
+        self.zone = zone
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    """
+    Class letting identical read requests running at the same time share one request
+    The first thread asking for a key sends the request, threads asking for
+    the same key before it finished wait and get the same result. A write to
+    a domain is a barrier: reads of the domain (and of the domain list)
+    started before the write are not joined by later threads, they send a
+    new request and see the result of the write.
+    """
+
+    def __init__(self):
+        """
+        Initially set up the empty table of requests in progress
+        """
+        super(SingleFlight, self).__init__()
+        self.lock = threading.Lock()
+        self.calls = dict()
+        self.requests = 0
+        self.coalesced = 0
+        self.invalidated = 0
+
+
+    def do(self, key, zone, function):
+        """
+        Function to get the result of a request, shared with the identical requests in progress
+        Return: tuple of the result of function and a boolean telling whether it was shared
+
+        Keyword arguments:
+        key -- The key identifying identical requests (like method and url)
+        zone -- The domain the request belongs to ('' for the domain list)
+        function -- Function sending the request, called without arguments
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call(zone)
+                self.calls[key] = call
+                self.requests += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = function()
+        except Exception as err:
+            call.error = err
+            raise
+        finally:
+            with self.lock:
+                # a barrier may have replaced the call already
+                if self.calls.get(key) is call:
+                    del self.calls[key]
+            call.done.set()
+        return call.result, False
+
+
+    def barrier(self, zone):
+        """
+        Function to stop sharing the reads of a domain in progress (before and after a write to it)
+
+        Keyword arguments:
+        zone -- The domain written to
+        """
+        with self.lock:
+            for key, call in list(self.calls.items()):
+                if call.zone == zone or call.zone == '':
+                    del self.calls[key]
+                    self.invalidated += 1
+
+
+    def stats(self):
+        """
+        Function to get the counters of the shared requests
+        Return: dict (requests sent, coalesced requests that waited for one of them, invalidated by writes)
+        """
+        with self.lock:
+            return {'requests': self.requests, 'coalesced': self.coalesced, 'invalidated': self.invalidated}
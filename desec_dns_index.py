@@ -0,0 +1,259 @@
+#!/usr/bin/python
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from desec_dns_api import deSEC_DNS_Error
+
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.expanduser("~"), ".cache", "desec-dns-cli")
+
+# characters making a search value a glob pattern
+PATTERN_CHARS = ('*', '?', '[')
+
+
+def record_key(value):
+    """
+    Function to normalise a record (or a searched value) for comparing
+    Case, quotes and the trailing dot of names do not matter.
+    Return: string
+
+    Keyword arguments:
+    value -- The record content (like '10 mx.example.net.' or '"v=spf1 -all"')
+    """
+    value = value.strip().replace('"', '').lower()
+    if value.endswith('.') and not value.endswith('\\.'):
+        value = value[:-1]
+    return value
+
+
+def record_target(value):
+    """
+    Function to get the address or name a record points to
+    This is the last field of the record, like the address of A and AAAA,
+    the name of CNAME and NS or the host of MX and SRV records.
+    Return: string (normalised, see record_key)
+
+    Keyword arguments:
+    value -- The record content
+    """
+    fields = record_key(value).split()
+    return fields[-1] if fields else ''
+
+
+class ZoneIndex(object):
+    """
+    Class keeping the rrsets of all domains of an account in a local SQLite database
+    Every record is a row with its normalised content and the address or name
+    it points to, both indexed, so the domains using an address or a name
+    are found without asking the api. The index is refreshed per domain: the
+    domain list tells which domains were touched since they were indexed,
+    only their rrsets are requested again.
+    """
+
+    def __init__(self, path=None, account=''):
+        """
+        Initially open (and create) the index database
+
+        Keyword arguments:
+        path -- The file of the index database (default ~/.cache/desec-dns-cli/index.sqlite)
+        account -- The key of the account the index is used for (default '')
+        """
+        super(ZoneIndex, self).__init__()
+        if path is None:
+            path = os.path.join(DEFAULT_INDEX_DIR, "index.sqlite")
+        path = os.path.expanduser(path)
+        if os.path.dirname(path) and not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        self.path = path
+        self.account = account
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS zones ("
+                        " account TEXT, zone TEXT, touched TEXT, indexed REAL, rrsets INTEGER,"
+                        " PRIMARY KEY (account, zone))")
+        self.db.execute("CREATE TABLE IF NOT EXISTS records ("
+                        " account TEXT, zone TEXT, subname TEXT, name TEXT, type TEXT, ttl INTEGER,"
+                        " value TEXT, value_key TEXT, target TEXT)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS records_target ON records (account, target)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS records_value ON records (account, value_key)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS records_name ON records (account, name)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS records_subname ON records (account, subname)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS records_type ON records (account, type)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS records_zone ON records (account, zone)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS refreshed (account TEXT PRIMARY KEY, time REAL)")
+        self.db.commit()
+
+
+    def close(self):
+        """
+        Function to close the index database
+        """
+        with self.lock:
+            self.db.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def zones(self):
+        """
+        Function to get the indexed domains and the touched time they were indexed with
+        Return: dict of zone to touched timestamp
+        """
+        with self.lock:
+            return dict(self.db.execute("SELECT zone, touched FROM zones WHERE account = ?", (self.account,)))
+
+
+    def refreshed(self):
+        """
+        Function to get the time of the last refresh
+        Return: float (0.0 if the index was never refreshed)
+        """
+        with self.lock:
+            row = self.db.execute("SELECT time FROM refreshed WHERE account = ?", (self.account,)).fetchone()
+        return row[0] if row else 0.0
+
+
+    def put_zone(self, zone, touched, rrsets):
+        """
+        Function to replace the rrsets of a domain in the index
+
+        Keyword arguments:
+        zone -- The domain name
+        touched -- The touched timestamp of the domain the rrsets belong to
+        rrsets -- Iterable of rrset dicts or RRset objects
+        """
+        rows = list()
+        count = 0
+        for rrset in rrsets:
+            count += 1
+            for value in rrset['records']:
+                rows.append((self.account, zone, rrset['subname'], rrset['name'], rrset['type'], rrset['ttl'],
+                             value, record_key(value), record_target(value)))
+        with self.lock:
+            with self.db:
+                self.db.execute("DELETE FROM records WHERE account = ? AND zone = ?", (self.account, zone))
+                self.db.executemany("INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self.db.execute("INSERT OR REPLACE INTO zones VALUES (?, ?, ?, ?, ?)", (self.account, zone, touched, time.time(), count))
+
+
+    def remove_zone(self, zone):
+        """
+        Function to remove a domain from the index
+
+        Keyword arguments:
+        zone -- The domain name
+        """
+        with self.lock:
+            with self.db:
+                self.db.execute("DELETE FROM records WHERE account = ? AND zone = ?", (self.account, zone))
+                self.db.execute("DELETE FROM zones WHERE account = ? AND zone = ?", (self.account, zone))
+
+
+    def refresh(self, api, zones=None, concurrency=10, force=False):
+        """
+        Function to bring the index up to date with the api
+        One domain list request tells which domains were touched since they
+        were indexed, the rrsets of those domains are requested concurrently
+        and written to the index as each domain completes. Domains no longer
+        in the account are removed.
+        Return: dict (zones, refreshed, removed and rrsets written; raises deSEC_DNS_Error if a request fails)
+
+        Keyword arguments:
+        api -- The deSEC_DNS_API object of the account
+        zones -- The list of domains to refresh (default None, all domains of the account)
+        concurrency -- The maximum number of domains requested at the same time (default 10)
+        force -- Request the rrsets of every domain, even if it was not touched (default False)
+        """
+        response = api.domain_list()
+        if not response:
+            raise deSEC_DNS_Error(response)
+        touched = dict((domain['name'], domain.get('touched') or '') for domain in response.get_response_dict())
+        indexed = self.zones()
+
+        removed = [zone for zone in indexed if zone not in touched and (zones is None or zone in zones)]
+        for zone in removed:
+            self.remove_zone(zone)
+
+        if zones is not None:
+            touched = dict((zone, touched[zone]) for zone in zones if zone in touched)
+        changed = sorted(zone for zone in touched if force or indexed.get(zone) != touched[zone])
+
+        written = 0
+        if changed:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                futures = dict((executor.submit(lambda zone: list(api.iter_rrsets(zone, compact=True)), zone), zone) for zone in changed)
+                for future in as_completed(futures):
+                    rrsets = future.result()
+                    self.put_zone(futures[future], touched[futures[future]], rrsets)
+                    written += len(rrsets)
+
+        with self.lock:
+            with self.db:
+                self.db.execute("INSERT OR REPLACE INTO refreshed VALUES (?, ?)", (self.account, time.time()))
+            if changed or removed:
+                # without statistics sqlite picks the zone index for value searches (a scan of the account)
+                self.db.execute("PRAGMA analysis_limit = 1000")
+                self.db.execute("ANALYZE")
+                self.db.commit()
+        return {'zones': len(touched), 'refreshed': len(changed), 'removed': len(removed), 'rrsets': written}
+
+
+    def search(self, value=None, type=None, subname=None, name=None, zone=None, limit=None):
+        """
+        Function to find records in the index
+        A value matches the whole record or the address / name it points to,
+        ignoring case, quotes and trailing dots. Values, subnames and names
+        with *, ? or [ are glob patterns. All given filters have to match.
+        Return: list of dicts (domain, subname, name, type, ttl, record) sorted by domain, subname and type
+
+        Keyword arguments:
+        value -- The record content, address or name to search for (default None)
+        type -- The type or list of types of the rrsets (default None)
+        subname -- The subname of the rrsets (default None)
+        name -- The full name of the rrsets, with or without trailing dot (default None)
+        zone -- The domain or list of domains to search in (default None, all)
+        limit -- The maximum number of records returned (default None)
+        """
+        conditions = ["account = ?"]
+        params = [self.account]
+
+        def condition(columns, search, normalise):
+            search = normalise(search)
+            operator = "GLOB" if any(char in search for char in PATTERN_CHARS) else "="
+            conditions.append("(" + " OR ".join(column + " " + operator + " ?" for column in columns) + ")")
+            params.extend([search] * len(columns))
+
+        if value is not None:
+            condition(("target", "value_key"), value, record_key)
+        if subname is not None:
+            condition(("subname",), subname, lambda search: search)
+        if name is not None:
+            condition(("name",), name, lambda search: search.lower().rstrip('.') + '.')
+        for column, values in (("type", type), ("zone", zone)):
+            if values is not None:
+                values = [values] if isinstance(values, str) else list(values)
+                conditions.append(column + " IN (" + ", ".join("?" * len(values)) + ")")
+                params.extend(values)
+
+        query = ("SELECT zone, subname, name, type, ttl, value FROM records WHERE " + " AND ".join(conditions)
+                 + " ORDER BY zone, subname, type, value")
+        if limit:
+            query += " LIMIT " + str(int(limit))
+        with self.lock:
+            rows = self.db.execute(query, params).fetchall()
+        return [{'domain': row[0], 'subname': row[1], 'name': row[2], 'type': row[3], 'ttl': row[4], 'record': row[5]}
+                for row in rows]
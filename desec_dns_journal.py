@@ -0,0 +1,189 @@
+#!/usr/bin/python
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import hashlib
+import json
+import os
+import threading
+import time
+from desec_dns_zone import rrset_records
+
+
+class Journal(object):
+    """
+    Class writing an append-only journal of planned and completed rrset changes
+    Every change is identified by its content (domain, action, subname, type,
+    ttl and records). The changes are applied with requests that set the
+    rrsets to the given values, so a change completed before can be skipped
+    and one planned but not completed can be sent again safely. The journal
+    is a json line per entry, written to disk (fsync) in batches instead of
+    for every change. A journal cut off by a crash is read up to its last
+    complete line.
+    """
+
+    def __init__(self, filename, resume=False, sync_every=500, sync_interval=1.0):
+        """
+        Initially open the journal file
+
+        Keyword arguments:
+        filename -- The name of the journal file
+        resume -- Read the completed changes of an existing journal and append to it, otherwise start a new one (default False)
+        sync_every -- The number of entries written before the file is synced to disk (default 500)
+        sync_interval -- The longest time in seconds an entry stays unsynced (default 1.0)
+        """
+        super(Journal, self).__init__()
+        self.filename = filename
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        self.completed = set()
+        self.resumed = 0
+        if resume:
+            self.completed = self.read_completed(filename)
+        self.stream = open(filename, "a" if resume else "w")
+        if resume and self.stream.tell() and not self._ends_with_newline(filename):
+            # start a new line after an entry cut off by a crash
+            self.stream.write("\n")
+        self.unsynced = 0
+        self.synced = time.time()
+        self._write({'entry': 'start', 'time': time.time(), 'completed': len(self.completed)})
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    @staticmethod
+    def read_completed(filename):
+        """
+        Function to read the ids of the completed changes of a journal
+        Return: set of strings
+
+        Keyword arguments:
+        filename -- The name of the journal file
+        """
+        completed = set()
+        with open(filename, "r") as stream:
+            for line in stream:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # the last line of an interrupted run may be incomplete
+                    continue
+                if entry.get('entry') == 'done' and entry.get('status') == 'ok':
+                    completed.add(entry['id'])
+        return completed
+
+
+    @staticmethod
+    def _ends_with_newline(filename):
+        """
+        Function to check whether the last entry of a journal file is complete
+        Return: boolean
+
+        Keyword arguments:
+        filename -- The name of the journal file
+        """
+        with open(filename, "rb") as stream:
+            stream.seek(-1, os.SEEK_END)
+            return stream.read(1) == b"\n"
+
+
+    @staticmethod
+    def change_id(zone, change):
+        """
+        Function to get the id of a change from its content
+        Return: string (32 hex digits)
+
+        Keyword arguments:
+        zone -- The domain of the change
+        change -- The change dict (action, subname, type, ttl, records)
+        """
+        content = json.dumps([zone, change.get('action', 'modify'), change.get('subname') or '', change['type'],
+                              change.get('ttl'), sorted(rrset_records(change))])
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()[:32]
+
+
+    def _write(self, entry):
+        """
+        Function to append an entry, the file is synced when enough entries or time have passed
+
+        Keyword arguments:
+        entry -- The dict of the entry
+        """
+        self.stream.write(json.dumps(entry) + "\n")
+        self.unsynced += 1
+        if self.unsynced >= self.sync_every or time.time() - self.synced >= self.sync_interval:
+            self._sync()
+
+
+    def _sync(self):
+        """
+        Function to write the buffered entries to disk
+        """
+        self.stream.flush()
+        os.fsync(self.stream.fileno())
+        self.unsynced = 0
+        self.synced = time.time()
+
+
+    def plan(self, zone, changes):
+        """
+        Function to record the changes about to be applied and leave out the completed ones
+        Return: tuple of the list of changes still to apply and the list of result dicts of the completed ones
+
+        Keyword arguments:
+        zone -- The domain of the changes
+        changes -- List of change dicts (see deSEC_DNS_API.rrset_bulk)
+        """
+        pending = list()
+        skipped = list()
+        with self.lock:
+            for change in changes:
+                change_id = self.change_id(zone, change)
+                if change_id in self.completed:
+                    skipped.append({'action': change.get('action', 'modify'), 'subname': change.get('subname') or '',
+                                    'type': change['type'], 'status': 'ok', 'error': 'applied before (journal)'})
+                    continue
+                pending.append(change)
+                self._write({'entry': 'plan', 'id': change_id, 'zone': zone, 'action': change.get('action', 'modify'),
+                             'subname': change.get('subname') or '', 'type': change['type']})
+            self.resumed += len(skipped)
+            self._sync()
+        return pending, skipped
+
+
+    def record(self, zone, changes, results):
+        """
+        Function to record the results of applied changes
+
+        Keyword arguments:
+        zone -- The domain of the changes
+        changes -- List of change dicts
+        results -- List of result dicts in the order of the changes (see deSEC_DNS_API.rrset_bulk)
+        """
+        with self.lock:
+            for change, result in zip(changes, results):
+                change_id = self.change_id(zone, change)
+                if result['status'] == 'ok':
+                    self.completed.add(change_id)
+                self._write({'entry': 'done', 'id': change_id, 'status': result['status']})
+
+
+    def close(self):
+        """
+        Function to sync and close the journal file
+        """
+        with self.lock:
+            if self.stream.closed:
+                return
+            self._sync()
+            self.stream.close()
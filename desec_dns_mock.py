@@ -0,0 +1,571 @@
+#!/usr/bin/python
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import hashlib
+import json
+import math
+import re
+import struct
+import threading
+import time
+from datetime import datetime
+from desec_dns_ratelimit import endpoint_class
+from desec_dns_resolver import parse_query, build_txt_response, TYPE_TXT
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn, ThreadingUDPServer, BaseRequestHandler
+    from urllib.parse import urlsplit, parse_qs, urlencode
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn, ThreadingUDPServer, BaseRequestHandler
+    from urlparse import urlsplit, parse_qs
+    from urllib import urlencode
+
+
+API_PATH = "/api/v1/domains/"
+
+re_domain = re.compile(r'^' + API_PATH + r'(?P<zone>[^/]+)/$')
+re_rrsets = re.compile(r'^' + API_PATH + r'(?P<zone>[^/]+)/rrsets/$')
+re_type = re.compile(r'^[A-Z][A-Z0-9]*$')
+re_rrset = re.compile(r'^' + API_PATH + r'(?P<zone>[^/]+)/rrsets/(?P<subname>[^/]*)\.\.\./(?P<type>[^/]+)/$')
+
+
+def timestamp():
+    """
+    Function to create a timestamp in the format used by the API
+    Return: string
+    """
+    return datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    # accept many concurrent clients (the default backlog of 5 resets connections)
+    request_queue_size = 128
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """
+    Request handler dispatching the API endpoints to the MockDeSEC object
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        # keep the console quiet
+        pass
+
+
+    def _dispatch(self, method):
+        mock = self.server.mock
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query, keep_blank_values=True)
+
+        # read the request body if one was sent
+        length = int(self.headers.get('Content-Length') or 0)
+        body = None
+        if length:
+            body = json.loads(self.rfile.read(length).decode('utf-8'))
+
+        if mock.latency:
+            time.sleep(mock.latency)
+
+        # answer with 429 if the request exceeds the throttling of the mock
+        retry_after = mock.throttle(method, parts.path)
+        if retry_after:
+            data = {'detail': "Request was throttled. Expected available in %d seconds." % retry_after}
+            self._send(429, data, {'Retry-After': str(retry_after)})
+            return
+
+        result = mock.handle(method, parts.path, query, body)
+        self._send(*result)
+
+
+    def _send(self, code, data, headers=None):
+        payload = b''
+        if data is not None:
+            payload = json.dumps(data).encode('utf-8')
+        headers = dict(headers or dict())
+
+        # answer conditional requests for unchanged data with 304
+        if self.command == 'GET' and code == 200:
+            headers['ETag'] = '"' + hashlib.sha1(payload).hexdigest() + '"'
+            if self.headers.get('If-None-Match') == headers['ETag']:
+                code = 304
+                payload = b''
+        self.send_response(code)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        if self.close_connection:
+            # confirm the client asked to close, otherwise it may reuse the closing connection
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+
+    def do_PATCH(self):
+        self._dispatch('PATCH')
+
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+
+class MockDeSEC(object):
+    """
+    Class providing a local stand-in for the deSEC DNS API
+    Keeps domains and rrsets in memory and serves them over HTTP on localhost
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, rate_limits=None, throttle_every=0, page_size=500):
+        """
+        Initially set up the (empty) account data and the server
+
+        Keyword arguments:
+        host -- The address the server should listen on (default '127.0.0.1')
+        port -- The port the server should listen on, 0 selects a free port (default 0)
+        latency -- Seconds every request is delayed to simulate the network (default 0.0)
+        rate_limits -- Dict of endpoint class to requests per second, exceeding requests get 429 (default None)
+        throttle_every -- Answer every n-th request with 429, 0 disables (default 0)
+        page_size -- The number of rrsets per page of the rrset list (default 500)
+        """
+        super(MockDeSEC, self).__init__()
+        self.latency = latency
+        self.rate_limits = rate_limits or dict()
+        self.throttle_every = throttle_every
+        self.page_size = page_size
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.throttled_count = 0
+        self.windows = dict()
+        self.domains = dict()
+        self.rrsets = dict()
+        self.sorted_rrsets = dict()
+        self.server = _ThreadingHTTPServer((host, port), _MockHandler)
+        self.server.mock = self
+        self.thread = None
+
+
+    @property
+    def url(self):
+        """
+        The api_url to be used with deSEC_DNS_API
+        """
+        host, port = self.server.server_address[:2]
+        return "http://%s:%d%s" % (host, port, API_PATH)
+
+
+    def start(self):
+        """
+        Function to start serving requests in a background thread
+        """
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+
+    def stop(self):
+        """
+        Function to stop the server and release the port
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+
+    def __enter__(self):
+        return self.start()
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+    def add_domain(self, zone):
+        """
+        Function to add a domain to the account
+        Return: dict of the domain
+
+        Keyword arguments:
+        zone -- The domain name that should be added
+        """
+        now = timestamp()
+        domain = {'created': now, 'published': now, 'touched': now, 'name': zone, 'minimum_ttl': 3600, 'keys': []}
+        with self.lock:
+            self.domains[zone] = domain
+            self.rrsets[zone] = dict()
+            self.sorted_rrsets.pop(zone, None)
+        return domain
+
+
+    def add_rrset(self, zone, subname, type, ttl, records):
+        """
+        Function to add (or replace) a rrset of a domain
+        Return: dict of the rrset
+
+        Keyword arguments:
+        zone -- The domain the rrset belongs to
+        subname -- The subname of the rrset
+        type -- The type of the rrset
+        ttl -- The ttl of the rrset
+        records -- The list of records of the rrset
+        """
+        now = timestamp()
+        name = (subname + "." if subname else "") + zone + "."
+        rrset = {'created': now, 'touched': now, 'domain': zone, 'subname': subname, 'name': name,
+                 'type': type, 'ttl': ttl, 'records': list(records)}
+        with self.lock:
+            self.rrsets[zone][(subname, type)] = rrset
+            self.sorted_rrsets.pop(zone, None)
+            self.domains[zone]['touched'] = now
+        return rrset
+
+
+    def remove_rrset(self, zone, key):
+        """
+        Function to remove a rrset of a domain
+
+        Keyword arguments:
+        zone -- The domain the rrset belongs to
+        key -- Tuple of subname and type of the rrset
+        """
+        with self.lock:
+            if self.rrsets[zone].pop(key, None) is not None:
+                self.domains[zone]['touched'] = timestamp()
+            self.sorted_rrsets.pop(zone, None)
+
+
+    def rrset_list(self, zone):
+        """
+        Function to get the rrsets of a domain sorted like the API does
+        The sorted list is kept until the domain changes, so paginating a
+        large domain does not sort it again for every page.
+        Return: list of rrset dicts
+
+        Keyword arguments:
+        zone -- The domain the rrsets belong to
+        """
+        with self.lock:
+            result = self.sorted_rrsets.get(zone)
+            if result is None:
+                result = sorted(self.rrsets[zone].values(), key=lambda k: (k['subname'], k['type']))
+                self.sorted_rrsets[zone] = result
+        return result
+
+
+    def throttle(self, method, path):
+        """
+        Function to count a request and check it against the throttling
+        Return: int (seconds to wait, 0 if the request is not throttled)
+
+        Keyword arguments:
+        method -- The HTTP method of the request
+        path -- The path of the requested url
+        """
+        endpoint = endpoint_class(method, path)
+        now = time.time()
+        with self.lock:
+            self.request_count += 1
+            throttled = self.throttle_every and self.request_count % self.throttle_every == 0
+
+            # count the requests of the endpoint class in the current second
+            limit = self.rate_limits.get(endpoint)
+            if limit and not throttled:
+                second, count = self.windows.get(endpoint, (int(now), 0))
+                if second != int(now):
+                    second, count = int(now), 0
+                if count >= limit:
+                    throttled = True
+                else:
+                    self.windows[endpoint] = (second, count + 1)
+
+            if throttled:
+                self.throttled_count += 1
+                return int(math.ceil(int(now) + 1 - now))
+        return 0
+
+
+    def handle(self, method, path, query, body):
+        """
+        Function to answer a single API request
+        Return: tuple of http code, response data and optionally response headers
+
+        Keyword arguments:
+        method -- The HTTP method of the request
+        path -- The path of the requested url
+        query -- The parsed query string of the request
+        body -- The decoded json body of the request (or None)
+        """
+        if path == API_PATH:
+            if method == 'GET':
+                return 200, sorted(self.domains.values(), key=lambda k: k['name'])
+            if method == 'POST':
+                if body['name'] in self.domains:
+                    return 400, {'name': ["This domain name is unavailable."]}
+                return 201, self.add_domain(body['name'])
+
+        match = re_domain.match(path)
+        if match:
+            zone = match.group('zone')
+            if zone not in self.domains:
+                return 404, {'detail': "Not found."}
+            if method == 'GET':
+                return 200, self.domains[zone]
+            if method == 'DELETE':
+                with self.lock:
+                    self.domains.pop(zone, None)
+                    self.rrsets.pop(zone, None)
+                    self.sorted_rrsets.pop(zone, None)
+                return 204, None
+
+        match = re_rrsets.match(path)
+        if match:
+            zone = match.group('zone')
+            if zone not in self.domains:
+                return 404, {'detail': "Not found."}
+            if method == 'GET':
+                result = self.rrset_list(zone)
+                if 'type' in query:
+                    result = [rrset for rrset in result if rrset['type'] == query['type'][0]]
+                if 'subname' in query:
+                    result = [rrset for rrset in result if rrset['subname'] == query['subname'][0]]
+                return self.paginate(path, query, result)
+            if method == 'POST':
+                if (body['subname'], body['type']) in self.rrsets[zone]:
+                    return 400, {'non_field_errors': ["Another RRset with the same subdomain and type exists for this domain."]}
+                return 201, self.add_rrset(zone, body['subname'], body['type'], body['ttl'], body['records'])
+            if method in ('PATCH', 'PUT'):
+                return self.handle_bulk(zone, method, body)
+
+        match = re_rrset.match(path)
+        if match:
+            zone = match.group('zone')
+            key = (match.group('subname'), match.group('type'))
+            if zone not in self.domains or key not in self.rrsets[zone]:
+                return 404, {'detail': "Not found."}
+            rrset = self.rrsets[zone][key]
+            if method == 'GET':
+                return 200, rrset
+            if method in ('PATCH', 'PUT'):
+                records = body.get('records', rrset['records'])
+                if not records:
+                    self.remove_rrset(zone, key)
+                    return 204, None
+                return 200, self.add_rrset(zone, key[0], key[1], body.get('ttl', rrset['ttl']), records)
+            if method == 'DELETE':
+                self.remove_rrset(zone, key)
+                return 204, None
+
+        return 404, {'detail': "Not found."}
+
+
+    def paginate(self, path, query, result):
+        """
+        Function to split a rrset list into pages like the API does
+        Without cursor, lists longer than one page are refused with 400.
+        Return: tuple of http code, response data and response headers
+
+        Keyword arguments:
+        path -- The path of the requested url
+        query -- The parsed query string of the request
+        result -- The complete list of rrsets
+        """
+        def link(cursor, rel):
+            params = dict((key, value[0]) for key, value in query.items())
+            params['cursor'] = cursor
+            return '<' + self.url[:-len(API_PATH)] + path + '?' + urlencode(sorted(params.items())) + '>; rel="' + rel + '"'
+
+        if 'cursor' not in query:
+            if len(result) > self.page_size:
+                data = {'detail': "Pagination required. You can query up to %d items at a time (with cursor)." % self.page_size}
+                return 400, data, {'Link': link('', 'first')}
+            return 200, result
+
+        offset = int(query['cursor'][0] or 0)
+        links = [link('', 'first')]
+        if offset + self.page_size < len(result):
+            links.append(link(str(offset + self.page_size), 'next'))
+        return 200, result[offset:offset + self.page_size], {'Link': ', '.join(links)}
+
+
+    def handle_bulk(self, zone, method, body):
+        """
+        Function to answer a bulk rrset request
+        The request is applied completely or not at all, like the API does.
+        Return: tuple of http code and response data
+
+        Keyword arguments:
+        zone -- The domain the rrsets belong to
+        method -- The HTTP method of the request (PATCH or PUT)
+        body -- The list of rrsets of the request
+        """
+        if not isinstance(body, list):
+            return 400, {'non_field_errors': ["Expected a list of items."]}
+
+        # validate every rrset before anything is changed
+        errors = list()
+        positions = dict()
+        for position, item in enumerate(body):
+            error = dict()
+            key = (item.get('subname', ''), item.get('type', ''))
+            # a subname and type may be changed only once per request
+            unique = (key[0], key[1].upper())
+            if unique in positions:
+                error['non_field_errors'] = ["Same subname and type as in position(s) " + str(positions[unique]) + ", but must be unique."]
+            else:
+                positions[unique] = position
+            if not re_type.match(key[1]):
+                error['type'] = ["Invalid RRset type."]
+            if method == 'PUT' or key not in self.rrsets[zone]:
+                if item.get('records') and not item.get('ttl'):
+                    error['ttl'] = ["This field is required for new RRsets."]
+            if not all(isinstance(record, str) for record in item.get('records', [])):
+                error['records'] = ["Not a valid string."]
+            errors.append(error)
+        if any(errors):
+            return 400, errors
+
+        # a PUT replaces the whole zone content
+        if method == 'PUT':
+            with self.lock:
+                self.rrsets[zone] = dict()
+                self.sorted_rrsets.pop(zone, None)
+
+        result = list()
+        for item in body:
+            key = (item.get('subname', ''), item['type'])
+            if 'records' in item and not item['records']:
+                self.remove_rrset(zone, key)
+                continue
+            current = self.rrsets[zone].get(key, dict())
+            rrset = self.add_rrset(zone, key[0], key[1], item.get('ttl', current.get('ttl')), item.get('records', current.get('records', [])))
+            result.append(rrset)
+        return 200, result
+
+
+
+class _MockDNSHandler(BaseRequestHandler):
+    """
+    Request handler answering DNS queries from the data of a MockDeSEC object
+    """
+
+    def handle(self):
+        data, sock = self.request
+        try:
+            query_id, name, qtype = parse_query(data)
+        except (ValueError, IndexError, struct.error):
+            return
+        rcode, records = self.server.dns.lookup(name, qtype)
+        sock.sendto(build_txt_response(data, records, rcode=rcode), self.client_address)
+
+
+class MockDNS(object):
+    """
+    Class providing a stub authoritative nameserver for the domains of a MockDeSEC object
+    Answers TXT queries over UDP on localhost. Changed rrsets become visible
+    after a delay, to simulate the propagation to the nameservers.
+    """
+
+    def __init__(self, mock, host='127.0.0.1', port=0, delay=0.0):
+        """
+        Initially set up the server
+
+        Keyword arguments:
+        mock -- The MockDeSEC object holding the domains and rrsets
+        host -- The address the server should listen on (default '127.0.0.1')
+        port -- The port the server should listen on, 0 selects a free port (default 0)
+        delay -- Seconds until a changed rrset is answered (default 0.0)
+        """
+        super(MockDNS, self).__init__()
+        self.mock = mock
+        self.delay = delay
+        self.query_count = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingUDPServer((host, port), _MockDNSHandler)
+        self.server.daemon_threads = True
+        self.server.dns = self
+        self.thread = None
+
+
+    @property
+    def nameserver(self):
+        """
+        The nameserver (host:port) to be queried
+        """
+        host, port = self.server.server_address[:2]
+        return "%s:%d" % (host, port)
+
+
+    def start(self):
+        """
+        Function to start answering queries in a background thread
+        """
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+
+    def stop(self):
+        """
+        Function to stop the server and release the port
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+
+    def __enter__(self):
+        return self.start()
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+    def lookup(self, name, qtype):
+        """
+        Function to find the answer to a query
+        Return: tuple of response code (0, 5 refuses names outside the domains) and list of TXT records
+
+        Keyword arguments:
+        name -- The queried name (lower case with trailing dot)
+        qtype -- The queried type
+        """
+        with self.lock:
+            self.query_count += 1
+        name = name.rstrip('.')
+        with self.mock.lock:
+            for zone in sorted(self.mock.domains, key=len, reverse=True):
+                if name == zone or name.endswith('.' + zone):
+                    subname = name[:-len(zone) - 1] if name != zone else ''
+                    rrset = self.mock.rrsets[zone].get((subname, 'TXT'))
+                    break
+            else:
+                return 5, []
+        if rrset is None or qtype != TYPE_TXT:
+            return 0, []
+        # changes are answered once the propagation delay has passed
+        touched = datetime.strptime(rrset['touched'], "%Y-%m-%dT%H:%M:%S.%fZ")
+        if (datetime.utcnow() - touched).total_seconds() < self.delay:
+            return 0, []
+        return 0, list(rrset['records'])
@@ -0,0 +1,54 @@
+#!/usr/bin/python
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import csv
+import json
+
+
+OUTPUT_FORMATS = ('jsonl', 'csv', 'json')
+
+
+def write_rows(stream, rows, columns, output):
+    """
+    Function to write rows in a machine readable format
+    Every row is written as soon as it is taken from the iterable, no
+    column widths are computed. Lists and tuples (like records) are lists
+    in json and are joined by newlines in csv.
+    Return: int (number of rows written)
+
+    Keyword arguments:
+    stream -- The file opened for writing
+    rows -- Iterable of dicts (or objects like RRset that can be indexed by key)
+    columns -- The keys of the dicts to write, in this order
+    output -- The output format (jsonl, csv or json)
+    """
+    count = 0
+    if output == 'jsonl':
+        for row in rows:
+            stream.write(json.dumps(dict((key, row[key]) for key in columns)) + "\n")
+            count += 1
+
+    elif output == 'csv':
+        writer = csv.writer(stream, lineterminator="\n")
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(['\n'.join(row[key]) if isinstance(row[key], (list, tuple)) else row[key] for key in columns])
+            count += 1
+
+    elif output == 'json':
+        stream.write("[")
+        for row in rows:
+            if count:
+                stream.write(",")
+            stream.write("\n  " + json.dumps(dict((key, row[key]) for key in columns)))
+            count += 1
+        stream.write("\n]\n" if count else "]\n")
+
+    else:
+        raise ValueError("unknown output format '" + str(output) + "'")
+
+    return count
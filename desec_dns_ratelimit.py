@@ -0,0 +1,224 @@
+#!/usr/bin/python
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import random
+import threading
+import time
+from email.utils import parsedate_tz, mktime_tz
+
+
+# Default rates (requests per second) and bursts per endpoint class,
+# based on the throttling of the deSEC api
+DEFAULT_RATE_LIMITS = {
+    'domain_read':  {'rate': 10, 'burst': 10},
+    'domain_write': {'rate': 10, 'burst': 10},
+    'rrset_read':   {'rate': 10, 'burst': 10},
+    'rrset_write':  {'rate': 2,  'burst': 2},
+}
+
+# Methods that can be sent again without changing the result
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+
+def endpoint_class(method, url):
+    """
+    Function to get the endpoint class of a request
+    Return: string (domain_read, domain_write, rrset_read or rrset_write)
+
+    Keyword arguments:
+    method -- The HTTP method of the request
+    url -- The url (or path) of the request
+    """
+    if '/rrsets/' in url:
+        endpoint = 'rrset'
+    else:
+        endpoint = 'domain'
+    if method in ('GET', 'HEAD', 'OPTIONS'):
+        return endpoint + '_read'
+    return endpoint + '_write'
+
+
+def parse_retry_after(value, default=1.0):
+    """
+    Function to parse the Retry-After header (seconds or http date)
+    Return: float (seconds to wait)
+
+    Keyword arguments:
+    value -- The value of the Retry-After header (or None)
+    default -- The seconds to wait if the header is missing or invalid (default 1.0)
+    """
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    date = parsedate_tz(value)
+    if date is None:
+        return default
+    return max(0.0, mktime_tz(date) - time.time())
+
+
+class TokenBucket(object):
+    """
+    Class implementing a token bucket with adaptive rate
+    The rate is halved on every throttled request and slowly recovers with
+    every successful request (additive increase, multiplicative decrease).
+    """
+
+    def __init__(self, rate, burst=None, min_rate=0.05):
+        """
+        Initially fill the bucket
+
+        Keyword arguments:
+        rate -- The number of requests per second
+        burst -- The number of requests that can be sent at once (default rate, at least 1)
+        min_rate -- The lowest rate the bucket slows down to (default 0.05)
+        """
+        super(TokenBucket, self).__init__()
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min(min_rate, self.max_rate)
+        self.capacity = float(burst or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.time()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+
+    def _refill(self, now):
+        if now <= self.updated:
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+    def reserve(self):
+        """
+        Function to take a token without waiting
+        Return: float (0.0 if a token was taken, otherwise seconds to wait before trying again)
+        """
+        with self.lock:
+            now = time.time()
+            self._refill(now)
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return 0.0
+            return (1.0 - self.tokens) / self.rate
+
+
+    def acquire(self):
+        """
+        Function to take a token, waits until one is available
+        Return: float (seconds waited)
+        """
+        waited = 0.0
+        wait = self.reserve()
+        while wait > 0:
+            time.sleep(wait)
+            waited += wait
+            wait = self.reserve()
+        return waited
+
+
+    def throttled(self, retry_after):
+        """
+        Function to slow down after the api answered with 429
+
+        Keyword arguments:
+        retry_after -- The seconds the api asked to wait
+        """
+        with self.lock:
+            now = time.time()
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+            self.rate = max(self.min_rate, self.rate / 2.0)
+            self.tokens = 0.0
+            self.updated = max(now, self.blocked_until)
+
+
+    def succeeded(self):
+        """
+        Function to speed up again after a request was not throttled
+        """
+        with self.lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20.0)
+
+
+class RateLimiter(object):
+    """
+    Class holding one token bucket per endpoint class
+    """
+
+    def __init__(self, rate_limits=None, max_retries=5, backoff=0.5):
+        """
+        Initially create the buckets
+
+        Keyword arguments:
+        rate_limits -- Dict of endpoint class to dict with 'rate' and 'burst', merged with the defaults (default None)
+        max_retries -- The number of times a throttled idempotent request is retried (default 5)
+        backoff -- The base of the exponential backoff in seconds (default 0.5)
+        """
+        super(RateLimiter, self).__init__()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.buckets = dict()
+        limits = dict(DEFAULT_RATE_LIMITS)
+        limits.update(rate_limits or dict())
+        for endpoint, limit in limits.items():
+            self.buckets[endpoint] = TokenBucket(rate=limit['rate'], burst=limit.get('burst'))
+
+
+    def reserve(self, endpoint):
+        """
+        Function to take a token of an endpoint class without waiting
+        Used by callers that wait on their own (like the asyncio client).
+        Return: float (0.0 if a token was taken, otherwise seconds to wait before trying again)
+
+        Keyword arguments:
+        endpoint -- The endpoint class of the request
+        """
+        return self.buckets[endpoint].reserve()
+
+
+    def acquire(self, endpoint):
+        """
+        Function to wait for the bucket of an endpoint class
+        Return: float (seconds waited)
+
+        Keyword arguments:
+        endpoint -- The endpoint class of the request
+        """
+        return self.buckets[endpoint].acquire()
+
+
+    def throttled(self, endpoint, retry_after, attempt):
+        """
+        Function to slow down an endpoint class after a 429 response
+        Return: float (seconds until the request may be sent again)
+
+        Keyword arguments:
+        endpoint -- The endpoint class of the request
+        retry_after -- The seconds the api asked to wait
+        attempt -- The number of the attempt that was throttled (starting with 0)
+        """
+        # add a random share of the exponential backoff so clients do not retry in lockstep
+        wait = retry_after + random.uniform(0, self.backoff * (2 ** attempt))
+        self.buckets[endpoint].throttled(wait)
+        return wait
+
+
+    def succeeded(self, endpoint):
+        """
+        Function to speed up an endpoint class after an unthrottled response
+
+        Keyword arguments:
+        endpoint -- The endpoint class of the request
+        """
+        self.buckets[endpoint].succeeded()
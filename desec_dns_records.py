@@ -0,0 +1,453 @@
+#!/usr/bin/python
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import re
+import socket
+
+
+# a complete IPv4 address without leading zeros
+_IPV4 = re.compile(r'(?:(?:25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])\.){3}(?:25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])\Z')
+
+# a fully qualified host name (lower case) with the trailing dot, or the root '.'
+_NAME = re.compile(r'(?:(?:[a-z0-9_](?:[a-z0-9_-]{0,61}[a-z0-9_])?\.)+|\.)\Z')
+
+# the subname of a rrset as accepted by the api
+_SUBNAME = re.compile(r'(?:\*|(?:\*\.)?[a-z0-9_.-]*)\Z')
+
+_TYPE = re.compile(r'[A-Za-z0-9]+\Z')
+
+_HEX = re.compile(r'[0-9a-fA-F]+\Z')
+
+# a quoted string (group 1), a word (group 2) or a quote / backslash without its pair (group 3)
+_TOKEN = re.compile(r'"((?:[^"\\]|\\.)*)"|((?:[^\s"\\]|\\.)+)|(["\\])')
+
+# a TXT record in canonical form, quoted strings separated by single spaces
+_TXT = re.compile(r'"(?:[^"\\]|\\.)*"(?: "(?:[^"\\]|\\.)*")*\Z')
+
+# an escaped character of a quoted string (\" or \065), one byte on the wire
+_ESCAPE = re.compile(r'\\(?:[0-9]{3}|.)')
+
+# the number of hex digits of a digest by its type (TLSA matching type, SSHFP fingerprint type, DS digest type)
+TLSA_DIGESTS = {1: 64, 2: 128}
+SSHFP_DIGESTS = {1: 40, 2: 64}
+DS_DIGESTS = {1: 40, 2: 64, 4: 96}
+
+
+
+def split_records(records):
+    """
+    Function to split a comma separated list of records
+    Commas within quoted strings are part of the record, like in
+    '"v=spf1 a,mx -all","second"'.
+    Return: list of strings (stripped, empty entries are left out)
+
+    Keyword arguments:
+    records -- The records as comma separated string (lists and tuples are returned as list)
+    """
+    if isinstance(records, (list, tuple)):
+        return list(records)
+    if '"' not in records:
+        return [record.strip() for record in records.split(",") if record.strip()]
+
+    result = list()
+    start = 0
+    quoted = False
+    escaped = False
+    for position, char in enumerate(records):
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif char == ',' and not quoted:
+            result.append(records[start:position])
+            start = position + 1
+    result.append(records[start:])
+    return [record.strip() for record in result if record.strip()]
+
+
+def _tokens(record):
+    """
+    Function to split a record into its fields, quoted strings are one field
+    Return: list of tuples (text, quoted)
+
+    Keyword arguments:
+    record -- The record content
+    """
+    tokens = list()
+    for quoted, word, stray in _TOKEN.findall(record):
+        if stray:
+            raise ValueError("unbalanced quotes or backslash")
+        if word:
+            tokens.append((word, False))
+        else:
+            tokens.append((quoted, True))
+    return tokens
+
+
+def _number(value, maximum, field):
+    """
+    Function to check a numeric field of a record
+    Return: string (without leading zeros)
+
+    Keyword arguments:
+    value -- The field
+    maximum -- The largest value allowed
+    field -- The name of the field for the error message
+    """
+    if not (value.isdigit() and value.isascii()) or int(value) > maximum:
+        raise ValueError(field + " must be a number from 0 to " + str(maximum))
+    return str(int(value))
+
+
+def _name(value, field="target"):
+    """
+    Function to check a host name field of a record
+    Return: string (lower case)
+
+    Keyword arguments:
+    value -- The field
+    field -- The name of the field for the error message (default "target")
+    """
+    name = value.lower()
+    if len(name) > 254 or not _NAME.match(name):
+        if not name.endswith('.') and _NAME.match(name + '.'):
+            # the api only takes fully qualified names, a relative name would not point where it seems to
+            raise ValueError("the " + field + " '" + value + "' must be fully qualified with a trailing dot ('" + value + ".')")
+        raise ValueError("'" + value + "' is not a valid host name as " + field)
+    return name
+
+
+def _hex(value, length, field):
+    """
+    Function to check a hex field of a record (like a digest)
+    Return: string (lower case)
+
+    Keyword arguments:
+    value -- The field, spaces are removed
+    length -- The number of hex digits required, None for any even number
+    field -- The name of the field for the error message
+    """
+    value = "".join(value.split()).lower()
+    if not _HEX.match(value) or len(value) % 2:
+        raise ValueError(field + " must be an even number of hex digits")
+    if length is not None and len(value) != length:
+        raise ValueError(field + " must have " + str(length) + " hex digits for its type")
+    return value
+
+
+def _fields(record, count, names):
+    """
+    Function to split a record into a fixed number of fields
+    Return: list of strings
+
+    Keyword arguments:
+    record -- The record content
+    count -- The number of fields, the last field takes the rest of the record
+    names -- The description of the fields for the error message
+    """
+    fields = record.split(None, count - 1)
+    if len(fields) != count:
+        raise ValueError("expected " + names)
+    return fields
+
+
+def _record_a(record):
+    """
+    Function to check and normalise an A record (IPv4 address)
+    Return: string (raises ValueError)
+
+    Keyword arguments:
+    record -- The record content (stripped)
+    """
+    if not _IPV4.match(record):
+        raise ValueError("not an IPv4 address")
+    return record
+
+
+def _record_aaaa(record):
+    """
+    Function to check and normalise an AAAA record (IPv6 address, compressed)
+    Return: string (raises ValueError)
+
+    Keyword arguments:
+    record -- The record content (stripped)
+    """
+    try:
+        return socket.inet_ntop(socket.AF_INET6, socket.inet_pton(socket.AF_INET6, record))
+    except (OSError, ValueError):
+        raise ValueError("not an IPv6 address")
+
+
+def _record_target(record):
+    """
+    Function to check and normalise a record holding a single host name (CNAME, DNAME, NS, PTR)
+    Return: string (raises ValueError)
+
+    Keyword arguments:
+    record -- The record content (stripped)
+    """
+    if len(record.split()) != 1:
+        raise ValueError("expected a single host name")
+    return _name(record)
+
+
+def _record_mx(record):
+    """
+    Function to check and normalise a MX record (preference and mail server)
+    Return: string (raises ValueError)
+
+    Keyword arguments:
+    record -- The record content (stripped)
+    """
+    preference, exchange = _fields(record, 2, "preference and mail server")
+    return _number(preference, 65535, "preference") + " " + _name(exchange, "mail server")
+
+
+def _record_srv(record):
+    """
+    Function to check and normalise a SRV record (priority, weight, port and target)
+    Return: string (raises ValueError)
+
+    Keyword arguments:
+    record -- The record content (stripped)
+    """
+    fields = _fields(record, 4, "priority, weight, port and target")
+    if len(fields[3].split()) != 1:
+        raise ValueError("expected priority, weight, port and target")
+    return " ".join((_number(fields[0], 65535, "priority"), _number(fields[1], 65535, "weight"),
+                     _number(fields[2], 65535, "port"), _name(fields[3])))
+
+
+def _record_txt(record):
+    """
+    Function to check and normalise a TXT record (one or more strings, each quoted)
+    Return: string (raises ValueError)
+
+    Keyword arguments:
+    record -- The record content (stripped)
+    """
+    # no string of a short canonical record can be longer than 255 bytes
+    if len(record) < 66 and _TXT.match(record):
+        return record
+    strings = list()
+    for text, quoted in _tokens(record):
+        # the text of a string is at most 255 bytes, an escape is one byte
+        if len(text) > 63 and len(_ESCAPE.sub("x", text).encode('utf-8')) > 255:
+            raise ValueError("a string is longer than 255 bytes, split it into several quoted strings")
+        strings.append('"' + text + '"')
+    if not strings:
+        raise ValueError("expected at least one quoted string")
+    return " ".join(strings)
+
+
+def _record_caa(record):
+    """
+    Function to check and normalise a CAA record (flags, tag and quoted value)
+    Return: string (raises ValueError)
+
+    Keyword arguments:
+    record -- The record content (stripped)
+    """
+    tokens = _tokens(record)
+    if len(tokens) != 3 or tokens[0][1] or tokens[1][1]:
+        raise ValueError("expected flags, tag and quoted value")
+    if not _TYPE.match(tokens[1][0]):
+        raise ValueError("the tag must be letters and digits")
+    return _number(tokens[0][0], 255, "flags") + " " + tokens[1][0].lower() + ' "' + tokens[2][0] + '"'
+
+
+def _record_tlsa(record):
+    """
+    Function to check and normalise a TLSA or SMIMEA record (usage, selector, matching type and hex data)
+    Return: string (raises ValueError)
+
+    Keyword arguments:
+    record -- The record content (stripped)
+    """
+    fields = _fields(record, 4, "usage, selector, matching type and certificate data")
+    matching = _number(fields[2], 255, "matching type")
+    return " ".join((_number(fields[0], 255, "usage"), _number(fields[1], 255, "selector"), matching,
+                     _hex(fields[3], TLSA_DIGESTS.get(int(matching)), "certificate data")))
+
+
+def _record_sshfp(record):
+    """
+    Function to check and normalise a SSHFP record (algorithm, fingerprint type and hex fingerprint)
+    Return: string (raises ValueError)
+
+    Keyword arguments:
+    record -- The record content (stripped)
+    """
+    fields = _fields(record, 3, "algorithm, fingerprint type and fingerprint")
+    fingerprint_type = _number(fields[1], 255, "fingerprint type")
+    return " ".join((_number(fields[0], 255, "algorithm"), fingerprint_type,
+                     _hex(fields[2], SSHFP_DIGESTS.get(int(fingerprint_type)), "fingerprint")))
+
+
+def _record_ds(record):
+    """
+    Function to check and normalise a DS or CDS record (key tag, algorithm, digest type and hex digest)
+    Return: string (raises ValueError)
+
+    Keyword arguments:
+    record -- The record content (stripped)
+    """
+    fields = _fields(record, 4, "key tag, algorithm, digest type and digest")
+    digest_type = _number(fields[2], 255, "digest type")
+    return " ".join((_number(fields[0], 65535, "key tag"), _number(fields[1], 255, "algorithm"), digest_type,
+                     _hex(fields[3], DS_DIGESTS.get(int(digest_type)), "digest")))
+
+
+def _record_other(record):
+    """
+    Function to check and normalise a record of a type without own rules
+    Return: string (raises ValueError)
+
+    Keyword arguments:
+    record -- The record content (stripped)
+    """
+    # types without own rules (like HTTPS with alpn="h2,h3") are left to the api, only
+    # whitespace outside of quoted strings is normalised
+    if '"' in record:
+        return record
+    return " ".join(record.split())
+
+
+# the function checking and normalising the records of a type
+RECORD_TYPES = {
+    'A': _record_a,
+    'AAAA': _record_aaaa,
+    'CNAME': _record_target,
+    'DNAME': _record_target,
+    'NS': _record_target,
+    'PTR': _record_target,
+    'MX': _record_mx,
+    'SRV': _record_srv,
+    'TXT': _record_txt,
+    'SPF': _record_txt,
+    'CAA': _record_caa,
+    'TLSA': _record_tlsa,
+    'SMIMEA': _record_tlsa,
+    'SSHFP': _record_sshfp,
+    'DS': _record_ds,
+    'CDS': _record_ds,
+}
+
+
+
+def canonical_record(type, record):
+    """
+    Function to check a record and bring it into its canonical form
+    Host names are lower case, IPv6 addresses compressed, strings quoted,
+    hex data lower case and the fields separated by a single space, so two
+    records with the same content compare equal.
+    Return: string (raises ValueError if the record is not valid for the type)
+
+    Keyword arguments:
+    type -- The type of the rrset (A, MX, TXT, ...)
+    record -- The record content
+    """
+    if not isinstance(record, str):
+        raise ValueError("invalid " + type + " record " + repr(record) + ": records must be strings")
+    content = record.strip()
+    if not content:
+        raise ValueError("empty " + type + " record")
+    try:
+        return RECORD_TYPES.get(type.upper(), _record_other)(content)
+    except ValueError as err:
+        raise ValueError("invalid " + type + " record '" + record + "': " + str(err))
+
+
+def canonical_records(type, records, strict=True):
+    """
+    Function to check the records of a rrset and bring them into their canonical form
+    Return: list of strings (raises ValueError for an invalid record, a duplicate or several CNAME records)
+
+    Keyword arguments:
+    type -- The type of the rrset (A, MX, TXT, ...)
+    records -- The records as list or comma separated string
+    strict -- Raise ValueError for invalid records, otherwise they are kept as they are (default True)
+    """
+    validate = RECORD_TYPES.get(type) or RECORD_TYPES.get(type.upper(), _record_other)
+    if not isinstance(records, (list, tuple, str)):
+        raise ValueError("the records of the " + type + " rrset must be a list of strings, not " + repr(records))
+    if not isinstance(records, list):
+        records = split_records(records)
+    try:
+        # most records are valid, the error message is only built for the others (records that are no strings too)
+        result = [validate(record.strip()) for record in records]
+    except (ValueError, AttributeError):
+        result = list()
+        for record in records:
+            try:
+                result.append(validate(record.strip()))
+            except (ValueError, AttributeError):
+                if strict or not isinstance(record, str):
+                    canonical_record(type, record)
+                result.append(record.strip())
+    if strict and len(result) > 1:
+        if len(set(result)) != len(result):
+            duplicate = [record for record in result if result.count(record) > 1][0]
+            raise ValueError("duplicate " + type + " record '" + duplicate + "'")
+        if type.upper() == 'CNAME':
+            raise ValueError("a CNAME rrset can only have one record")
+    return result
+
+
+def canonical_change(change):
+    """
+    Function to check a rrset change (or rrset) and bring its records into their canonical form
+    Return: dict (the change if it is canonical already, otherwise a copy; raises ValueError if it is not valid)
+
+    Keyword arguments:
+    change -- The change dict (action, subname, type, ttl, records)
+    """
+    type = change.get('type')
+    if type not in RECORD_TYPES and (not isinstance(type, str) or not _TYPE.match(type)):
+        raise ValueError("invalid type '" + str(type) + "'")
+    subname = change.get('subname')
+    if subname and (not isinstance(subname, str) or not _SUBNAME.match(subname)):
+        raise ValueError("invalid subname '" + str(subname) + "', only lower case a-z, 0-9, ., -, _ and a leading '*.' are allowed")
+    ttl = change.get('ttl')
+    # bool is an int as well
+    if ttl is not None and (ttl.__class__ is not int or ttl < 1):
+        raise ValueError("invalid ttl '" + str(ttl) + "'")
+
+    records = change.get('records')
+    if records and change.get('action') != 'delete':
+        records = canonical_records(type, records)
+        if records == change['records'] and type.isupper():
+            # already canonical, no copy needed
+            return change
+    elif type.isupper():
+        return change
+
+    result = dict(change)
+    result['type'] = type.upper()
+    if records and change.get('action') != 'delete':
+        result['records'] = records
+    return result
+
+
+def validate_changes(changes):
+    """
+    Function to check many rrset changes (or rrsets) before they are sent
+    Return: tuple of the list of valid changes (canonical copies) and the list of (change, error message) tuples of the invalid ones
+
+    Keyword arguments:
+    changes -- Iterable of change dicts (action, subname, type, ttl, records)
+    """
+    valid = list()
+    invalid = list()
+    for change in changes:
+        try:
+            valid.append(canonical_change(change))
+        except ValueError as err:
+            invalid.append((change, str(err)))
+    return valid, invalid
@@ -0,0 +1,225 @@
+#!/usr/bin/python
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import random
+import re
+import socket
+import struct
+
+
+TYPE_TXT = 16
+CLASS_IN = 1
+
+re_txt_string = re.compile(r'"((?:[^"\\]|\\.)*)"|(\S+)')
+re_txt_escape = re.compile(r'\\(\d{3}|.)')
+
+
+def encode_name(name):
+    """
+    Function to encode a domain name in DNS wire format
+    Return: bytes
+
+    Keyword arguments:
+    name -- The domain name (with or without trailing dot)
+    """
+    data = b''
+    for label in name.rstrip('.').split('.'):
+        if label:
+            label = label.encode('idna')
+            data += struct.pack('!B', len(label)) + label
+    return data + b'\x00'
+
+
+def decode_name(data, offset):
+    """
+    Function to decode a (compressed) domain name in DNS wire format
+    Return: tuple of the name (with trailing dot) and the offset after the name
+
+    Keyword arguments:
+    data -- The DNS message
+    offset -- The position of the name in the message
+    """
+    labels = list()
+    end = None
+    jumps = 0
+    while True:
+        length = struct.unpack_from('!B', data, offset)[0]
+        if length & 0xC0 == 0xC0:
+            # compression pointer to a name earlier in the message
+            if end is None:
+                end = offset + 2
+            jumps += 1
+            if jumps > 64:
+                raise ValueError("compression loop in DNS message")
+            offset = struct.unpack_from('!H', data, offset)[0] & 0x3FFF
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(data[offset:offset + length].decode('ascii', 'replace'))
+        offset += length
+    if end is None:
+        end = offset
+    return '.'.join(labels) + '.', end
+
+
+def txt_strings(record):
+    """
+    Function to split the presentation format of a TXT record into its strings
+    Return: list of strings
+
+    Keyword arguments:
+    record -- The TXT record as used by the api (like '"v=spf1 -all"' or '"part 1" "part 2"')
+    """
+    strings = list()
+    for quoted, plain in re_txt_string.findall(record):
+        value = quoted if quoted or not plain else plain
+        strings.append(re_txt_escape.sub(lambda m: chr(int(m.group(1))) if m.group(1).isdigit() else m.group(1), value))
+    return strings
+
+
+def build_query(name, qtype=TYPE_TXT, query_id=None):
+    """
+    Function to build a DNS query (without recursion desired, for authoritative servers)
+    Return: tuple of query id and the message (bytes)
+
+    Keyword arguments:
+    name -- The domain name to query
+    qtype -- The record type to query (default TXT)
+    query_id -- The id of the query (default random)
+    """
+    if query_id is None:
+        query_id = random.randint(0, 0xFFFF)
+    header = struct.pack('!HHHHHH', query_id, 0, 1, 0, 0, 0)
+    return query_id, header + encode_name(name) + struct.pack('!HH', qtype, CLASS_IN)
+
+
+def parse_query(data):
+    """
+    Function to parse the question of a DNS query
+    Return: tuple of query id, name (lower case with trailing dot) and type
+
+    Keyword arguments:
+    data -- The DNS message
+    """
+    query_id = struct.unpack_from('!H', data, 0)[0]
+    name, offset = decode_name(data, 12)
+    qtype = struct.unpack_from('!H', data, offset)[0]
+    return query_id, name.lower(), qtype
+
+
+def build_txt_response(query, records, rcode=0, ttl=60):
+    """
+    Function to build the authoritative answer to a DNS query with TXT records
+    Return: bytes
+
+    Keyword arguments:
+    query -- The DNS query message that is answered
+    records -- List of TXT records (presentation format, see txt_strings)
+    rcode -- The response code, 3 answers NXDOMAIN (default 0)
+    ttl -- The ttl of the answer records (default 60)
+    """
+    query_id = struct.unpack_from('!H', query, 0)[0]
+    question_end = decode_name(query, 12)[1] + 4
+    # QR, AA and the response code
+    flags = 0x8400 | rcode
+    message = struct.pack('!HHHHHH', query_id, flags, 1, len(records), 0, 0) + query[12:question_end]
+    for record in records:
+        rdata = b''
+        for string in txt_strings(record):
+            string = string.encode('utf-8')
+            # TXT strings hold up to 255 bytes each
+            for start in range(0, max(len(string), 1), 255):
+                part = string[start:start + 255]
+                rdata += struct.pack('!B', len(part)) + part
+        message += struct.pack('!HHHIH', 0xC00C, TYPE_TXT, CLASS_IN, ttl, len(rdata)) + rdata
+    return message
+
+
+def parse_txt_response(data, query_id=None):
+    """
+    Function to get the TXT records of a DNS response
+    The strings of a record are joined, like ACME expects them.
+    Return: tuple of response code and set of TXT values
+
+    Keyword arguments:
+    data -- The DNS message
+    query_id -- The id of the query, a different id raises ValueError (default None)
+    """
+    response_id, flags, qdcount, ancount = struct.unpack_from('!HHHH', data, 0)
+    if query_id is not None and response_id != query_id:
+        raise ValueError("DNS response does not match the query")
+    offset = 12
+    for _ in range(qdcount):
+        offset = decode_name(data, offset)[1] + 4
+
+    values = set()
+    for _ in range(ancount):
+        offset = decode_name(data, offset)[1]
+        rtype, rclass, ttl, length = struct.unpack_from('!HHIH', data, offset)
+        offset += 10
+        if rtype == TYPE_TXT:
+            value = b''
+            position = offset
+            while position < offset + length:
+                size = struct.unpack_from('!B', data, position)[0]
+                value += data[position + 1:position + 1 + size]
+                position += 1 + size
+            values.add(value.decode('utf-8', 'replace'))
+        offset += length
+    return flags & 0x000F, values
+
+
+def query_txt(server, name, timeout=2.0):
+    """
+    Function to ask a nameserver for the TXT records of a name (over UDP)
+    Return: set of TXT values (None if the server did not answer in time)
+
+    Keyword arguments:
+    server -- Tuple of address and port of the nameserver
+    name -- The domain name to query
+    timeout -- Seconds to wait for the answer (default 2.0)
+    """
+    family = socket.AF_INET6 if ':' in server[0] else socket.AF_INET
+    query_id, query = build_query(name)
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    try:
+        sock.settimeout(timeout)
+        sock.sendto(query, server[:2])
+        while True:
+            try:
+                data = sock.recvfrom(65535)[0]
+                rcode, values = parse_txt_response(data, query_id)
+            except socket.timeout:
+                return None
+            except (ValueError, struct.error):
+                # ignore stray or broken packets, wait for the answer
+                continue
+            return values
+    finally:
+        sock.close()
+
+
+def resolve_nameserver(nameserver, port=53):
+    """
+    Function to get the address of a nameserver
+    Return: tuple of address and port
+
+    Keyword arguments:
+    nameserver -- Host name or address, optionally with port (host:port, [v6]:port)
+    port -- The port used if none is given (default 53)
+    """
+    host = nameserver.rstrip('.')
+    if host.startswith('['):
+        host, _, rest = host[1:].partition(']')
+        if rest.startswith(':'):
+            port = int(rest[1:])
+    elif host.count(':') == 1:
+        host, port = host.split(':')
+        port = int(port)
+    address = socket.getaddrinfo(host, port, 0, socket.SOCK_DGRAM)[0][4][0]
+    return address, port
@@ -0,0 +1,210 @@
+#!/usr/bin/python
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import json
+import math
+import threading
+
+
+# Timings measured for every request (seconds), dns / connect / tls are 0 on reused connections
+PHASES = ('dns', 'connect', 'tls', 'ttfb', 'total')
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def endpoint_template(path):
+    """
+    Function to get the endpoint template of an api path, without domain and rrset names
+    Return: string (like 'domains/{name}/rrsets/{subname}.../{type}/')
+
+    Keyword arguments:
+    path -- The path of the request relative to the api url (like 'domain.tld/rrsets/?type=A')
+    """
+    parts = path.split('?')[0].split('/')
+    if not parts[0]:
+        return 'domains/'
+    if len(parts) < 3 or parts[1] != 'rrsets':
+        return 'domains/{name}/'
+    if len(parts) < 5 or not parts[2]:
+        return 'domains/{name}/rrsets/'
+    return 'domains/{name}/rrsets/{subname}.../{type}/'
+
+
+def percentile(values, quantile):
+    """
+    Function to get a percentile of a list of values (nearest rank)
+    Return: float (0.0 for an empty list)
+
+    Keyword arguments:
+    values -- The sorted list of values
+    quantile -- The quantile between 0 and 1
+    """
+    if not values:
+        return 0.0
+    rank = int(math.ceil(quantile * len(values))) - 1
+    return values[min(len(values) - 1, max(0, rank))]
+
+
+class StatsCollector(object):
+    """
+    Class collecting the requests of an api object through its instrumentation hooks
+    Requests are grouped by method and endpoint template, the report holds
+    the count, errors, retries, bytes and the latency percentiles of every group.
+    """
+
+    def __init__(self):
+        """
+        Initially set up the empty statistics
+        """
+        super(StatsCollector, self).__init__()
+        self.lock = threading.Lock()
+        self.endpoints = dict()
+        self.started = None
+        self.finished = None
+
+
+    def register(self, api):
+        """
+        Function to add the hooks of this collector to an api object
+        Return: the StatsCollector object
+
+        Keyword arguments:
+        api -- The deSEC_DNS_API (or deSEC_DNS_API_Async) object
+        """
+        api.add_hook('after_response', self.after_response)
+        return self
+
+
+    def unregister(self, api):
+        """
+        Function to remove the hooks of this collector from an api object
+
+        Keyword arguments:
+        api -- The deSEC_DNS_API (or deSEC_DNS_API_Async) object
+        """
+        api.hooks['after_response'].remove(self.after_response)
+
+
+    def after_response(self, info):
+        """
+        Function to record a finished request (after_response hook)
+
+        Keyword arguments:
+        info -- The dict describing the request (see deSEC_DNS_API.http_request)
+        """
+        key = (info['method'], info['endpoint'])
+        with self.lock:
+            if self.started is None or info['start'] < self.started:
+                self.started = info['start']
+            self.finished = max(self.finished or 0.0, info['start'] + info['timings']['total'])
+
+            entry = self.endpoints.get(key)
+            if entry is None:
+                entry = {'count': 0, 'errors': 0, 'retries': 0, 'cached': 0, 'coalesced': 0, 'bytes_sent': 0, 'bytes_received': 0,
+                         'status': dict(), 'timings': dict((phase, list()) for phase in PHASES)}
+                self.endpoints[key] = entry
+            entry['count'] += 1
+            if not 0 < info['status'] < 400:
+                entry['errors'] += 1
+            if info['cache'] == 'hit':
+                entry['cached'] += 1
+            elif info['cache'] == 'coalesced':
+                # answered by a request of another thread, not sent to the api
+                entry['coalesced'] += 1
+            entry['retries'] += info['retries']
+            entry['bytes_sent'] += info['bytes_sent']
+            entry['bytes_received'] += info['bytes_received']
+            entry['status'][info['status']] = entry['status'].get(info['status'], 0) + 1
+            for phase in PHASES:
+                entry['timings'][phase].append(info['timings'][phase])
+
+
+    def report(self):
+        """
+        Function to compute the statistics of every endpoint
+        Return: list of dicts (method, endpoint, count, errors, retries, cached, coalesced, bytes, throughput, status and timings)
+        """
+        with self.lock:
+            duration = (self.finished or 0.0) - (self.started or 0.0)
+            rows = list()
+            for (method, endpoint), entry in sorted(self.endpoints.items()):
+                row = dict()
+                row['method'] = method
+                row['endpoint'] = endpoint
+                row['count'] = entry['count']
+                row['errors'] = entry['errors']
+                row['retries'] = entry['retries']
+                row['cached'] = entry['cached']
+                row['coalesced'] = entry['coalesced']
+                row['bytes_sent'] = entry['bytes_sent']
+                row['bytes_received'] = entry['bytes_received']
+                row['throughput'] = entry['count'] / duration if duration > 0 else 0.0
+                row['status'] = dict((str(code), count) for code, count in sorted(entry['status'].items()))
+                row['timings'] = dict()
+                for phase in PHASES:
+                    values = sorted(entry['timings'][phase])
+                    timing = dict(('p' + str(int(round(quantile * 100))), percentile(values, quantile)) for quantile in QUANTILES)
+                    timing['max'] = values[-1] if values else 0.0
+                    timing['sum'] = sum(values)
+                    row['timings'][phase] = timing
+                rows.append(row)
+        return rows
+
+
+    def to_json(self):
+        """
+        Function to export the statistics as json
+        Return: string
+        """
+        duration = (self.finished or 0.0) - (self.started or 0.0)
+        return json.dumps({'duration': duration, 'endpoints': self.report()}, indent=2, sort_keys=True)
+
+
+    def to_prometheus(self, prefix='desec_dns'):
+        """
+        Function to export the statistics in the Prometheus text format
+        Return: string
+
+        Keyword arguments:
+        prefix -- The prefix of the metric names (default 'desec_dns')
+        """
+        lines = list()
+
+        def metric(name, kind, help, samples):
+            lines.append("# HELP " + prefix + "_" + name + " " + help)
+            lines.append("# TYPE " + prefix + "_" + name + " " + kind)
+            for suffix, labels, value in samples:
+                label = ",".join(key + '="' + str(labels[key]) + '"' for key in sorted(labels))
+                lines.append(prefix + "_" + name + suffix + "{" + label + "} " + repr(float(value)))
+
+        rows = self.report()
+        requests, errors, retries, coalesced, received, sent, duration, phases = [], [], [], [], [], [], [], []
+        for row in rows:
+            labels = {'method': row['method'], 'endpoint': row['endpoint']}
+            for code, count in row['status'].items():
+                requests.append(('', dict(labels, status=code), count))
+            errors.append(('', labels, row['errors']))
+            retries.append(('', labels, row['retries']))
+            coalesced.append(('', labels, row['coalesced']))
+            received.append(('', labels, row['bytes_received']))
+            sent.append(('', labels, row['bytes_sent']))
+            for quantile in QUANTILES:
+                duration.append(('', dict(labels, quantile=str(quantile)), row['timings']['total']['p' + str(int(round(quantile * 100)))]))
+            duration.append(('_sum', labels, row['timings']['total']['sum']))
+            duration.append(('_count', labels, row['count']))
+            for phase in PHASES[:-1]:
+                phases.append(('', dict(labels, phase=phase), row['timings'][phase]['sum']))
+
+        metric('requests_total', 'counter', "Number of api requests by status", requests)
+        metric('request_errors_total', 'counter', "Number of failed api requests", errors)
+        metric('request_retries_total', 'counter', "Number of throttled requests sent again", retries)
+        metric('requests_coalesced_total', 'counter', "Number of read requests answered by an identical request in progress", coalesced)
+        metric('request_duration_seconds', 'summary', "Duration of the api requests", duration)
+        metric('request_phase_seconds_total', 'counter', "Time spent in the phases of the api requests", phases)
+        metric('response_bytes_total', 'counter', "Bytes of the response bodies", received)
+        metric('request_bytes_total', 'counter', "Bytes of the request bodies", sent)
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,181 @@
+#!/usr/bin/python
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from desec_dns_api import deSEC_DNS_Error
+from desec_dns_zone import rrset_records
+
+
+def rrset_digest(rrset):
+    """
+    Function to get a short digest of the content of a rrset (ttl and records, in any order)
+    Return: string (16 hex digits)
+
+    Keyword arguments:
+    rrset -- The rrset dict or RRset object
+    """
+    content = json.dumps([rrset.get('ttl'), sorted(rrset_records(rrset))])
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def snapshot_key(subname, type):
+    """
+    Function to get the key of a rrset in the snapshot
+    Return: string (like 'www/A', '/MX' for the domain itself)
+
+    Keyword arguments:
+    subname -- The subname of the rrset
+    type -- The type of the rrset
+    """
+    return (subname or '') + '/' + type
+
+
+def load_snapshot(filename):
+    """
+    Function to read a snapshot saved by save_snapshot
+    Return: dict (empty if the file does not exist)
+
+    Keyword arguments:
+    filename -- The name of the snapshot file
+    """
+    if not os.path.exists(filename):
+        return dict()
+    with open(filename, "r") as stream:
+        return json.load(stream)
+
+
+def save_snapshot(filename, snapshot):
+    """
+    Function to save a snapshot, the file is replaced at once so an interrupted write keeps the old one
+
+    Keyword arguments:
+    filename -- The name of the snapshot file
+    snapshot -- The snapshot dict of poll_changes
+    """
+    temp = filename + ".tmp"
+    with open(temp, "w") as stream:
+        json.dump(snapshot, stream, separators=(',', ':'))
+    os.replace(temp, filename)
+
+
+def _zone_changes(api, zone, previous, now):
+    """
+    Function to compare the rrsets of a changed domain with its snapshot
+    Only rrsets touched after the snapshot are hashed, the others kept their content.
+    Return: tuple of the list of events and the new snapshot entry of the domain
+
+    Keyword arguments:
+    api -- The deSEC_DNS_API object
+    zone -- The domain name
+    previous -- The snapshot entry of the domain (None if the domain is new)
+    now -- The touched timestamp of the domain in the domain list
+    """
+    old = previous['rrsets'] if previous else dict()
+    since = previous['touched'] if previous else ''
+    rrsets = dict()
+    events = list()
+    for rrset in api.iter_rrsets(zone, compact=True):
+        key = snapshot_key(rrset.subname, rrset.type)
+        if key in old and rrset.touched and rrset.touched <= since:
+            rrsets[key] = old[key]
+            continue
+        digest = rrset_digest(rrset)
+        rrsets[key] = digest
+        if key not in old:
+            event = 'added'
+        elif old[key] != digest:
+            event = 'modified'
+        else:
+            continue
+        events.append({'event': event, 'zone': zone, 'subname': rrset.subname, 'type': rrset.type,
+                       'ttl': rrset.ttl, 'records': list(rrset.records), 'touched': rrset.touched})
+
+    for key in old:
+        if key not in rrsets:
+            subname, type = key.rsplit('/', 1)
+            events.append({'event': 'removed', 'zone': zone, 'subname': subname, 'type': type,
+                           'ttl': None, 'records': [], 'touched': now})
+    return events, {'touched': now, 'rrsets': rrsets}
+
+
+def poll_changes(api, snapshot, zones=None, concurrency=10, initial=False):
+    """
+    Function to find the rrsets changed since the last poll
+    A single domain list request tells which domains were touched since the
+    snapshot, only the rrsets of those domains are requested. The snapshot
+    keeps the touched time of every domain and a short digest of every rrset,
+    it is updated in place.
+    Return: list of event dicts (event added/modified/removed, zone, subname, type, ttl, records, touched)
+
+    Keyword arguments:
+    api -- The deSEC_DNS_API object
+    snapshot -- The snapshot dict of the last poll (empty dict for the first poll)
+    zones -- The list of domains to watch (default None, all domains of the account)
+    concurrency -- The maximum number of domains requested at the same time (default 10)
+    initial -- Report the rrsets found by the first poll as added (default False)
+    """
+    response = api.domain_list()
+    if not response:
+        raise deSEC_DNS_Error(response)
+    touched = dict((domain['name'], domain.get('touched') or '') for domain in response.get_response_dict())
+    if zones is not None:
+        touched = dict((zone, touched[zone]) for zone in zones if zone in touched)
+    domains = snapshot.setdefault('zones', dict())
+    # the rrsets found by the first poll are the starting point, not changes
+    report_new = initial or 'polled' in snapshot
+
+    changed = [zone for zone in sorted(touched) if zone not in domains or domains[zone]['touched'] != touched[zone]]
+    events = list()
+    if changed:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(_zone_changes, api, zone, domains.get(zone), touched[zone]) for zone in changed]
+            for zone, future in zip(changed, futures):
+                zone_events, entry = future.result()
+                if zone in domains or report_new:
+                    events.extend(zone_events)
+                domains[zone] = entry
+
+    # domains deleted from the account (or no longer watched)
+    for zone in sorted(domains):
+        if zone not in touched:
+            for key in sorted(domains[zone]['rrsets']):
+                subname, type = key.rsplit('/', 1)
+                events.append({'event': 'removed', 'zone': zone, 'subname': subname, 'type': type,
+                               'ttl': None, 'records': [], 'touched': None})
+            del domains[zone]
+    snapshot['polled'] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    return events
+
+
+def watch_changes(api, snapshot=None, zones=None, interval=60, concurrency=10, initial=False, polls=None):
+    """
+    Generator polling the domains and yielding the changed rrsets as they are found
+    Return: generator of event dicts (see poll_changes)
+
+    Keyword arguments:
+    api -- The deSEC_DNS_API object
+    snapshot -- The snapshot dict, updated in place after every poll (default None, start empty)
+    zones -- The list of domains to watch (default None, all domains of the account)
+    interval -- Seconds between the start of two polls (default 60)
+    concurrency -- The maximum number of domains requested at the same time (default 10)
+    initial -- Report the rrsets found by the first poll as added (default False)
+    polls -- The number of polls, None to poll forever (default None)
+    """
+    if snapshot is None:
+        snapshot = dict()
+    count = 0
+    while polls is None or count < polls:
+        started = time.time()
+        for event in poll_changes(api, snapshot, zones=zones, concurrency=concurrency, initial=initial):
+            yield event
+        count += 1
+        if polls is None or count < polls:
+            time.sleep(max(0.0, interval - (time.time() - started)))
@@ -0,0 +1,193 @@
+#!/usr/bin/python
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import sys
+from desec_dns_records import split_records, canonical_records
+
+
+class RRset(object):
+    """
+    Class holding a single rrset with less memory than the dict of the api
+    The fields are slots instead of a dict, the records are a tuple and the
+    domain and type strings are interned, so they are shared by all rrsets.
+    The name is not stored but built from subname and domain when needed.
+    The fields can be read like the keys of a dict (rrset['ttl']), so an
+    RRset can be passed where the rrset dicts are used.
+    """
+
+    __slots__ = ('created', 'touched', 'domain', 'subname', 'ttl', 'type', 'records')
+
+    FIELDS = ('created', 'touched', 'domain', 'subname', 'name', 'ttl', 'type', 'records')
+
+    def __init__(self, created=None, touched=None, domain=None, subname='', ttl=None, type=None, records=()):
+        """
+        Initially set the fields of the rrset
+
+        Keyword arguments:
+        created -- The time the rrset was created (default None)
+        touched -- The time the rrset was last changed (default None)
+        domain -- The domain of the rrset (default None)
+        subname -- The subname of the rrset (default '')
+        ttl -- The ttl of the rrset (default None)
+        type -- The type of the rrset (default None)
+        records -- Iterable of the records (default ())
+        """
+        super(RRset, self).__init__()
+        self.created = created
+        self.touched = touched
+        self.domain = sys.intern(domain) if domain else domain
+        self.subname = subname or ''
+        self.ttl = ttl
+        self.type = sys.intern(type) if type else type
+        self.records = tuple(records)
+
+
+    @classmethod
+    def from_dict(cls, rrset):
+        """
+        Function to create an RRset from a rrset dict of the api
+        Return: RRset object
+
+        Keyword arguments:
+        rrset -- The rrset dict (unknown keys and the name are ignored)
+        """
+        return cls(rrset.get('created'), rrset.get('touched'), rrset.get('domain'), rrset.get('subname'),
+                   rrset.get('ttl'), rrset.get('type'), rrset.get('records') or ())
+
+
+    @property
+    def name(self):
+        """
+        The full name of the rrset with trailing dot (like www.domain.tld.)
+        """
+        if self.subname:
+            return self.subname + '.' + self.domain + '.'
+        return self.domain + '.'
+
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+
+    def __repr__(self):
+        return "RRset(" + repr(self.name) + ", " + repr(self.type) + ", " + repr(list(self.records)) + ")"
+
+
+    def get(self, key, default=None):
+        """
+        Function to get a field like dict.get
+        Return: the value of the field (default if the field does not exist)
+
+        Keyword arguments:
+        key -- The name of the field
+        default -- The value returned for unknown fields (default None)
+        """
+        if key not in self.FIELDS:
+            return default
+        return getattr(self, key)
+
+
+    def keys(self):
+        """
+        Function to get the names of the fields like dict.keys
+        Return: tuple of strings
+        """
+        return self.FIELDS
+
+
+    def to_dict(self):
+        """
+        Function to convert the RRset to a rrset dict like the api returns it
+        Return: dict (records as list)
+        """
+        rrset = dict((key, getattr(self, key)) for key in self.FIELDS)
+        rrset['records'] = list(self.records)
+        return rrset
+
+
+def rrset_key(rrset):
+    """
+    Function to get the key identifying a rrset within a domain
+    The type is compared in upper case, like the api and rrset_bulk use it.
+    Return: tuple of subname and type (upper case)
+
+    Keyword arguments:
+    rrset -- The rrset dict
+    """
+    return (rrset.get('subname') or '', rrset['type'].upper())
+
+
+def rrset_records(rrset):
+    """
+    Function to get the records of a rrset as list
+    Return: list of strings
+
+    Keyword arguments:
+    rrset -- The rrset dict or RRset, records as list, tuple or comma separated string
+    """
+    return split_records(rrset.get('records') or [])
+
+
+def zone_diff(desired, live, delete=True):
+    """
+    Function to compute the changes turning the live rrsets into the desired ones
+    Both lists are compared by (subname, type) with one dict lookup per rrset,
+    so the time grows linear with the size of the zone. The records are compared
+    in their canonical form regardless of their order, records differing only
+    in formatting (case of names, spaces, quotes) are unchanged. The NS rrset
+    of the zone apex is managed by deSEC and never deleted unless it is part
+    of the desired rrsets.
+    Return: dict with the lists 'create', 'modify', 'delete' (change dicts for rrset_bulk) and the count 'unchanged'
+    (raises ValueError if a subname and type is desired twice, before the live rrsets are read)
+
+    Keyword arguments:
+    desired -- Iterable of rrset dicts (subname, type, ttl, records) the domain should have
+    live -- Iterable of rrset dicts the domain currently has
+    delete -- Delete live rrsets that are not desired (default True)
+    """
+    # two changes of one rrset in a bulk request make the api reject the whole request
+    desired = list(desired)
+    keys = set()
+    for rrset in desired:
+        key = rrset_key(rrset)
+        if key in keys:
+            raise ValueError("the rrset '" + (key[0] or '@') + " " + key[1] + "' is given more than once, merge its records into one rrset")
+        keys.add(key)
+
+    # keep only what is compared from the live rrsets
+    live_index = dict()
+    for rrset in live:
+        live_index[rrset_key(rrset)] = (rrset.get('ttl'), sorted(canonical_records(rrset['type'], rrset_records(rrset), strict=False)))
+
+    plan = {'create': [], 'modify': [], 'delete': [], 'unchanged': 0}
+    for rrset in desired:
+        key = rrset_key(rrset)
+        records = canonical_records(key[1], rrset_records(rrset), strict=False)
+        change = {'subname': key[0], 'type': key[1], 'ttl': rrset.get('ttl'), 'records': records}
+        current = live_index.pop(key, None)
+        if current is None:
+            change['action'] = 'create'
+            plan['create'].append(change)
+        elif current[1] != sorted(records) or (rrset.get('ttl') and current[0] != rrset.get('ttl')):
+            change['action'] = 'modify'
+            plan['modify'].append(change)
+        else:
+            plan['unchanged'] += 1
+
+    if delete:
+        for key in live_index:
+            if key == ('', 'NS'):
+                continue
+            plan['delete'].append({'action': 'delete', 'subname': key[0], 'type': key[1], 'ttl': None, 'records': []})
+
+    return plan
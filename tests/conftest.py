@@ -0,0 +1,45 @@
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import os
+import sys
+import pytest
+
+# the modules of the cli are not installed, they are imported from the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from desec_dns_api import deSEC_DNS_API
+from desec_dns_mock import MockDeSEC
+
+
+@pytest.fixture
+def mock():
+    """
+    Local stand-in for the deSEC api, serving in a background thread
+    """
+    with MockDeSEC() as server:
+        yield server
+
+
+@pytest.fixture
+def api(mock):
+    """
+    Api object of an account of the mock, without client side rate limiting
+    """
+    with deSEC_DNS_API(api_url=mock.url, api_token="test", rate_limits=False) as client:
+        yield client
+
+
+def records(mock, zone):
+    """
+    Function to get the rrsets of a domain of the mock
+    Return: dict of (subname, type) to tuple of ttl and sorted records
+
+    Keyword arguments:
+    mock -- The MockDeSEC object
+    zone -- The domain name
+    """
+    return dict((key, (rrset['ttl'], sorted(rrset['records']))) for key, rrset in mock.rrsets[zone].items())
@@ -0,0 +1,70 @@
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import json
+import pytest
+from desec_dns_accounts import AccountSet, account_names, account_settings
+from desec_dns_api import deSEC_DNS_API
+from desec_dns_mock import MockDeSEC
+
+
+@pytest.fixture
+def accounts(tmp_path):
+    """
+    AccountSet of two accounts, each served by its own mock
+    """
+    with MockDeSEC() as first, MockDeSEC() as second:
+        first.add_domain("one.example")
+        second.add_domain("two.example")
+        mocks = {'first': first, 'second': second}
+        account_set = AccountSet(["first", "second"],
+                                 lambda name: deSEC_DNS_API(api_url=mocks[name].url, api_token=name, rate_limits=False),
+                                 index_path=str(tmp_path / "zones.json"))
+        account_set.mocks = mocks
+        yield account_set
+        account_set.close()
+
+
+def test_account_settings_override_the_top_level():
+    settings = {'api_url': 'https://desec.io/api/v1/domains/', 'pool_size': 5,
+                'accounts': {'a': {'api_token': 'x'}, 'b': {'api_token': 'y', 'pool_size': 20}}}
+    assert account_names(settings) == ['a', 'b']
+    assert account_settings(settings, 'b') == {'api_url': 'https://desec.io/api/v1/domains/', 'pool_size': 20, 'api_token': 'y'}
+    assert account_names({'api_token': 'x'}) == []
+
+
+def test_account_for_routes_by_the_index(accounts, tmp_path):
+    assert accounts.account_for("one.example") == "first"
+    assert accounts.account_for("two.example") == "second"
+    assert accounts.account_for("missing.example") is None
+    assert accounts.group_zones(["two.example", "one.example", "missing.example"]) == (
+        {'second': ['two.example'], 'first': ['one.example']}, ['missing.example'])
+
+    with open(str(tmp_path / "zones.json")) as stream:
+        assert json.load(stream)['zones'] == {'one.example': 'first', 'two.example': 'second'}
+
+
+def test_forgotten_domain_is_found_after_the_index_was_built(accounts):
+    assert accounts.account_for("one.example") == "first"
+    requests = accounts.mocks['second'].request_count
+
+    # a lookup of a missing domain builds the index once, later misses do not list all accounts again
+    assert accounts.account_for("new.example") is None
+    accounts.mocks['second'].add_domain("new.example")
+    assert accounts.account_for("new.example") is None
+    assert accounts.mocks['second'].request_count == requests
+
+    # like after 'domain create' of a long running process
+    accounts.forget_zone("new.example")
+    assert accounts.account_for("new.example") == "second"
+
+
+def test_index_file_of_other_accounts_is_not_used(accounts, tmp_path):
+    accounts.account_for("one.example")
+    other = AccountSet(["first"], lambda name: None, index_path=str(tmp_path / "zones.json"))
+    assert other.load_index() is None
+    same = AccountSet(["first", "second"], lambda name: None, index_path=str(tmp_path / "zones.json"))
+    assert same.load_index() == {'one.example': 'first', 'two.example': 'second'}
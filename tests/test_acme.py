@@ -0,0 +1,78 @@
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import time
+import pytest
+from conftest import records
+from desec_dns_acme import acme_publish, acme_cleanup, acme_wait, challenge_name, group_challenges
+from desec_dns_mock import MockDNS
+
+
+def test_challenge_name_and_grouping():
+    assert challenge_name("*.Example.COM.") == "_acme-challenge.example.com"
+    grouped = group_challenges([("www.example.com", "t1"), ("*.example.com", "t2"), ("example.com", "t2"),
+                                ("a.sub.example.com", "t3")], ["example.com", "sub.example.com"])
+    assert grouped == {'example.com': {'_acme-challenge.www': ['t1'], '_acme-challenge': ['t2']},
+                       'sub.example.com': {'_acme-challenge.a': ['t3']}}
+    with pytest.raises(ValueError):
+        group_challenges([("www.other.org", "t1")], ["example.com"])
+
+
+def test_wait_succeeds_once_all_nameservers_answer(mock, api):
+    mock.add_domain("example.com")
+    with MockDNS(mock) as ns1, MockDNS(mock, delay=0.5) as ns2:
+        challenges = [("www.example.com", "token-www"), ("example.com", "token-apex")]
+        results = acme_publish(api, challenges)
+        assert all(result['status'] == 'ok' for result in results)
+
+        start = time.time()
+        pending = acme_wait(api, challenges, nameservers=[ns1.nameserver, ns2.nameserver], timeout=10)
+        assert pending == []
+        # the second nameserver only answers after its delay
+        assert time.time() - start >= 0.4
+        assert ns2.query_count > 2
+
+
+def test_wait_times_out_with_the_pending_checks(mock, api):
+    mock.add_domain("example.com")
+    with MockDNS(mock) as ns1, MockDNS(mock, delay=60) as ns2:
+        challenges = [("www.example.com", "token-www")]
+        acme_publish(api, challenges)
+
+        start = time.time()
+        pending = acme_wait(api, challenges, nameservers=[ns1.nameserver, ns2.nameserver], timeout=1)
+        assert time.time() - start < 5
+        assert pending == [(('127.0.0.1', int(ns2.nameserver.split(':')[1])), '_acme-challenge.www.example.com', {'token-www'})]
+
+
+def test_wait_needs_every_expected_value(mock, api):
+    mock.add_domain("example.com")
+    mock.add_rrset("example.com", "_acme-challenge", "TXT", 60, ['"token-old"'])
+    with MockDNS(mock) as ns1:
+        pending = acme_wait(api, [("example.com", "token-old"), ("example.com", "token-new")],
+                            nameservers=[ns1.nameserver], timeout=0.5)
+        assert len(pending) == 1 and pending[0][2] == {'token-old', 'token-new'}
+
+
+def test_publish_keeps_and_cleanup_removes_only_its_values(mock, api):
+    mock.add_domain("example.com")
+    mock.add_rrset("example.com", "_acme-challenge", "TXT", 60, ['"other-order"'])
+
+    acme_publish(api, [("example.com", "mine"), ("www.example.com", "mine-www")])
+    assert records(mock, "example.com") == {('_acme-challenge', 'TXT'): (60, ['"mine"', '"other-order"']),
+                                            ('_acme-challenge.www', 'TXT'): (60, ['"mine-www"'])}
+
+    # publishing again changes nothing
+    results = acme_publish(api, [("example.com", "mine")])
+    assert [result['action'] for result in results] == ['unchanged']
+
+    results = acme_cleanup(api, [("example.com", "mine"), ("www.example.com", "mine-www")])
+    assert all(result['status'] == 'ok' for result in results)
+    assert records(mock, "example.com") == {('_acme-challenge', 'TXT'): (60, ['"other-order"'])}
+
+    # a value published by someone else is not touched by the cleanup of a token it does not hold
+    acme_cleanup(api, [("example.com", "unknown")])
+    assert records(mock, "example.com") == {('_acme-challenge', 'TXT'): (60, ['"other-order"'])}
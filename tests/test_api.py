@@ -0,0 +1,152 @@
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import threading
+from conftest import records
+from desec_dns_api import deSEC_DNS_API
+from desec_dns_cache import deSEC_DNS_Cache
+from desec_dns_flight import SingleFlight
+from desec_dns_mock import MockDeSEC
+
+
+def count_requests(mock):
+    """
+    Function to record the requests the mock answers
+    Return: list of (method, path) tuples, filled while the mock serves
+
+    Keyword arguments:
+    mock -- The MockDeSEC object
+    """
+    seen = list()
+    original = mock.throttle
+
+    def throttle(method, path):
+        seen.append((method, path))
+        return original(method, path)
+    mock.throttle = throttle
+    return seen
+
+
+def test_rrset_bulk_resends_the_valid_rrsets_of_a_rejected_chunk(mock, api):
+    mock.add_domain("example.com")
+    mock.add_rrset("example.com", "old", "A", 3600, ["192.0.2.9"])
+    seen = count_requests(mock)
+
+    # the api refuses a new rrset without ttl, the whole request is rejected
+    results = api.rrset_bulk("example.com", [
+        {'action': 'create', 'subname': 'www', 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.1']},
+        {'action': 'create', 'subname': 'nottl', 'type': 'A', 'records': ['192.0.2.2']},
+        {'action': 'delete', 'subname': 'old', 'type': 'A'},
+    ])
+    assert [(result['subname'], result['status']) for result in results] == [('www', 'ok'), ('nottl', 'failed'), ('old', 'ok')]
+    assert 'ttl' in results[1]['error']
+    assert [method for method, path in seen] == ['PATCH', 'PATCH']
+    assert records(mock, "example.com") == {('www', 'A'): (3600, ['192.0.2.1'])}
+
+
+def test_rrset_bulk_is_not_resent_twice(mock, api):
+    mock.add_domain("example.com")
+    seen = count_requests(mock)
+    results = api.rrset_bulk("example.com", [{'action': 'create', 'subname': 'a', 'type': 'A', 'records': ['192.0.2.1']},
+                                             {'action': 'create', 'subname': 'b', 'type': 'A', 'records': ['192.0.2.2']}])
+    assert [result['status'] for result in results] == ['failed', 'failed']
+    assert len(seen) == 1
+    assert records(mock, "example.com") == {}
+
+
+def test_rrset_bulk_chunks(mock, api):
+    mock.add_domain("example.com")
+    seen = count_requests(mock)
+    changes = [{'action': 'create', 'subname': 'h%d' % i, 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.%d' % i]} for i in range(5)]
+    results = api.rrset_bulk("example.com", changes, chunk_size=2)
+    assert all(result['status'] == 'ok' for result in results)
+    assert len(seen) == 3
+    assert len(mock.rrsets["example.com"]) == 5
+
+
+def test_rrset_list_follows_the_pages():
+    with MockDeSEC(page_size=3) as mock:
+        mock.add_domain("example.com")
+        for i in range(10):
+            mock.add_rrset("example.com", "h%02d" % i, "A", 3600, ["192.0.2.%d" % i])
+        with deSEC_DNS_API(api_url=mock.url, api_token="test", rate_limits=False) as api:
+            assert [rrset['subname'] for rrset in api.iter_rrsets("example.com")] == ["h%02d" % i for i in range(10)]
+            assert len(list(api.iter_rrset_pages("example.com"))) == 4
+            # a single request of a zone larger than a page is refused by the api
+            assert api.rrset_list("example.com").http_code == 400
+            assert len(api.rrset_list("example.com", type="A", subname="h03").get_response_dict()) == 1
+
+
+def test_domain_create_and_delete_many(mock, api):
+    results = list(api.domain_create_many(["a.example", "b.example", "a.example"],
+                                          rrsets=[{'subname': 'www', 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.1']}]))
+    assert sorted(mock.domains) == ["a.example", "b.example"]
+    assert [result['status'] for result in results].count('ok') == 2
+    assert records(mock, "a.example") == {('www', 'A'): (3600, ['192.0.2.1'])}
+
+    results = list(api.domain_delete_many(["a.example", "b.example"]))
+    assert all(result['status'] == 'ok' for result in results)
+    assert mock.domains == {}
+
+
+def test_cache_answers_reads_until_a_write(mock, tmp_path):
+    mock.add_domain("example.com")
+    cache = deSEC_DNS_Cache(path=str(tmp_path / "cache.sqlite"), ttl=60)
+    seen = count_requests(mock)
+    with deSEC_DNS_API(api_url=mock.url, api_token="test", rate_limits=False, cache=cache) as api:
+        assert api.rrset_list("example.com")
+        assert api.rrset_list("example.com")
+        assert len(seen) == 1
+
+        # a write removes the cached responses of the domain
+        assert api.rrset_create("example.com", "A", "www", "192.0.2.1", 3600)
+        response = api.rrset_list("example.com")
+        assert [rrset['subname'] for rrset in response.get_response_dict()] == ['www']
+        assert len(seen) == 3
+    cache.close()
+
+
+def test_cache_revalidates_stale_responses(mock, tmp_path):
+    mock.add_domain("example.com")
+    cache = deSEC_DNS_Cache(path=str(tmp_path / "cache.sqlite"), ttl=0)
+    with deSEC_DNS_API(api_url=mock.url, api_token="test", rate_limits=False, cache=cache) as api:
+        api.domain_list()
+        info = dict()
+        api.add_hook('after_response', lambda event: info.update(event))
+        response = api.domain_list()
+        assert response and response.get_response_dict()[0]['name'] == "example.com"
+        assert info.get('cache') == 'revalidated'
+    cache.close()
+
+
+def test_single_flight_shares_a_request_until_a_write():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = list()
+
+    def request():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return len(calls)
+
+    results = list()
+    leader = threading.Thread(target=lambda: results.append(flight.do("GET url", "example.com", request)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(flight.do("GET url", "example.com", request)))
+    follower.start()
+    while flight.stats()['coalesced'] == 0:
+        pass
+    # a write to the domain: reads started later send their own request
+    flight.barrier("example.com")
+    release.set()
+    leader.join()
+    follower.join()
+    assert sorted(results) == [(1, False), (1, True)]
+    assert flight.do("GET url", "example.com", request) == (2, False)
+    assert flight.stats() == {'requests': 2, 'coalesced': 1, 'invalidated': 1}
@@ -0,0 +1,117 @@
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import pytest
+from conftest import records
+from desec_dns_api import deSEC_DNS_API
+from desec_dns_backup import BackupStore, backup_zones, restore_zones
+from desec_dns_mock import MockDeSEC
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BackupStore(str(tmp_path / "backup"))
+
+
+@pytest.fixture
+def zones(mock):
+    """
+    Three domains, two of them with the same rrsets
+    """
+    for zone in ("a.example", "b.example", "c.example"):
+        mock.add_domain(zone)
+        mock.add_rrset(zone, "www", "A", 3600, ["192.0.2.1"])
+    mock.add_rrset("c.example", "", "MX", 3600, ["10 mail.c.example."])
+    return mock
+
+
+def test_backup_deduplicates_and_skips_untouched_domains(zones, api, store):
+    manifest = backup_zones(api, store)
+    assert sorted(manifest['zones']) == ["a.example", "b.example", "c.example"]
+    assert manifest['stats']['written'] == 2 and manifest['stats']['deduplicated'] == 1
+    assert manifest['zones']["a.example"]['object'] == manifest['zones']["b.example"]['object']
+    assert store.read_object(manifest['zones']["c.example"]['object']) == [
+        {'subname': '', 'type': 'MX', 'ttl': 3600, 'records': ['10 mail.c.example.']},
+        {'subname': 'www', 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.1']}]
+
+    count = zones.request_count
+    unchanged = backup_zones(api, store)
+    assert unchanged['stats']['unchanged'] == 3
+    assert zones.request_count == count + 1
+
+    zones.add_rrset("b.example", "www", "A", 3600, ["192.0.2.2"])
+    incremental = backup_zones(api, store)
+    assert incremental['stats']['fetched'] == 1 and incremental['stats']['written'] == 1
+    assert store.snapshots(api.cache_account) == [manifest['name'], unchanged['name'], incremental['name']]
+    assert store.load_snapshot(incremental['name'])['zones'] == incremental['zones']
+
+
+def test_restore_brings_back_the_snapshot(zones, api, store):
+    manifest = backup_zones(api, store)
+    zones.add_rrset("a.example", "www", "A", 3600, ["192.0.2.99"])
+    zones.add_rrset("a.example", "extra", "TXT", 3600, ['"added later"'])
+    zones.remove_rrset("c.example", ('', 'MX'))
+    api.domain_delete("b.example")
+
+    results = restore_zones(api, store, manifest)
+    assert [(result['zone'], result['created'], result['create'], result['modify'], result['delete'], result['failed'])
+            for result in results] == [("a.example", False, 0, 1, 1, 0), ("b.example", True, 1, 0, 0, 0), ("c.example", False, 1, 0, 0, 0)]
+    for zone in ("a.example", "b.example"):
+        assert records(zones, zone) == {('www', 'A'): (3600, ['192.0.2.1'])}
+    assert records(zones, "c.example")[('', 'MX')] == (3600, ['10 mail.c.example.'])
+
+    # nothing is left to change
+    count = zones.request_count
+    results = restore_zones(api, store, manifest, force=True)
+    assert all(result['create'] + result['modify'] + result['delete'] == 0 for result in results)
+    assert zones.request_count == count + 4
+
+
+def test_restore_dry_run_and_no_delete(zones, api, store):
+    manifest = backup_zones(api, store)
+    zones.add_rrset("a.example", "www", "A", 3600, ["192.0.2.99"])
+    zones.add_rrset("a.example", "extra", "TXT", 3600, ['"added later"'])
+
+    before = records(zones, "a.example")
+    results = restore_zones(api, store, manifest, zones=["a.example"], dry_run=True)
+    assert (results[0]['modify'], results[0]['delete']) == (1, 1)
+    assert records(zones, "a.example") == before
+
+    restore_zones(api, store, manifest, zones=["a.example"], delete=False)
+    assert records(zones, "a.example") == {('www', 'A'): (3600, ['192.0.2.1']), ('extra', 'TXT'): (3600, ['"added later"'])}
+
+
+def test_restore_skips_untouched_domains_and_unknown_zones(zones, api, store):
+    manifest = backup_zones(api, store)
+    count = zones.request_count
+    results = restore_zones(api, store, manifest, zones=["a.example", "c.example", "missing.example"])
+    assert [result['unchanged'] for result in results] == [1, 2, 0]
+    assert results[2]['error'] == "not in the snapshot"
+    # only the domain list was requested
+    assert zones.request_count == count + 1
+
+
+def test_restore_into_another_account_compares_every_domain(zones, api, store):
+    manifest = backup_zones(api, store)
+    with MockDeSEC() as other:
+        other.add_domain("a.example")
+        with deSEC_DNS_API(api_url=other.url, api_token="other", rate_limits=False) as other_api:
+            results = restore_zones(other_api, store, manifest)
+        assert [(result['zone'], result['created']) for result in results] == [
+            ("a.example", False), ("b.example", True), ("c.example", True)]
+        assert records(other, "c.example") == records(zones, "c.example")
+
+
+def test_prune_keeps_the_objects_in_use(zones, api, store):
+    first = backup_zones(api, store)
+    zones.add_rrset("c.example", "www", "A", 3600, ["192.0.2.3"])
+    second = backup_zones(api, store)
+
+    assert store.prune(1, api.cache_account) == (1, 1)
+    assert store.snapshots() == [second['name']]
+    for entry in second['zones'].values():
+        assert store.has_object(entry['object'])
+    assert not store.has_object(first['zones']["c.example"]['object'])
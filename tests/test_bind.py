@@ -0,0 +1,95 @@
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import io
+import pytest
+from conftest import records
+from desec_dns_bind import import_zone_file, iter_rrsets, ZoneFileError
+
+
+ZONE_REPEATED_OWNER = u"""$ORIGIN example.com.
+$TTL 3600
+www     A       192.0.2.1
+mail    A       192.0.2.2
+www     A       192.0.2.3
+"""
+
+
+def test_iter_rrsets_relative_names_and_skipped_types():
+    stream = io.StringIO(u"""$ORIGIN example.com.
+@       3600 IN SOA ns1.example.com. hostmaster.example.com. ( 1 7200 3600 1209600 3600 )
+@       3600 IN NS  ns1.desec.io.
+@       300  IN MX  10 mail
+mail    1h   IN A   192.0.2.2
+""")
+    rrsets = list(iter_rrsets(stream, "example.com"))
+    assert rrsets == [{'subname': '', 'type': 'MX', 'ttl': 300, 'records': ['10 mail.example.com.']},
+                      {'subname': 'mail', 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.2']}]
+
+
+def test_iter_rrsets_mixed_case_owner_names():
+    stream = io.StringIO(u"""$ORIGIN Example.COM.
+WWW             A     192.0.2.1
+mail.EXAMPLE.COM.  A  192.0.2.2
+@               TXT   "Keep The Case"
+""")
+    rrsets = list(iter_rrsets(stream, "EXAMPLE.com"))
+    assert rrsets == [{'subname': 'www', 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.1']},
+                      {'subname': 'mail', 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.2']},
+                      {'subname': '', 'type': 'TXT', 'ttl': 3600, 'records': ['"Keep The Case"']}]
+
+
+def test_iter_rrsets_lists_skipped_out_of_zone_records():
+    stream = io.StringIO(u"""$ORIGIN example.com.
+www             A     192.0.2.1
+ns1.example.net.  A   192.0.2.53
+$ORIGIN example.org.
+@               MX    10 mail
+""")
+    skipped = list()
+    rrsets = list(iter_rrsets(stream, "example.com", skipped=skipped))
+    assert [(rrset['subname'], rrset['type']) for rrset in rrsets] == [('www', 'A')]
+    assert skipped == [('ns1.example.net.', 'A'), ('example.org.', 'MX')]
+
+
+@pytest.mark.parametrize("line", [u"$ORIGIN", u"$TTL", u"$TTL 1x"])
+def test_iter_rrsets_control_entry_errors(line):
+    stream = io.StringIO(u"www A 192.0.2.1\n" + line + u"\n")
+    with pytest.raises(ZoneFileError, match="^line 2: "):
+        list(iter_rrsets(stream, "example.com"))
+
+
+def test_import_repeated_owner_in_one_chunk(mock, api):
+    mock.add_domain("example.com")
+    results = list(import_zone_file(api, "example.com", io.StringIO(ZONE_REPEATED_OWNER)))
+
+    assert all(result['status'] == 'ok' for result in results)
+    assert len(results) == 2
+    assert records(mock, "example.com") == {('www', 'A'): (3600, ['192.0.2.1', '192.0.2.3']),
+                                            ('mail', 'A'): (3600, ['192.0.2.2'])}
+
+
+def test_import_repeated_owner_after_upload(mock, api):
+    mock.add_domain("example.com")
+    # the first www rrset is sent before the repeated owner is read
+    results = list(import_zone_file(api, "example.com", io.StringIO(ZONE_REPEATED_OWNER), chunk_size=1))
+
+    assert all(result['status'] == 'ok' for result in results)
+    assert [(result['action'], result['subname']) for result in results] == [('create', 'www'), ('create', 'mail'), ('modify', 'www')]
+    assert records(mock, "example.com") == {('www', 'A'): (3600, ['192.0.2.1', '192.0.2.3']),
+                                            ('mail', 'A'): (3600, ['192.0.2.2'])}
+
+
+def test_import_repeated_owner_keeps_lowest_ttl_and_unique_records(mock, api):
+    mock.add_domain("example.com")
+    stream = io.StringIO(u"""$ORIGIN example.com.
+www  3600 A 192.0.2.1
+mail 3600 A 192.0.2.2
+www  300  A 192.0.2.1
+www  3600 A 192.0.2.3
+""")
+    list(import_zone_file(api, "example.com", stream))
+    assert records(mock, "example.com")[('www', 'A')] == (300, ['192.0.2.1', '192.0.2.3'])
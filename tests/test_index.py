@@ -0,0 +1,64 @@
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import pytest
+from desec_dns_index import ZoneIndex, record_key, record_target
+
+
+@pytest.fixture
+def index(tmp_path):
+    with ZoneIndex(path=str(tmp_path / "index.sqlite"), account="test") as zone_index:
+        yield zone_index
+
+
+@pytest.fixture
+def zones(mock):
+    mock.add_domain("a.example")
+    mock.add_rrset("a.example", "www", "CNAME", 3600, ["LB1.example.net."])
+    mock.add_rrset("a.example", "", "MX", 3600, ["10 mx.example.net."])
+    mock.add_domain("b.example")
+    mock.add_rrset("b.example", "www", "A", 3600, ["192.0.2.1"])
+    mock.add_rrset("b.example", "_acme-challenge", "TXT", 60, ['"token"'])
+    return mock
+
+
+def test_record_key_and_target():
+    assert record_key(' "Hello World" ') == "hello world"
+    assert record_key("LB1.Example.NET.") == "lb1.example.net"
+    assert record_target("10 Mx.Example.net.") == "mx.example.net"
+
+
+def test_search_by_target_value_and_pattern(zones, api, index):
+    assert index.refresh(api) == {'zones': 2, 'refreshed': 2, 'removed': 0, 'rrsets': 4}
+
+    found = index.search("lb1.example.net")
+    assert [(row['domain'], row['subname'], row['type']) for row in found] == [("a.example", "www", "CNAME")]
+    assert [row['domain'] for row in index.search("MX.example.net.", type="MX")] == ["a.example"]
+    assert [row['record'] for row in index.search("192.0.2.*")] == ["192.0.2.1"]
+    assert [row['domain'] for row in index.search(subname="_acme*", type=["TXT"])] == ["b.example"]
+    assert [row['subname'] for row in index.search(name="www.*")] == ["www", "www"]
+    assert index.search("192.0.2.1", zone="a.example") == []
+
+
+def test_refresh_requests_only_touched_domains(zones, api, index):
+    index.refresh(api)
+    count = zones.request_count
+    assert index.refresh(api)['refreshed'] == 0
+    assert zones.request_count == count + 1
+
+    zones.add_rrset("b.example", "www", "A", 3600, ["192.0.2.7"])
+    api.domain_delete("a.example")
+    assert index.refresh(api) == {'zones': 1, 'refreshed': 1, 'removed': 1, 'rrsets': 2}
+    assert index.search("192.0.2.1") == []
+    assert [row['domain'] for row in index.search("192.0.2.7")] == ["b.example"]
+    assert index.search("lb1.example.net") == []
+
+
+def test_accounts_are_kept_apart(zones, api, index, tmp_path):
+    index.refresh(api)
+    with ZoneIndex(path=str(tmp_path / "index.sqlite"), account="other") as other:
+        assert other.zones() == {}
+        assert other.search("192.0.2.1") == []
@@ -0,0 +1,81 @@
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import json
+from conftest import records
+from desec_dns_journal import Journal
+
+
+CHANGES = [{'action': 'create', 'subname': 'h%d' % i, 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.%d' % i]} for i in range(6)]
+
+
+def fail_requests(mock, numbers):
+    """
+    Function to let the mock answer some requests with 429 (without retries they fail)
+    Return: list of the methods of the requests answered
+
+    Keyword arguments:
+    mock -- The MockDeSEC object
+    numbers -- The numbers of the requests answered with 429 (counting from 1)
+    """
+    seen = list()
+    original = mock.throttle
+
+    def throttle(method, path):
+        original(method, path)
+        seen.append(method)
+        return 1 if len(seen) in numbers else 0
+    mock.throttle = throttle
+    return seen
+
+
+def test_resume_sends_only_the_changes_not_completed(mock, api, tmp_path):
+    mock.add_domain("example.com")
+    filename = str(tmp_path / "changes.journal")
+
+    # the second of three chunks fails, like an interrupted run
+    fail_requests(mock, [2])
+    with Journal(filename) as journal:
+        results = api.rrset_bulk("example.com", CHANGES, chunk_size=2, journal=journal)
+    assert [result['status'] for result in results] == ['ok', 'ok', 'failed', 'failed', 'ok', 'ok']
+    assert sorted(subname for subname, type in mock.rrsets["example.com"]) == ['h0', 'h1', 'h4', 'h5']
+
+    seen = fail_requests(mock, [])
+    with Journal(filename, resume=True) as journal:
+        results = api.rrset_bulk("example.com", CHANGES, chunk_size=2, journal=journal)
+        assert journal.resumed == 4
+    assert all(result['status'] == 'ok' for result in results)
+    assert sum(1 for result in results if result['error'] == 'applied before (journal)') == 4
+    # only the failed chunk is sent again
+    assert seen == ['PATCH']
+    assert len(records(mock, "example.com")) == 6
+
+
+def test_resume_after_a_line_cut_off(mock, api, tmp_path):
+    mock.add_domain("example.com")
+    filename = str(tmp_path / "changes.journal")
+    with Journal(filename) as journal:
+        api.rrset_bulk("example.com", CHANGES[:2], journal=journal)
+    with open(filename, "a") as stream:
+        stream.write('{"entry": "done", "id": "cut')
+
+    with Journal(filename, resume=True) as journal:
+        assert len(journal.completed) == 2
+        results = api.rrset_bulk("example.com", CHANGES[:3], journal=journal)
+    assert [result['error'] for result in results] == ['applied before (journal)', 'applied before (journal)', '']
+    with open(filename) as stream:
+        lines = stream.read().splitlines()
+    # the cut off entry stays on its own line, all later entries are complete
+    assert lines.index('{"entry": "done", "id": "cut') < len(lines) - 1
+    for line in lines[lines.index('{"entry": "done", "id": "cut') + 1:]:
+        json.loads(line)
+
+
+def test_a_changed_change_is_not_skipped(tmp_path):
+    change = CHANGES[0]
+    assert Journal.change_id("example.com", change) == Journal.change_id("example.com", dict(change))
+    assert Journal.change_id("example.com", change) != Journal.change_id("example.com", dict(change, records=['192.0.2.99']))
+    assert Journal.change_id("example.com", change) != Journal.change_id("example.org", change)
@@ -0,0 +1,144 @@
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import time
+import pytest
+from email.utils import formatdate
+from desec_dns_api import deSEC_DNS_API
+from desec_dns_ratelimit import TokenBucket, RateLimiter, endpoint_class, parse_retry_after
+
+
+def throttle_first(mock, count, retry_after=0.2):
+    """
+    Function to let the mock answer the next requests with 429
+    Return: list of the (method, path) of the requests answered, throttled or not
+
+    Keyword arguments:
+    mock -- The MockDeSEC object
+    count -- The number of requests answered with 429
+    retry_after -- The seconds sent in the Retry-After header (default 0.2)
+    """
+    seen = list()
+    original = mock.throttle
+
+    def throttle(method, path):
+        original(method, path)
+        seen.append((method, path))
+        if len(seen) <= count:
+            mock.throttled_count += 1
+            return retry_after
+        return 0
+    mock.throttle = throttle
+    return seen
+
+
+@pytest.fixture
+def limited(mock):
+    """
+    Api object with the client side rate limiting, without random backoff
+    """
+    with deSEC_DNS_API(api_url=mock.url, api_token="test", max_retries=3) as client:
+        client.rate_limiter.backoff = 0.0
+        yield client
+
+
+def test_endpoint_class():
+    assert endpoint_class('GET', '/api/v1/domains/') == 'domain_read'
+    assert endpoint_class('POST', '/api/v1/domains/') == 'domain_write'
+    assert endpoint_class('GET', '/api/v1/domains/example.com/rrsets/') == 'rrset_read'
+    assert endpoint_class('PATCH', '/api/v1/domains/example.com/rrsets/') == 'rrset_write'
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) == 1.0
+    assert parse_retry_after("soon", default=2.0) == 2.0
+    assert 8 <= parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
+    assert parse_retry_after(formatdate(time.time() - 10, usegmt=True)) == 0.0
+
+
+def test_get_is_retried_after_retry_after(mock, limited):
+    mock.add_domain("example.com")
+    seen = throttle_first(mock, 2, retry_after=0.3)
+
+    start = time.time()
+    response = limited.domain_list()
+    assert response and response.retries == 2
+    assert len(seen) == 3
+    # both throttled attempts waited for the Retry-After of the api
+    assert time.time() - start >= 0.6
+
+
+def test_idempotent_patch_is_retried(mock, limited):
+    mock.add_domain("example.com")
+    seen = throttle_first(mock, 1)
+
+    results = limited.rrset_bulk("example.com", [{'action': 'create', 'subname': 'www', 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.1']}])
+    assert [result['status'] for result in results] == ['ok']
+    assert [method for method, path in seen] == ['PATCH', 'PATCH']
+    assert ('www', 'A') in mock.rrsets["example.com"]
+
+
+def test_post_is_not_replayed(mock, limited):
+    mock.add_domain("example.com")
+    seen = throttle_first(mock, 1)
+
+    response = limited.rrset_create("example.com", "A", "www", "192.0.2.1", 3600)
+    assert not response and response.http_code == 429 and response.retries == 0
+    assert seen == [('POST', '/api/v1/domains/example.com/rrsets/')]
+    assert mock.rrsets["example.com"] == {}
+
+    # the next request is sent after the Retry-After of the throttled one
+    start = time.time()
+    assert limited.rrset_create("example.com", "A", "www", "192.0.2.1", 3600)
+    assert time.time() - start >= 0.15
+
+
+def test_retries_end_after_max_retries(mock, limited):
+    mock.add_domain("example.com")
+    seen = throttle_first(mock, 100, retry_after=0.05)
+
+    response = limited.domain_list()
+    assert response.http_code == 429 and response.retries == 3
+    assert len(seen) == 4
+
+
+def test_token_bucket_burst_and_refill():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    wait = bucket.reserve()
+    assert 0.0 < wait <= 0.1
+    time.sleep(wait + 0.01)
+    assert bucket.reserve() == 0.0
+
+
+def test_token_bucket_backs_off_and_recovers():
+    bucket = TokenBucket(rate=8, min_rate=1)
+    bucket.throttled(0.2)
+    assert bucket.rate == 4.0
+    # nothing is sent before the Retry-After has passed
+    assert 0.15 < bucket.reserve() <= 0.2
+    bucket.throttled(0.0)
+    bucket.throttled(0.0)
+    bucket.throttled(0.0)
+    assert bucket.rate == 1.0
+
+    # every success adds a twentieth of the configured rate, up to the configured rate
+    bucket.succeeded()
+    assert bucket.rate == 1.4
+    for _ in range(40):
+        bucket.succeeded()
+    assert bucket.rate == 8.0
+
+
+def test_rate_limiter_throttles_only_the_endpoint_class():
+    limiter = RateLimiter(rate_limits={'rrset_write': {'rate': 4, 'burst': 4}}, backoff=0.0)
+    assert limiter.throttled('rrset_write', 0.5, 0) == 0.5
+    assert limiter.buckets['rrset_write'].rate == 2.0
+    assert limiter.buckets['rrset_read'].rate == 10.0
+    assert limiter.reserve('rrset_read') == 0.0
+    assert limiter.reserve('rrset_write') > 0.4
@@ -0,0 +1,112 @@
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import asyncio
+import pytest
+from desec_dns_records import canonical_record, canonical_records, canonical_change, split_records, validate_changes
+
+
+def test_split_records_keeps_commas_in_quotes():
+    assert split_records('"v=spf1 a,mx -all","second"') == ['"v=spf1 a,mx -all"', '"second"']
+    assert split_records("192.0.2.1, 192.0.2.2,") == ['192.0.2.1', '192.0.2.2']
+
+
+@pytest.mark.parametrize("type, record, expected", [
+    ('AAAA', '2001:DB8:0:0:0:0:0:1', '2001:db8::1'),
+    ('MX', '10  Mail.Example.COM.', '10 mail.example.com.'),
+    ('MX', '0 .', '0 .'),
+    ('SRV', '0 5 443 Web.Example.com.', '0 5 443 web.example.com.'),
+    ('TXT', 'v=spf1 -all', '"v=spf1" "-all"'),
+    ('CAA', '0 ISSUE "letsencrypt.org"', '0 issue "letsencrypt.org"'),
+])
+def test_canonical_record(type, record, expected):
+    assert canonical_record(type, record) == expected
+
+
+@pytest.mark.parametrize("type, record", [
+    ('CNAME', 'host.example.com'),
+    ('NS', 'ns1.example.com'),
+    ('MX', '10 mail'),
+    ('SRV', '0 5 443 web.example.com'),
+])
+def test_relative_target_names_are_refused(type, record):
+    with pytest.raises(ValueError, match="trailing dot"):
+        canonical_record(type, record)
+
+
+@pytest.mark.parametrize("records", [[10], [None], ['192.0.2.1', None], 10])
+def test_records_that_are_no_strings_are_invalid(records):
+    with pytest.raises(ValueError, match="string"):
+        canonical_records('A', records)
+    # the formatting only comparison of zone sync refuses them as well
+    with pytest.raises(ValueError, match="string"):
+        canonical_records('A', records, strict=False)
+
+
+def test_canonical_records_duplicates_and_cname():
+    with pytest.raises(ValueError, match="duplicate"):
+        canonical_records('AAAA', ['2001:db8::1', '2001:DB8:0::1'])
+    with pytest.raises(ValueError, match="one record"):
+        canonical_records('CNAME', ['a.example.com.', 'b.example.com.'])
+
+
+def test_canonical_change_returns_canonical_change_unchanged():
+    change = {'action': 'create', 'subname': 'www', 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.1']}
+    assert canonical_change(change) is change
+    copy = canonical_change(dict(change, type='mx', records=['10 MAIL.example.com.']))
+    assert copy['type'] == 'MX' and copy['records'] == ['10 mail.example.com.']
+
+
+def test_validate_changes_reports_invalid_changes():
+    changes = [{'action': 'create', 'subname': 'a', 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.1']},
+               {'action': 'create', 'subname': 'b', 'type': 'A', 'ttl': 3600, 'records': [10]},
+               {'action': 'create', 'subname': 'C', 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.1']},
+               {'action': 'create', 'subname': 'd', 'type': 'A', 'ttl': 0, 'records': ['192.0.2.1']}]
+    valid, invalid = validate_changes(changes)
+    assert [change['subname'] for change in valid] == ['a']
+    assert [change['subname'] for change, error in invalid] == ['b', 'C', 'd']
+
+
+def test_rrset_bulk_does_not_send_invalid_changes(mock, api):
+    mock.add_domain("example.com")
+    results = api.rrset_bulk("example.com", [
+        {'action': 'create', 'subname': 'www', 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.1']},
+        {'action': 'create', 'subname': 'alias', 'type': 'CNAME', 'ttl': 3600, 'records': ['www.example.com']},
+    ])
+    assert sorted((result['subname'], result['status']) for result in results) == [('alias', 'failed'), ('www', 'ok')]
+    assert list(mock.rrsets["example.com"]) == [('www', 'A')]
+
+
+def test_single_rrset_requests_check_the_records(mock, api):
+    mock.add_domain("example.com")
+    count = mock.request_count
+    with pytest.raises(ValueError):
+        api.rrset_create("example.com", "CNAME", "alias", "www.example.com", 3600)
+    with pytest.raises(ValueError):
+        api.rrset_modify("example.com", "A", "www", records=[None])
+    assert mock.request_count == count
+    assert api.rrset_create("example.com", "MX", "", "10 Mail.Example.com.", 3600)
+    assert mock.rrsets["example.com"][('', 'MX')]['records'] == ['10 mail.example.com.']
+
+
+def test_async_single_rrset_requests_check_the_records(mock):
+    from desec_dns_api_async import deSEC_DNS_API_Async, aiohttp
+    if aiohttp is None:
+        pytest.skip("aiohttp is not installed")
+    mock.add_domain("example.com")
+
+    async def run():
+        async with deSEC_DNS_API_Async(api_url=mock.url, api_token="test", rate_limits=False) as api:
+            with pytest.raises(ValueError):
+                await api.rrset_create("example.com", "CNAME", "alias", "www.example.com", 3600)
+            with pytest.raises(ValueError):
+                await api.rrset_modify("example.com", "MX", "", records=["10 mail"])
+            await api.rrset_create("example.com", "A", "www", "192.0.2.1", 3600)
+
+    count = mock.request_count
+    asyncio.run(run())
+    assert mock.request_count == count + 1
+    assert list(mock.rrsets["example.com"]) == [('www', 'A')]
@@ -0,0 +1,107 @@
+"""
+Author Gerhard Steinbeis
+Version: 0.2.0
+"""
+
+from __future__ import print_function
+import pytest
+from desec_dns_zone import zone_diff
+from conftest import records
+
+
+LIVE = [
+    {'subname': '', 'type': 'NS', 'ttl': 3600, 'records': ['ns1.desec.io.', 'ns2.desec.org.']},
+    {'subname': 'www', 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.1', '192.0.2.2']},
+    {'subname': 'mail', 'type': 'MX', 'ttl': 3600, 'records': ['10 mx.example.com.']},
+    {'subname': 'old', 'type': 'CNAME', 'ttl': 3600, 'records': ['www.example.com.']},
+]
+
+
+def test_zone_diff_minimal_changes():
+    desired = [
+        # order and formatting of the records do not matter
+        {'subname': 'www', 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.2', '192.0.2.1']},
+        {'subname': 'mail', 'type': 'MX', 'ttl': 3600, 'records': ['10  MX.example.com.']},
+        {'subname': 'new', 'type': 'AAAA', 'ttl': 300, 'records': ['2001:db8::1']},
+    ]
+    plan = zone_diff(desired, LIVE)
+    assert plan['unchanged'] == 2
+    assert [(change['subname'], change['type']) for change in plan['create']] == [('new', 'AAAA')]
+    assert plan['modify'] == []
+    # the NS rrset of the apex is managed by deSEC and kept
+    assert [(change['subname'], change['type']) for change in plan['delete']] == [('old', 'CNAME')]
+
+
+def test_zone_diff_modify_records_and_ttl():
+    desired = [{'subname': 'www', 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.1']},
+               {'subname': 'mail', 'type': 'MX', 'ttl': 60, 'records': ['10 mx.example.com.']}]
+    plan = zone_diff(desired, LIVE, delete=False)
+    assert [(change['subname'], change['ttl'], change['records']) for change in plan['modify']] == [
+        ('www', 3600, ['192.0.2.1']), ('mail', 60, ['10 mx.example.com.'])]
+    assert plan['delete'] == []
+
+
+def test_zone_diff_lowercase_type_matches_live_rrset():
+    desired = [{'subname': 'www', 'type': 'a', 'ttl': 3600, 'records': ['192.0.2.9']},
+               {'subname': 'mail', 'type': 'mx', 'ttl': 3600, 'records': ['10 mx.example.com.']}]
+    plan = zone_diff(desired, LIVE)
+    # a lowercase type must not create a second rrset and delete the live one
+    assert plan['create'] == []
+    assert [(change['subname'], change['type'], change['records']) for change in plan['modify']] == [
+        ('www', 'A', ['192.0.2.9'])]
+    assert plan['unchanged'] == 1
+    assert [(change['subname'], change['type']) for change in plan['delete']] == [('old', 'CNAME')]
+
+
+def test_zone_diff_rejects_duplicate_rrsets_before_reading_live():
+    def live():
+        raise AssertionError("the live rrsets must not be read")
+        yield
+
+    desired = [{'subname': 'www', 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.1']},
+               {'subname': 'www', 'type': 'A', 'ttl': 60, 'records': ['192.0.2.3']}]
+    with pytest.raises(ValueError, match="more than once"):
+        zone_diff(desired, live())
+
+
+def test_zone_diff_applied_with_rrset_bulk(mock, api):
+    mock.add_domain("example.com")
+    for rrset in LIVE:
+        mock.add_rrset("example.com", rrset['subname'], rrset['type'], rrset['ttl'], rrset['records'])
+    desired = [{'subname': 'www', 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.9']},
+               {'subname': 'new', 'type': 'TXT', 'ttl': 3600, 'records': ['"hello"']}]
+
+    plan = zone_diff(desired, api.iter_rrsets("example.com"))
+    results = api.rrset_bulk("example.com", plan['create'] + plan['modify'] + plan['delete'])
+    assert all(result['status'] == 'ok' for result in results)
+    assert sorted(mock.rrsets["example.com"]) == [('', 'NS'), ('new', 'TXT'), ('www', 'A')]
+    assert zone_diff(desired, api.iter_rrsets("example.com"), delete=False) == {'create': [], 'modify': [], 'delete': [], 'unchanged': 2}
+
+
+def test_zone_sync_with_lowercase_type_through_rrset_bulk(mock, api):
+    mock.add_domain("example.com")
+    for rrset in LIVE:
+        mock.add_rrset("example.com", rrset['subname'], rrset['type'], rrset['ttl'], rrset['records'])
+    desired = [{'subname': 'www', 'type': 'a', 'ttl': 3600, 'records': ['192.0.2.9']},
+               {'subname': 'mail', 'type': 'mx', 'ttl': 3600, 'records': ['10 mx.example.com.']}]
+
+    plan = zone_diff(desired, api.iter_rrsets("example.com"))
+    results = api.rrset_bulk("example.com", plan['create'] + plan['modify'] + plan['delete'])
+    assert all(result['status'] == 'ok' for result in results)
+    assert records(mock, "example.com") == {('', 'NS'): (3600, ['ns1.desec.io.', 'ns2.desec.org.']),
+                                            ('www', 'A'): (3600, ['192.0.2.9']),
+                                            ('mail', 'MX'): (3600, ['10 mx.example.com.'])}
+
+
+def test_rrset_bulk_duplicate_rrset_is_rejected_by_the_api(mock, api):
+    mock.add_domain("example.com")
+    mock.add_rrset("example.com", "www", "A", 3600, ["192.0.2.1"])
+
+    # a plan listing a rrset twice must not delete it after creating it
+    results = api.rrset_bulk("example.com", [
+        {'action': 'modify', 'subname': 'www', 'type': 'A', 'ttl': 3600, 'records': ['192.0.2.9']},
+        {'action': 'delete', 'subname': 'www', 'type': 'A'},
+    ])
+    assert [result['status'] for result in results] == ['ok', 'failed']
+    assert 'unique' in results[1]['error']
+    assert records(mock, "example.com") == {('www', 'A'): (3600, ['192.0.2.9'])}